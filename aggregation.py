@@ -0,0 +1,107 @@
+"""
+Funções de agregação (COUNT, SUM, AVG, MIN, MAX) em duas fases.
+
+O estado de cada função é um valor simples (número, tupla ou None), que pode
+ser gravado em disco e enviado entre processos. A fase parcial acumula os
+valores de uma parte da entrada em estados (``update``); a final combina os
+estados das partes (``merge``) e calcula o resultado (``result``). Como
+``merge`` é associativo, dividir a entrada em partições e agregar cada uma
+separadamente dá o mesmo resultado que agregar tudo de uma vez.
+"""
+
+
+def _number(aggregate, value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    raise ValueError(f"{aggregate} requer valores numéricos, encontrado {value!r}")
+
+
+def _before(a, b):
+    """``a`` vem antes de ``b`` na ordem do ORDER BY (números antes de textos)"""
+    a_number = isinstance(a, (int, float))
+    if a_number != isinstance(b, (int, float)):
+        return a_number
+    return a < b
+
+
+class AggregateFunction:
+    """Estado inicial e passos de uma agregação (sql_ast.Aggregate)"""
+
+    initial = None
+
+    def __init__(self, aggregate):
+        self.aggregate = aggregate
+
+    def update(self, state, value):
+        """Estado com mais um valor da entrada (NULL é ignorado)"""
+        raise NotImplementedError
+
+    def merge(self, state, other):
+        """Estado que combina dois estados parciais"""
+        raise NotImplementedError
+
+    def result(self, state):
+        return state
+
+
+class Count(AggregateFunction):
+    initial = 0
+
+    def update(self, state, value):
+        return state if value is None else state + 1
+
+    def merge(self, state, other):
+        return state + other
+
+
+class Sum(AggregateFunction):
+    def update(self, state, value):
+        if value is None:
+            return state
+        value = _number(self.aggregate, value)
+        return value if state is None else state + value
+
+    def merge(self, state, other):
+        if state is None:
+            return other
+        return state if other is None else state + other
+
+
+class Avg(AggregateFunction):
+    initial = (0, 0)  # (soma, quantidade)
+
+    def update(self, state, value):
+        if value is None:
+            return state
+        return (state[0] + _number(self.aggregate, value), state[1] + 1)
+
+    def merge(self, state, other):
+        return (state[0] + other[0], state[1] + other[1])
+
+    def result(self, state):
+        return state[0] / state[1] if state[1] else None
+
+
+class Min(AggregateFunction):
+    def update(self, state, value):
+        if value is None or (state is not None and not _before(value, state)):
+            return state
+        return value
+
+    merge = update
+
+
+class Max(AggregateFunction):
+    def update(self, state, value):
+        if value is None or (state is not None and not _before(state, value)):
+            return state
+        return value
+
+    merge = update
+
+
+FUNCTIONS = {"COUNT": Count, "SUM": Sum, "AVG": Avg, "MIN": Min, "MAX": Max}
+
+
+def aggregate_function(aggregate):
+    return FUNCTIONS[aggregate.function](aggregate)
@@ -2,10 +2,8 @@ from algebra_expressions import *
 
 
 class AlgebraConverter:
-    def convert(self, parsed_query):
-        tables = parsed_query["from"] + [
-            join["table"] for join in parsed_query["joins"]
-        ]
+    def convert(self, statement):
+        tables = statement.tables
 
         # Construir junções
         if len(tables) == 1:
@@ -13,25 +11,34 @@ class AlgebraConverter:
             result = Table(tables[0])
         else:
             # Com junções
-            result = self._build_joins(parsed_query)
+            result = self._build_joins(statement)
 
         # Aplicar seleção (WHERE)
-        if parsed_query["where"]:
-            result = Selection(parsed_query["where"], result)
+        if statement.where is not None:
+            result = Selection(statement.where, result)
+
+        # Agrupar (GROUP BY / funções de agregação)
+        if statement.is_aggregate:
+            result = Aggregation(statement.group_by, statement.aggregates, result)
+
+        # Ordenar e limitar (ORDER BY / LIMIT), abaixo da projeção para que
+        # o ORDER BY possa usar colunas que não estão no SELECT
+        if statement.order_by or statement.limit is not None:
+            result = Sort(statement.order_by, result, statement.limit)
 
         # Aplicar projeção (SELECT)
-        result = Projection(parsed_query["select"], result)
+        result = Projection(statement.columns, result)
 
         return result
 
-    def _build_joins(self, parsed_query):
+    def _build_joins(self, statement):
         # Começar com a primeira tabela
-        result = Table(parsed_query["from"][0])
+        result = Table(statement.from_table)
 
         # Adicionar cada junção
-        for join in parsed_query["joins"]:
-            right_table = Table(join["table"])
-            condition = join["condition"]
+        for join in statement.joins:
+            right_table = Table(join.table)
+            condition = join.condition
             result = Join(condition, result, right_table)
 
         return result
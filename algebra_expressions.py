@@ -1,20 +1,91 @@
+_set = object.__setattr__
+
+# Algoritmos físicos de junção que o otimizador pode fixar em Join.method
+HASH_JOIN = "hash"
+MERGE_JOIN = "merge"
+NESTED_LOOP_JOIN = "nested_loop"
+INDEX_JOIN = "index"
+
+# Fases de Aggregation.phase quando a agregação é dividida entre partições
+PARTIAL_AGGREGATION = "parcial"  # Estados acumulados por partição
+FINAL_AGGREGATION = "final"  # Estados das partições combinados no resultado
+
+
 class AlgebraExpression:
+    """
+    Nó imutável da álgebra relacional. Os campos de cada classe são os seus
+    ``__slots__``, na ordem do construtor; o hash estrutural é calculado uma
+    vez na criação, então nós iguais podem ser usados como chave de dicionário
+    (memoização, subexpressões comuns) sem percorrer a árvore. Reescritas
+    devem usar ``replace`` para que as subárvores inalteradas sejam
+    compartilhadas com a árvore original.
+    """
+
+    __slots__ = ("_hash",)
+
     def to_string(self, indent=0):
         raise NotImplementedError
 
     def get_tables(self):
         raise NotImplementedError
 
+    def _freeze(self):
+        _set(self, "_hash", hash((type(self).__name__,) + self._fields()))
+
+    def _fields(self):
+        return tuple(getattr(self, name) for name in type(self).__slots__)
+
+    def replace(self, **changes):
+        """Nó com os campos trocados (o próprio nó se nenhum mudar)"""
+        if all(getattr(self, name) is value for name, value in changes.items()):
+            return self
+        return type(self)(
+            *(changes.get(name, getattr(self, name)) for name in type(self).__slots__)
+        )
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} é imutável")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} é imutável")
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        return (
+            type(self) is type(other)
+            and self._hash == other._hash
+            and self._fields() == other._fields()
+        )
+
+    def __reduce__(self):
+        return type(self), self._fields()
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return f"{type(self).__name__}{self._fields()!r}"
+
 
 class Projection(AlgebraExpression):
     """Projeção (π)"""
 
+    __slots__ = ("attributes", "child")
+
     def __init__(self, attributes, child):
-        self.attributes = attributes
-        self.child = child
+        _set(self, "attributes", tuple(attributes))
+        _set(self, "child", child)
+        self._freeze()
 
     def to_string(self, indent=0):
-        attrs = ", ".join(self.attributes)
+        attrs = ", ".join(map(str, self.attributes))
         indent_str = "  " * indent
         child_str = self.child.to_string(indent + 1)
         return f"{indent_str}π {attrs} (\n{child_str}\n{indent_str})"
@@ -26,12 +97,15 @@ class Projection(AlgebraExpression):
 class Selection(AlgebraExpression):
     """Seleção (σ)"""
 
+    __slots__ = ("condition", "child")
+
     def __init__(self, condition, child):
-        self.condition = condition
-        self.child = child
+        _set(self, "condition", condition)
+        _set(self, "child", child)
+        self._freeze()
 
     def to_string(self, indent=0):
-        cond = self.condition.replace(" and ", " ^ ").replace(" AND ", " ^ ")
+        cond = self.condition.render(and_op="^")
         indent_str = "  " * indent
         child_str = self.child.to_string(indent + 1)
         return f"{indent_str}σ {cond} (\n{child_str}\n{indent_str})"
@@ -40,29 +114,104 @@ class Selection(AlgebraExpression):
         return self.child.get_tables()
 
 
+class Aggregation(AlgebraExpression):
+    """
+    Agregação (γ): uma linha por grupo, com as colunas de ``groups`` seguidas
+    das ``aggregates`` (sql_ast.Aggregate). ``phase`` divide a execução em
+    PARTIAL_AGGREGATION e FINAL_AGGREGATION (None = as duas de uma vez).
+    """
+
+    __slots__ = ("groups", "aggregates", "child", "phase")
+
+    def __init__(self, groups, aggregates, child, phase=None):
+        _set(self, "groups", tuple(groups))
+        _set(self, "aggregates", tuple(aggregates))
+        _set(self, "child", child)
+        _set(self, "phase", phase)
+        self._freeze()
+
+    @property
+    def columns(self):
+        return self.groups + self.aggregates
+
+    def to_string(self, indent=0):
+        aggregates = ", ".join(map(str, self.aggregates))
+        if self.groups:
+            aggregates = f"{', '.join(map(str, self.groups))}; {aggregates}"
+        if self.phase is not None:
+            aggregates += f"  [{self.phase}]"
+        indent_str = "  " * indent
+        child_str = self.child.to_string(indent + 1)
+        return f"{indent_str}γ {aggregates} (\n{child_str}\n{indent_str})"
+
+    def get_tables(self):
+        return self.child.get_tables()
+
+
+class Sort(AlgebraExpression):
+    """Ordenação (τ) pelos ``keys`` (sql_ast.OrderItem), com LIMIT opcional"""
+
+    __slots__ = ("keys", "child", "limit")
+
+    def __init__(self, keys, child, limit=None):
+        _set(self, "keys", tuple(keys))
+        _set(self, "child", child)
+        _set(self, "limit", limit)
+        self._freeze()
+
+    def to_string(self, indent=0):
+        parts = [", ".join(map(str, self.keys))] if self.keys else []
+        if self.limit is not None:
+            parts.append(f"LIMIT {self.limit}")
+        indent_str = "  " * indent
+        child_str = self.child.to_string(indent + 1)
+        return f"{indent_str}τ {' '.join(parts)} (\n{child_str}\n{indent_str})"
+
+    def get_tables(self):
+        return self.child.get_tables()
+
+
 class Join(AlgebraExpression):
-    """Junção (⋈)"""
+    """Junção (⋈); ``method`` fixa o algoritmo físico (None = o executor escolhe)"""
+
+    __slots__ = ("condition", "left", "right", "method")
 
-    def __init__(self, condition, left, right):
-        self.condition = condition
-        self.left = left
-        self.right = right
+    def __init__(self, condition, left, right, method=None):
+        _set(self, "condition", condition)
+        _set(self, "left", left)
+        _set(self, "right", right)
+        _set(self, "method", method)
+        self._freeze()
 
     def to_string(self, indent=0):
         indent_str = "  " * indent
         left_str = self.left.to_string(indent + 1)
         right_str = self.right.to_string(indent + 1)
-        return f"{indent_str}(\n{left_str}\n{indent_str}  ⋈ {self.condition}\n{right_str}\n{indent_str})"
+        # Sem condição a junção é um produto cartesiano
+        op = f"⋈ {self.condition}" if self.condition is not None else "×"
+        if self.method is not None:
+            op += f"  [{self.method}]"
+        return f"{indent_str}(\n{left_str}\n{indent_str}  {op}\n{right_str}\n{indent_str})"
 
     def get_tables(self):
         return self.left.get_tables() + self.right.get_tables()
 
 
 class Table(AlgebraExpression):
-    """Tabela (relação base)"""
+    """Tabela (relação base); há uma única instância por nome"""
+
+    __slots__ = ("name",)
+
+    _interned = {}
 
-    def __init__(self, name):
-        self.name = name
+    def __new__(cls, name):
+        table = cls._interned.get(name)
+        if table is None:
+            table = object.__new__(cls)
+            _set(table, "name", name)
+            table._freeze()
+            table = cls._interned.setdefault(name, table)
+        return table
 
     def to_string(self, indent=0):
         indent_str = "  " * indent
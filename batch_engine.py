@@ -0,0 +1,672 @@
+import operator
+from itertools import islice
+
+import numpy as np
+
+from aggregation import aggregate_function
+from algebra_expressions import *
+from execution_engine import column_key, column_positions, sort_key, split_equi_join
+from metadata import get_table_columns, normalize_table_name
+from sql_ast import BoolExpr, ColumnRef, Comparison, Literal
+
+DEFAULT_BATCH_SIZE = 64 * 1024
+
+_NUMPY_COMPARATORS = {
+    "=": np.equal,
+    "<>": np.not_equal,
+    "<": np.less,
+    ">": np.greater,
+    "<=": np.less_equal,
+    ">=": np.greater_equal,
+}
+
+_PYTHON_COMPARATORS = {
+    "=": operator.eq,
+    "<>": operator.ne,
+    "<": operator.lt,
+    ">": operator.gt,
+    "<=": operator.le,
+    ">=": operator.ge,
+}
+
+_HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+class ColumnBatch:
+    """Bloco de linhas em formato colunar: um array NumPy por coluna"""
+
+    __slots__ = ("columns", "arrays", "size")
+
+    def __init__(self, columns, arrays, size=None):
+        self.columns = columns
+        self.arrays = arrays
+        self.size = size if size is not None else (len(arrays[0]) if arrays else 0)
+
+    def take(self, selector):
+        """Filtra/reordena as linhas (máscara booleana ou vetor de índices)"""
+        arrays = [array[selector] for array in self.arrays]
+        size = len(arrays[0]) if arrays else int(np.count_nonzero(selector))
+        return ColumnBatch(self.columns, arrays, size)
+
+    def rows(self):
+        return zip(*(_to_python(array) for array in self.arrays))
+
+
+def _to_python(array):
+    values = array.tolist()
+    if array.dtype.kind in "fO":
+        # NaN é a representação de NULL nas colunas float (e segue como float
+        # quando um bloco float é concatenado a um bloco object)
+        return [None if v != v else v for v in values]
+    return values
+
+
+def to_array(values):
+    """
+    Converte uma sequência de valores em array: int64/float64 quando possível,
+    senão object. Nulos viram NaN só em colunas com algum float; inteiros com
+    nulos ficam em object (int/None), como os devolve o motor por linhas.
+    """
+    try:
+        array = np.array(values)
+    except (ValueError, OverflowError):
+        return np.array(values, dtype=object)
+
+    if array.dtype.kind in "iuf":
+        return array
+    if array.dtype.kind == "O":
+        non_null = [v for v in values if v is not None]
+        if (
+            len(non_null) < len(values)
+            and any(isinstance(v, float) for v in non_null)
+            and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in non_null)
+        ):
+            return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        return array
+    return np.array(values, dtype=object)
+
+
+def rows_to_batch(columns, rows):
+    if not rows:
+        return ColumnBatch(columns, [np.empty(0, dtype=object) for _ in columns], 0)
+    return ColumnBatch(columns, [to_array(list(values)) for values in zip(*rows)], len(rows))
+
+
+def concat_batches(columns, batches):
+    batches = [b for b in batches if b.size]
+    if not batches:
+        return ColumnBatch(columns, [np.empty(0, dtype=object) for _ in columns], 0)
+    if len(batches) == 1:
+        return batches[0]
+    arrays = [
+        np.concatenate([b.arrays[i] for b in batches]) for i in range(len(columns))
+    ]
+    return ColumnBatch(columns, arrays, sum(b.size for b in batches))
+
+
+def _is_numeric(array):
+    return array.dtype.kind in "iuf"
+
+
+def evaluate_mask(expr, batch, positions):
+    """Avalia a condição sobre o bloco inteiro e devolve uma máscara booleana"""
+    if isinstance(expr, BoolExpr):
+        masks = [evaluate_mask(e, batch, positions) for e in expr.operands]
+        result = masks[0]
+        for mask in masks[1:]:
+            result = result & mask if expr.op == "AND" else result | mask
+        return result
+
+    if isinstance(expr, Comparison):
+        left = _operand(expr.left, batch, positions)
+        right = _operand(expr.right, batch, positions)
+        return _compare(expr.op, left, right, batch.size)
+
+    raise ValueError(f"Expressão não suportada: {expr!r}")
+
+
+def _operand(expr, batch, positions):
+    if isinstance(expr, ColumnRef):
+        return batch.arrays[positions[column_key(expr)]]
+    if isinstance(expr, Literal):
+        return expr.value
+    raise ValueError(f"Operando não suportado: {expr!r}")
+
+
+def _compare(op, left, right, size):
+    left_array = isinstance(left, np.ndarray)
+    right_array = isinstance(right, np.ndarray)
+    left_numeric = _is_numeric(left) if left_array else isinstance(left, (int, float))
+    right_numeric = _is_numeric(right) if right_array else isinstance(right, (int, float))
+
+    if left_numeric and right_numeric:
+        mask = _NUMPY_COMPARATORS[op](left, right)
+        if op == "<>":
+            # NaN representa NULL: a comparação é desconhecida, não verdadeira
+            for side in (left, right):
+                if isinstance(side, np.ndarray) and side.dtype.kind == "f":
+                    mask &= ~np.isnan(side)
+        return np.broadcast_to(mask, (size,)) if np.ndim(mask) == 0 else mask
+
+    if not left_array and not right_array:
+        return np.full(size, _scalar_compare(op, left, right), dtype=bool)
+
+    # Colunas de texto/mistas: comparação elemento a elemento em Python
+    left_values = left.tolist() if left_array else [left] * size
+    right_values = right.tolist() if right_array else [right] * size
+    return np.fromiter(
+        (_scalar_compare(op, a, b) for a, b in zip(left_values, right_values)),
+        dtype=bool,
+        count=size,
+    )
+
+
+def _scalar_compare(op, a, b):
+    if a is None or b is None:
+        return False
+    try:
+        return bool(_PYTHON_COMPARATORS[op](a, b))
+    except TypeError:
+        return False
+
+
+def _key_modes(left_arrays, right_arrays):
+    """
+    Representação comum de cada par de chaves para que valores iguais tenham
+    o mesmo hash dos dois lados (ex: int64 de um lado e float64 com NaN do outro)
+    """
+    modes = []
+    for left, right in zip(left_arrays, right_arrays):
+        kinds = {left.dtype.kind, right.dtype.kind}
+        if kinds <= set("iu"):
+            modes.append("int")
+        elif kinds <= set("iuf"):
+            modes.append("float")
+        else:
+            modes.append("object")
+    return modes
+
+
+def _hash_keys(arrays, modes):
+    """Hash vetorizado (uint64) de uma ou mais colunas de chave"""
+    combined = np.zeros(len(arrays[0]), dtype=np.uint64)
+    for array, mode in zip(arrays, modes):
+        if mode == "int":
+            codes = array.astype(np.int64).view(np.uint64)
+        elif mode == "float":
+            codes = array.astype(np.float64).view(np.uint64)
+        else:
+            codes = np.fromiter(
+                (hash(v) & 0xFFFFFFFFFFFFFFFF for v in array.tolist()),
+                dtype=np.uint64,
+                count=len(array),
+            )
+        combined = (combined ^ codes) * _HASH_MULTIPLIER
+    return combined
+
+
+def _valid_keys(arrays):
+    """Máscara das linhas sem chave nula (NaN ou None)"""
+    mask = np.ones(len(arrays[0]), dtype=bool)
+    for array in arrays:
+        if array.dtype.kind == "f":
+            mask &= ~np.isnan(array)
+        elif array.dtype.kind == "O":
+            mask &= np.fromiter((v is not None for v in array.tolist()), bool, len(array))
+    return mask
+
+
+class BatchOperator:
+    """Operador que produz ColumnBatch em vez de linhas"""
+
+    columns = ()
+    children = ()
+
+    def batches(self):
+        raise NotImplementedError
+
+    def __iter__(self):
+        for batch in self.batches():
+            yield from batch.rows()
+
+    def describe(self):
+        return type(self).__name__
+
+
+class BatchTableScan(BatchOperator):
+    def __init__(self, source, table, batch_size=DEFAULT_BATCH_SIZE):
+        self.source = source
+        self.table = normalize_table_name(table)
+        self.batch_size = batch_size
+        self.columns = [ColumnRef(self.table, c) for c in get_table_columns(self.table)]
+        # Condição do σ logo acima: a fonte pode usá-la para pular blocos
+        self.condition = None
+
+    def batches(self):
+        # Fontes colunares entregam arrays prontos; as demais são convertidas
+        scan_batches = getattr(self.source, "scan_batches", None)
+        if scan_batches is not None:
+            if self.condition is not None:
+                arrays_iter = scan_batches(self.table, self.batch_size, condition=self.condition)
+            else:
+                arrays_iter = scan_batches(self.table, self.batch_size)
+            for arrays in arrays_iter:
+                yield ColumnBatch(self.columns, arrays)
+            return
+
+        rows = iter(self.source.scan(self.table))
+        while True:
+            chunk = list(islice(rows, self.batch_size))
+            if not chunk:
+                return
+            yield rows_to_batch(self.columns, chunk)
+
+    def describe(self):
+        return f"BatchTableScan({self.table})"
+
+
+class BatchFilter(BatchOperator):
+    def __init__(self, child, condition):
+        self.child = child
+        self.children = (child,)
+        self.condition = condition
+        self.columns = child.columns
+
+    def batches(self):
+        positions = column_positions(self.columns)
+        for batch in self.child.batches():
+            mask = evaluate_mask(self.condition, batch, positions)
+            if mask.all():
+                yield batch
+            elif mask.any():
+                yield batch.take(mask)
+
+    def describe(self):
+        return f"BatchFilter({self.condition})"
+
+
+class BatchProject(BatchOperator):
+    def __init__(self, child, attributes):
+        self.child = child
+        self.children = (child,)
+        positions = column_positions(child.columns)
+        self.indexes = [positions[column_key(attr)] for attr in attributes]
+        self.columns = [child.columns[i] for i in self.indexes]
+
+    def batches(self):
+        # Seleção de colunas sem cópia: os arrays são apenas referenciados
+        for batch in self.child.batches():
+            yield ColumnBatch(self.columns, [batch.arrays[i] for i in self.indexes], batch.size)
+
+    def describe(self):
+        return f"BatchProject({', '.join(map(str, self.columns))})"
+
+
+class BatchHashJoin(BatchOperator):
+    """
+    Hash join vetorizado: o lado direito é materializado e suas chaves são
+    transformadas em hashes uint64 ordenados; cada bloco do lado esquerdo
+    encontra os candidatos com searchsorted e as chaves reais são conferidas
+    para descartar colisões.
+    """
+
+    def __init__(self, left, right, left_keys, right_keys, residual=None):
+        self.left = left
+        self.right = right
+        self.children = (left, right)
+        self.left_keys = left_keys
+        self.right_keys = right_keys
+        self.residual = residual
+        self.columns = list(left.columns) + list(right.columns)
+
+    def batches(self):
+        build = concat_batches(self.right.columns, self.right.batches())
+        if build.size == 0:
+            return
+
+        build_keys = [build.arrays[i] for i in self.right_keys]
+        valid = np.flatnonzero(_valid_keys(build_keys))
+        modes = None
+
+        positions = column_positions(self.columns)
+        for batch in self.left.batches():
+            probe_keys = [batch.arrays[i] for i in self.left_keys]
+            if modes != _key_modes(probe_keys, build_keys):
+                # Tabela hash montada no primeiro bloco (ou se o tipo mudar)
+                modes = _key_modes(probe_keys, build_keys)
+                build_hashes = _hash_keys([k[valid] for k in build_keys], modes)
+                order = np.argsort(build_hashes, kind="stable")
+                sorted_hashes = build_hashes[order]
+                build_rows = valid[order]
+
+            probe_hashes = _hash_keys(probe_keys, modes)
+            starts = np.searchsorted(sorted_hashes, probe_hashes, side="left")
+            ends = np.searchsorted(sorted_hashes, probe_hashes, side="right")
+            counts = ends - starts
+            total = int(counts.sum())
+            if total == 0:
+                continue
+
+            # Expande cada linha de probe em uma linha por candidato do build
+            probe_index = np.repeat(np.arange(batch.size), counts)
+            offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            build_index = build_rows[np.repeat(starts, counts) + offsets]
+
+            match = np.ones(total, dtype=bool)
+            for probe_key, build_key in zip(probe_keys, build_keys):
+                match &= _compare("=", probe_key[probe_index], build_key[build_index], total)
+            probe_index = probe_index[match]
+            build_index = build_index[match]
+            if len(probe_index) == 0:
+                continue
+
+            joined = ColumnBatch(
+                self.columns,
+                [a[probe_index] for a in batch.arrays] + [a[build_index] for a in build.arrays],
+                len(probe_index),
+            )
+            if self.residual is not None:
+                joined = joined.take(evaluate_mask(self.residual, joined, positions))
+            if joined.size:
+                yield joined
+
+    def describe(self):
+        keys = ", ".join(
+            f"{self.left.columns[l]} = {self.right.columns[r]}"
+            for l, r in zip(self.left_keys, self.right_keys)
+        )
+        return f"BatchHashJoin({keys})"
+
+
+class BatchNestedLoopJoin(BatchOperator):
+    """Junção sem chaves de igualdade: produto de blocos filtrado por máscara"""
+
+    def __init__(self, left, right, condition, batch_size=DEFAULT_BATCH_SIZE):
+        self.left = left
+        self.right = right
+        self.children = (left, right)
+        self.condition = condition
+        self.batch_size = batch_size
+        self.columns = list(left.columns) + list(right.columns)
+
+    def batches(self):
+        inner = concat_batches(self.right.columns, self.right.batches())
+        if inner.size == 0:
+            return
+
+        positions = column_positions(self.columns)
+        step = max(self.batch_size // inner.size, 1)
+        for batch in self.left.batches():
+            for start in range(0, batch.size, step):
+                outer_index = np.arange(start, min(start + step, batch.size))
+                left_index = np.repeat(outer_index, inner.size)
+                right_index = np.tile(np.arange(inner.size), len(outer_index))
+                joined = ColumnBatch(
+                    self.columns,
+                    [a[left_index] for a in batch.arrays]
+                    + [a[right_index] for a in inner.arrays],
+                    len(left_index),
+                )
+                if self.condition is not None:
+                    joined = joined.take(evaluate_mask(self.condition, joined, positions))
+                if joined.size:
+                    yield joined
+
+    def describe(self):
+        return f"BatchNestedLoopJoin({self.condition})"
+
+
+def _factorize(arrays, size):
+    """Código do grupo de cada linha e a chave (tupla) de cada código"""
+    if not arrays:
+        return np.zeros(size, dtype=np.int64), [()]
+    if len(arrays) == 1 and _is_numeric(arrays[0]):
+        uniques, codes = np.unique(arrays[0], return_inverse=True)
+        return codes.ravel(), [(value,) for value in _to_python(uniques)]
+    index = {}
+    keys = zip(*(_to_python(array) for array in arrays))
+    codes = np.fromiter((index.setdefault(key, len(index)) for key in keys), np.int64, size)
+    return codes, list(index)
+
+
+def _group_states(function, array, codes, groups):
+    """Estado de ``function`` para cada um dos ``groups`` códigos do bloco"""
+    if function.aggregate.function == "COUNT" and array is None:
+        return np.bincount(codes, minlength=groups).tolist()
+    if not _is_numeric(array):
+        states = [function.initial] * groups
+        for code, value in zip(codes.tolist(), array.tolist()):
+            states[code] = function.update(states[code], value)
+        return states
+
+    if array.dtype.kind == "f":
+        valid = ~np.isnan(array)
+        codes, array = codes[valid], array[valid]
+    counts = np.bincount(codes, minlength=groups).tolist()
+    name = function.aggregate.function
+    if name == "COUNT":
+        return counts
+    if name in ("SUM", "AVG"):
+        if array.dtype.kind == "f":
+            sums = np.bincount(codes, weights=array, minlength=groups)
+        else:
+            sums = np.zeros(groups, dtype=np.int64)
+            np.add.at(sums, codes, array)
+        sums = sums.tolist()
+        if name == "AVG":
+            return list(zip(sums, counts))
+        return [total if count else None for total, count in zip(sums, counts)]
+    if array.dtype.kind == "f":
+        limits = (np.inf, -np.inf)
+    else:
+        info = np.iinfo(array.dtype)
+        limits = (info.max, info.min)
+    # Valor neutro: grupos sem valores ficam com ele e viram NULL pela contagem
+    extreme = np.full(groups, limits[0] if name == "MIN" else limits[1], dtype=array.dtype)
+    (np.minimum if name == "MIN" else np.maximum).at(extreme, codes, array)
+    return [value if count else None for value, count in zip(extreme.tolist(), counts)]
+
+
+class BatchHashAggregate(BatchOperator):
+    """
+    Agregação vetorizada: cada bloco é agrupado com NumPy (np.unique nos
+    grupos numéricos, bincount/ufunc.at nas agregações) e os estados de cada
+    bloco são combinados na tabela hash dos grupos, como na fase final do
+    HashAggregate. Colunas de texto usam o laço Python das funções.
+    """
+
+    def __init__(self, child, groups, aggregates, phase=None, batch_size=DEFAULT_BATCH_SIZE):
+        self.child = child
+        self.children = (child,)
+        self.groups = list(groups)
+        self.aggregates = list(aggregates)
+        self.phase = phase
+        self.batch_size = batch_size
+        self.columns = self.groups + self.aggregates
+        self.functions = [aggregate_function(aggregate) for aggregate in aggregates]
+        positions = column_positions(child.columns)
+        self.group_positions = [positions[column_key(ref)] for ref in groups]
+        if phase == FINAL_AGGREGATION:
+            self.value_positions = [positions[column_key(agg)] for agg in aggregates]
+        else:
+            self.value_positions = [
+                None if agg.argument is None else positions[column_key(agg.argument)]
+                for agg in aggregates
+            ]
+
+    def batches(self):
+        functions = self.functions
+        table = {}
+        for batch in self.child.batches():
+            if not batch.size:
+                continue
+            if self.phase == FINAL_AGGREGATION:
+                self._combine_rows(table, batch)
+                continue
+            codes, keys = _factorize([batch.arrays[i] for i in self.group_positions], batch.size)
+            partial = [
+                _group_states(f, None if p is None else batch.arrays[p], codes, len(keys))
+                for f, p in zip(functions, self.value_positions)
+            ]
+            for code, key in enumerate(keys):
+                states = table.get(key)
+                if states is None:
+                    table[key] = [column[code] for column in partial]
+                else:
+                    for i, f in enumerate(functions):
+                        states[i] = f.merge(states[i], partial[i][code])
+
+        if not table and not self.group_positions:
+            table[()] = [f.initial for f in functions]  # Sem GROUP BY sempre há uma linha
+        if self.phase == PARTIAL_AGGREGATION:
+            rows = [key + tuple(states) for key, states in table.items()]
+        else:
+            rows = [
+                key + tuple(f.result(state) for f, state in zip(functions, states))
+                for key, states in table.items()
+            ]
+        for start in range(0, len(rows), self.batch_size):
+            yield rows_to_batch(self.columns, rows[start : start + self.batch_size])
+
+    def _combine_rows(self, table, batch):
+        for row in batch.rows():
+            key = tuple(row[i] for i in self.group_positions)
+            states = table.get(key)
+            if states is None:
+                states = table[key] = [f.initial for f in self.functions]
+            for i, (f, p) in enumerate(zip(self.functions, self.value_positions)):
+                states[i] = f.merge(states[i], row[p])
+
+    def describe(self):
+        aggregates = ", ".join(map(str, self.aggregates))
+        if self.groups:
+            aggregates = f"{', '.join(map(str, self.groups))}; {aggregates}"
+        return f"BatchHashAggregate({aggregates})"
+
+
+class BatchSort(BatchOperator):
+    """
+    ORDER BY com LIMIT opcional. Com LIMIT só as ``limit`` primeiras linhas
+    vistas até agora ficam guardadas: cada bloco novo é juntado a elas e
+    reduzido de novo, então a memória é de um bloco mais o limite.
+    """
+
+    def __init__(self, child, positions, descending, limit=None):
+        self.child = child
+        self.children = (child,)
+        self.columns = child.columns
+        self.positions = positions
+        self.descending = descending
+        self.limit = limit
+
+    def batches(self):
+        if not self.positions:
+            yield from self._first(self.child.batches())
+            return
+        if self.limit is None:
+            kept = concat_batches(self.columns, self.child.batches())
+        else:
+            kept = concat_batches(self.columns, [])
+            for batch in self.child.batches():
+                kept = concat_batches(self.columns, [kept, batch])
+                if kept.size > self.limit:
+                    kept = kept.take(self._order(kept)[: self.limit])
+        if kept.size:
+            yield kept.take(self._order(kept)[: self.limit])
+
+    def _first(self, batches):
+        remaining = self.limit
+        for batch in batches:
+            if remaining <= 0:
+                return
+            if batch.size > remaining:
+                batch = batch.take(np.arange(remaining))
+            remaining -= batch.size
+            yield batch
+
+    def _order(self, batch):
+        """Índices das linhas na ordem do ORDER BY (estável, NULL por último no ASC)"""
+        arrays = [batch.arrays[i] for i in self.positions]
+        if all(_is_numeric(array) for array in arrays):
+            keys = []  # np.lexsort usa a última chave como a principal
+            for array, desc in zip(reversed(arrays), reversed(self.descending)):
+                nulls = np.isnan(array) if array.dtype.kind == "f" else np.zeros(batch.size, bool)
+                values = np.where(nulls, 0, array)
+                keys.append(-values if desc else values)
+                keys.append(~nulls if desc else nulls)
+            return np.lexsort(keys)
+        rows = list(batch.rows())
+        key = sort_key(self.positions, self.descending)
+        return np.array(sorted(range(batch.size), key=lambda i: key(rows[i])), dtype=np.int64)
+
+    def describe(self):
+        keys = ", ".join(
+            f"{self.columns[i]}{' DESC' if desc else ''}"
+            for i, desc in zip(self.positions, self.descending)
+        )
+        limit = f", {self.limit}" if self.limit is not None else ""
+        return f"BatchSort({keys}{limit})"
+
+
+class BatchExecutionEngine:
+    """Versão vetorizada do ExecutionEngine: operadores trocam ColumnBatch"""
+
+    def __init__(self, source, batch_size=DEFAULT_BATCH_SIZE):
+        self.source = source
+        self.batch_size = batch_size
+        self.instrumentation = None  # Ver explain_analyze.py
+
+    def compile(self, operator_graph):
+        return self._compile_node(operator_graph.root)
+
+    def execute(self, operator_graph):
+        """Devolve (colunas, iterador de linhas) do resultado da consulta"""
+        root = self.compile(operator_graph)
+        return root.columns, iter(root)
+
+    def execute_batches(self, operator_graph):
+        """Devolve (colunas, iterador de ColumnBatch) do resultado da consulta"""
+        root = self.compile(operator_graph)
+        return root.columns, root.batches()
+
+    def _compile_node(self, node):
+        operator = self._build_operator(node)
+        if self.instrumentation is not None:
+            return self.instrumentation.wrap(node, operator)
+        return operator
+
+    def _build_operator(self, node):
+        expr = node.expr
+        children = [self._compile_node(child) for child in node.children]
+
+        if isinstance(expr, Table):
+            return BatchTableScan(self.source, expr.name, self.batch_size)
+        if isinstance(expr, Selection):
+            scan = getattr(children[0], "operator", children[0])  # Sem a instrumentação
+            if isinstance(scan, BatchTableScan):
+                scan.condition = expr.condition
+            return BatchFilter(children[0], expr.condition)
+        if isinstance(expr, Projection):
+            return BatchProject(children[0], expr.attributes)
+        if isinstance(expr, Aggregation):
+            return BatchHashAggregate(
+                children[0], expr.groups, expr.aggregates, expr.phase, self.batch_size
+            )
+        if isinstance(expr, Sort):
+            positions = column_positions(children[0].columns)
+            return BatchSort(
+                children[0],
+                [positions[column_key(item.expression)] for item in expr.keys],
+                [item.descending for item in expr.keys],
+                expr.limit,
+            )
+        if isinstance(expr, Join):
+            left, right = children
+            left_keys, right_keys, residual = split_equi_join(
+                expr.condition, left.columns, right.columns
+            )
+            if left_keys:
+                return BatchHashJoin(left, right, left_keys, right_keys, residual)
+            return BatchNestedLoopJoin(left, right, expr.condition, self.batch_size)
+
+        raise ValueError(f"Operador sem implementação física: {node.operator}")
@@ -0,0 +1,129 @@
+"""
+Compara o motor linha a linha (ExecutionEngine) com o vetorizado
+(BatchExecutionEngine) em varreduras analíticas sobre Pedido e
+Pedido_has_Produto gerados aleatoriamente.
+
+    python benchmark_batch.py [--rows 1000000] [--batch-size 65536] [--parallelism N]
+"""
+
+import argparse
+import random
+import time
+
+from batch_engine import DEFAULT_BATCH_SIZE, BatchExecutionEngine
+from data_sources import MemoryTableSource
+from execution_engine import ExecutionEngine
+from parallel_engine import DEFAULT_PARALLELISM, ParallelExecutionEngine
+from query_pipeline import QueryPipeline
+
+QUERIES = [
+    (
+        "Filtro + projeção",
+        "SELECT Pedido_has_Produto.Quantidade, Pedido_has_Produto.PrecoUnitario "
+        "FROM Pedido_has_Produto "
+        "WHERE Pedido_has_Produto.Quantidade > 5 AND Pedido_has_Produto.PrecoUnitario < 100",
+    ),
+    (
+        "Hash join",
+        "SELECT Pedido.DataPedido, Pedido_has_Produto.Quantidade "
+        "FROM Pedido_has_Produto "
+        "JOIN Pedido ON Pedido_has_Produto.Pedido_idPedido = Pedido.idPedido "
+        "WHERE Pedido.ValorTotalPedido > 250",
+    ),
+]
+
+
+class _ColumnarMemorySource(MemoryTableSource):
+    """Mesmos dados já em arrays, como uma fonte colunar entregaria"""
+
+    def __init__(self, tables):
+        super().__init__(tables)
+        from batch_engine import to_array
+
+        self.arrays = {
+            name: [to_array(list(column)) for column in zip(*rows)]
+            for name, rows in self.tables.items()
+        }
+
+    def scan_batches(self, table, batch_size, condition=None):
+        arrays = self.arrays[table]
+        total = len(arrays[0])
+        for start in range(0, total, batch_size):
+            yield [a[start : start + batch_size] for a in arrays]
+
+
+def generate_tables(rows, seed=42):
+    rng = random.Random(seed)
+    orders = max(rows // 4, 1)
+    pedido = [
+        (
+            i,
+            rng.randint(1, 5),
+            f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            round(rng.uniform(1, 500), 2),
+            rng.randint(1, 10000),
+        )
+        for i in range(1, orders + 1)
+    ]
+    itens = [
+        (
+            i,
+            rng.randint(1, orders),
+            rng.randint(1, 5000),
+            rng.randint(1, 10),
+            round(rng.uniform(1, 300), 2),
+        )
+        for i in range(1, rows + 1)
+    ]
+    return {"Pedido": pedido, "Pedido_has_Produto": itens}
+
+
+def _run(engine, graph):
+    start = time.perf_counter()
+    count = sum(1 for _ in engine.execute(graph)[1])
+    return time.perf_counter() - start, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--parallelism", type=int, default=DEFAULT_PARALLELISM)
+    args = parser.parse_args()
+
+    tables = generate_tables(args.rows)
+    input_rows = sum(len(rows) for rows in tables.values())
+    row_source = MemoryTableSource(tables)
+    columnar_source = _ColumnarMemorySource(tables)
+
+    engines = [
+        ("linha a linha", ExecutionEngine(row_source)),
+        ("lotes (linhas → arrays)", BatchExecutionEngine(row_source, args.batch_size)),
+        ("lotes (fonte colunar)", BatchExecutionEngine(columnar_source, args.batch_size)),
+        (
+            f"{args.parallelism} processos",
+            ParallelExecutionEngine(row_source, args.parallelism),
+        ),
+    ]
+
+    pipeline = QueryPipeline(cache_size=0)
+    print(f"{input_rows:,} linhas de entrada, lotes de {args.batch_size:,}\n")
+    for title, sql in QUERIES:
+        ok, message, result = pipeline.process(sql)
+        if not ok:
+            raise SystemExit(message)
+
+        print(title)
+        baseline = None
+        for name, engine in engines:
+            elapsed, count = _run(engine, result.graph)
+            baseline = baseline or elapsed
+            print(
+                f"  {name:<26} {elapsed:8.3f}s  {input_rows / elapsed:14,.0f} linhas/s"
+                f"  ({baseline / elapsed:5.1f}x, {count:,} no resultado)"
+            )
+        print()
+
+
+if __name__ == "__main__":
+    main()
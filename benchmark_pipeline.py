@@ -0,0 +1,355 @@
+"""
+Mede cada etapa do pipeline (parsing, álgebra, otimização, grafo, caminhos
+de acesso e plano) sobre esquemas e consultas sintéticos de complexidade
+crescente: número de junções, termos no WHERE e tamanho do catálogo.
+
+Os resultados (vazão, percentis de latência e alocações por chamada) são
+gravados em JSON; com ``--baseline`` a execução é comparada com uma anterior
+e as etapas que ficaram mais lentas além da tolerância são apontadas.
+
+    python benchmark_pipeline.py [--rounds 20] [--output atual.json]
+    python benchmark_pipeline.py --baseline base.json [--tolerance 0.25]
+"""
+
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from algebra_converter import AlgebraConverter
+from cost_model import CardinalityEstimator
+from execution_planner import ExecutionPlanner
+from graph_builder import GraphBuilder
+from metadata import Catalog, get_catalog, set_catalog
+from query_optimizer import QueryOptimizer
+from sql_parser import SQLParser
+
+RESULTS_VERSION = 1
+STAGES = ("parse", "convert", "optimize", "build_graph", "access_paths", "create_plan")
+PERCENTILES = (50, 90, 99)
+
+# Cenário base; cada eixo varia sozinho a partir dele
+BASE_SCENARIO = {"tables": 20, "joins": 2, "conjuncts": 2}
+AXES = {
+    "joins": (0, 1, 2, 4, 6, 8),
+    "conjuncts": (1, 2, 4, 8, 16, 32),
+    "tables": (10, 100, 1000),
+}
+
+DEFAULT_ROUNDS = 20
+DEFAULT_QUERIES = 25  # Consultas distintas por cenário
+DEFAULT_TOLERANCE = 0.25  # Lentidão relativa aceita antes de apontar regressão
+_OPERATORS = ("=", "<>", "<", ">", "<=", ">=")
+
+
+def make_schema(tables, columns=6, seed=0):
+    """
+    Esquema em árvore: T0..Tn-1 com chave ``id``, colunas ``c1..ck`` e uma
+    chave estrangeira para uma tabela anterior (o grafo de FKs é conexo).
+    """
+    rng = random.Random(seed)
+    schema = {}
+    for i in range(tables):
+        definition = {
+            "columns": ["id"] + [f"c{j}" for j in range(1, columns + 1)],
+            "primary_key": "id",
+        }
+        if i:
+            parent = rng.randrange(i)
+            definition["columns"].append(f"T{parent}_id")
+            definition["foreign_keys"] = {f"T{parent}_id": (f"T{parent}", "id")}
+        schema[f"T{i}"] = definition
+    return schema
+
+
+def _neighbours(schema):
+    edges = {name: [] for name in schema}
+    for name, definition in schema.items():
+        for fk, (target, pk) in definition.get("foreign_keys", {}).items():
+            condition = f"{name}.{fk} = {target}.{pk}"
+            edges[name].append((target, condition))
+            edges[target].append((name, condition))
+    return edges
+
+
+def make_query(schema, joins, conjuncts, rng, edges=None):
+    """Consulta com ``joins`` junções por FK a partir de uma tabela aleatória"""
+    edges = edges or _neighbours(schema)
+    joins = min(joins, len(schema) - 1)
+    chosen = [rng.choice(list(schema))]
+    clauses = []
+    while len(clauses) < joins:
+        frontier = [
+            (target, condition)
+            for table in chosen
+            for target, condition in edges[table]
+            if target not in chosen
+        ]
+        target, condition = rng.choice(frontier)
+        chosen.append(target)
+        clauses.append(f"JOIN {target} ON {condition}")
+
+    columns = [f"{rng.choice(chosen)}.c{rng.randint(1, 6)}" for _ in range(3)]
+    terms = []
+    for _ in range(conjuncts):
+        column = f"{rng.choice(chosen)}.c{rng.randint(1, 6)}"
+        terms.append(f"{column} {rng.choice(_OPERATORS)} {rng.randint(1, 1000)}")
+
+    sql = f"SELECT {', '.join(dict.fromkeys(columns))} FROM {chosen[0]}"
+    if clauses:
+        sql += " " + " ".join(clauses)
+    if terms:
+        sql += " WHERE " + " AND ".join(terms)
+    return sql
+
+
+def scenarios():
+    """(nome, parâmetros) de cada cenário, sem repetir o cenário base"""
+    seen = set()
+    for axis, values in AXES.items():
+        for value in values:
+            params = dict(BASE_SCENARIO, **{axis: value})
+            key = tuple(sorted(params.items()))
+            if key in seen:
+                continue
+            seen.add(key)
+            name = " ".join(f"{k}={v}" for k, v in params.items())
+            yield name, params
+
+
+def percentile(sorted_values, p):
+    """Percentil pelo posto mais próximo (lista já ordenada)"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(p / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class _Stages:
+    """Componentes do pipeline para um catálogo; ``run`` executa uma etapa"""
+
+    def __init__(self, schema, seed):
+        rng = random.Random(seed)
+        estimator = CardinalityEstimator(
+            {name: rng.choice((10, 1_000, 100_000, 1_000_000)) for name in schema}
+        )
+        self.parser = SQLParser()
+        self.converter = AlgebraConverter()
+        self.optimizer = QueryOptimizer(estimator)
+        self.graph_builder = GraphBuilder()
+        self.planner = ExecutionPlanner()
+
+    def pipeline(self, sql):
+        """Gera (etapa, função sem argumentos) na ordem do pipeline"""
+        state = {}
+
+        def parse():
+            valid, message, statement = self.parser.parse(sql)
+            if not valid:
+                raise ValueError(f"{message}: {sql}")
+            state["statement"] = statement
+
+        def convert():
+            state["algebra"] = self.converter.convert(state["statement"])
+
+        def optimize():
+            state["optimized"] = self.optimizer.optimize(state["algebra"])
+
+        def build_graph():
+            state["graph"] = self.graph_builder.build_graph(state["optimized"])
+
+        def access_paths():
+            self.optimizer.choose_access_paths(state["graph"])
+
+        def create_plan():
+            self.planner.create_plan(state["graph"])
+
+        return zip(STAGES, (parse, convert, optimize, build_graph, access_paths, create_plan))
+
+
+def _time_stages(stages, queries, rounds):
+    latencies = {stage: [] for stage in STAGES}
+    for _ in range(rounds):
+        for sql in queries:
+            for stage, run in stages.pipeline(sql):
+                start = time.perf_counter_ns()
+                run()
+                latencies[stage].append(time.perf_counter_ns() - start)
+    return latencies
+
+
+def _measure_allocations(stages, queries):
+    """Pico de memória alocada e bytes retidos por chamada (uma rodada, com tracemalloc)"""
+    peaks = {stage: 0 for stage in STAGES}
+    retained = {stage: 0 for stage in STAGES}
+    tracemalloc.start()
+    try:
+        for sql in queries:
+            for stage, run in stages.pipeline(sql):
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                run()
+                current, peak = tracemalloc.get_traced_memory()
+                peaks[stage] += peak - before
+                retained[stage] += current - before
+    finally:
+        tracemalloc.stop()
+    calls = max(len(queries), 1)
+    return (
+        {stage: peaks[stage] / calls for stage in STAGES},
+        {stage: retained[stage] / calls for stage in STAGES},
+    )
+
+
+def summarize(latencies_ns):
+    """Vazão e percentis (µs) de uma lista de latências em nanossegundos"""
+    values = sorted(latencies_ns)
+    total = sum(values)
+    summary = {
+        "calls": len(values),
+        "total_s": total / 1e9,
+        "throughput_per_s": len(values) / (total / 1e9) if total else 0.0,
+        "mean_us": total / len(values) / 1e3 if values else 0.0,
+        "max_us": values[-1] / 1e3 if values else 0.0,
+    }
+    for p in PERCENTILES:
+        summary[f"p{p}_us"] = percentile(values, p) / 1e3
+    return summary
+
+
+def run_scenario(params, rounds=DEFAULT_ROUNDS, queries=DEFAULT_QUERIES, memory=True, seed=0):
+    """Resultados por etapa de um cenário; o catálogo global é restaurado no fim"""
+    schema = make_schema(params["tables"], seed=seed)
+    previous = get_catalog()
+    set_catalog(Catalog(schema))
+    try:
+        rng = random.Random(seed)
+        edges = _neighbours(schema)
+        sqls = [
+            make_query(schema, params["joins"], params["conjuncts"], rng, edges)
+            for _ in range(queries)
+        ]
+        stages = _Stages(schema, seed)
+        _time_stages(stages, sqls, 1)  # Aquecimento (imports, caches de compilação)
+
+        gc.collect()
+        latencies = _time_stages(stages, sqls, rounds)
+        results = {stage: summarize(latencies[stage]) for stage in STAGES}
+        if memory:
+            peaks, retained = _measure_allocations(stages, sqls)
+            for stage in STAGES:
+                results[stage]["peak_bytes"] = peaks[stage]
+                results[stage]["retained_bytes"] = retained[stage]
+        return results
+    finally:
+        set_catalog(previous)
+
+
+def run_benchmarks(rounds=DEFAULT_ROUNDS, queries=DEFAULT_QUERIES, memory=True, only=None, log=None):
+    """Documento JSON com os resultados de todos os cenários"""
+    results = {}
+    for name, params in scenarios():
+        if only and not any(part in name for part in only):
+            continue
+        if log is not None:
+            log(f"{name} ...")
+        results[name] = {"params": params, "stages": run_scenario(params, rounds, queries, memory)}
+    return {
+        "version": RESULTS_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"rounds": rounds, "queries": queries, "memory": memory},
+        "scenarios": results,
+    }
+
+
+def compare(current, baseline, tolerance=DEFAULT_TOLERANCE, metric="p50_us"):
+    """
+    Lista de (cenário, etapa, valor base, valor atual, razão) para as etapas
+    cuja ``metric`` piorou mais que ``tolerance`` em relação à base.
+    """
+    regressions = []
+    for name, scenario in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if base is None:
+            continue
+        for stage, stats in scenario["stages"].items():
+            before = base["stages"].get(stage, {}).get(metric)
+            after = stats.get(metric)
+            if not before or after is None:
+                continue
+            ratio = after / before
+            if ratio > 1 + tolerance:
+                regressions.append((name, stage, before, after, ratio))
+    return regressions
+
+
+def format_results(document, baseline=None):
+    lines = []
+    for name, scenario in document["scenarios"].items():
+        lines.append(name)
+        base = (baseline or {}).get("scenarios", {}).get(name)
+        for stage, stats in scenario["stages"].items():
+            line = (
+                f"  {stage:<13} {stats['throughput_per_s']:>11,.0f}/s"
+                f"  p50 {stats['p50_us']:>9.1f}µs  p90 {stats['p90_us']:>9.1f}µs"
+                f"  p99 {stats['p99_us']:>9.1f}µs"
+            )
+            if "peak_bytes" in stats:
+                line += f"  pico {stats['peak_bytes'] / 1024:>8.1f} KB"
+            if base is not None and stage in base["stages"]:
+                before = base["stages"][stage]["p50_us"]
+                if before:
+                    line += f"  ({stats['p50_us'] / before:5.2f}x da base)"
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS)
+    parser.add_argument("--queries", type=int, default=DEFAULT_QUERIES)
+    parser.add_argument("--only", action="append", help="Só cenários que contêm o texto")
+    parser.add_argument("--no-memory", action="store_true", help="Não mede alocações")
+    parser.add_argument("--output", help="Arquivo JSON para gravar os resultados")
+    parser.add_argument("--baseline", help="Resultados JSON de uma execução anterior")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    document = run_benchmarks(
+        args.rounds,
+        args.queries,
+        not args.no_memory,
+        args.only,
+        log=lambda message: print(message, file=sys.stderr),
+    )
+    print(format_results(document, baseline))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2, ensure_ascii=False)
+
+    if baseline is not None:
+        regressions = compare(document, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regressão(ões) acima de {args.tolerance:.0%}:")
+            for name, stage, before, after, ratio in regressions:
+                print(f"  {name} / {stage}: {before:.1f}µs → {after:.1f}µs ({ratio:.2f}x)")
+            return 1
+        print(f"\nSem regressões acima de {args.tolerance:.0%}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
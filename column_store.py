@@ -0,0 +1,427 @@
+"""
+Formato colunar em disco: um diretório por tabela e um arquivo por coluna.
+
+    <Tabela>/_table.json   linhas, tamanho do bloco e colunas (nome, tipo, arquivo,
+                           se os valores estão gravados em ordem)
+    <Tabela>/<coluna>.col  dados de largura fixa | rodapé JSON | tamanho | MAGIC
+
+Colunas numéricas guardam int64 (ou float64 com NaN para nulos); colunas de
+texto guardam códigos int32 de um dicionário ordenado (-1 = nulo). O rodapé
+traz o dicionário e o mapa de zonas: (min, max, nulos) de cada bloco.
+
+Converter CSV para o formato:
+
+    python column_store.py dados/ colunar/ [--chunk-rows 65536]
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from batch_engine import ColumnBatch
+from data_sources import CSVTableSource
+from execution_engine import _sort_value, column_key
+from metadata import (
+    get_primary_key,
+    get_sort_order,
+    get_table_columns,
+    normalize_table_name,
+    set_sort_order,
+)
+from sql_ast import BoolExpr, ColumnRef, Comparison, Literal
+
+MAGIC = b"PYCOL001"
+DEFAULT_CHUNK_ROWS = 64 * 1024
+TABLE_FILE = "_table.json"
+
+_TRAILER = struct.Struct("<Q8s")  # Tamanho do rodapé + MAGIC
+_DTYPES = {"int64": np.dtype("<i8"), "float64": np.dtype("<f8"), "string": np.dtype("<i4")}
+_FLIPPED = {"=": "=", "<>": "<>", "<": ">", ">": "<", "<=": ">=", ">=": "<="}
+
+
+def _sort_key(value):
+    # Dicionários podem misturar números e textos: números primeiro
+    return (isinstance(value, str), value)
+
+
+def _column_type(kinds):
+    """Tipo físico a partir dos tipos Python vistos na coluna"""
+    if str in kinds:
+        return "string"
+    if float in kinds or (int in kinds and type(None) in kinds):
+        return "float64"
+    if int in kinds:
+        return "int64"
+    return "float64"  # Coluna só com nulos
+
+
+def _zone_value(value):
+    if isinstance(value, (np.integer, np.floating)):
+        return value.item()
+    return value
+
+
+class ColumnWriter:
+    """Grava uma coluna bloco a bloco, acumulando o mapa de zonas"""
+
+    def __init__(self, path, column_type, dictionary=None):
+        self.path = path
+        self.column_type = column_type
+        self.dtype = _DTYPES[column_type]
+        self.dictionary = dictionary
+        self.codes = {value: i for i, value in enumerate(dictionary or ())}
+        self.zones = []
+        self.rows = 0
+        self.file = open(path, "wb")
+
+    def write_chunk(self, values):
+        if self.column_type == "string":
+            codes = np.fromiter(
+                (-1 if v is None else self.codes[v] for v in values),
+                dtype=self.dtype,
+                count=len(values),
+            )
+            present = codes[codes >= 0]
+            nulls = len(values) - len(present)
+            if len(present):
+                zone = [self.dictionary[present.min()], self.dictionary[present.max()], nulls]
+            else:
+                zone = [None, None, nulls]
+            array = codes
+        else:
+            array = np.array(
+                [np.nan if v is None else v for v in values], dtype=self.dtype
+            )
+            present = array[~np.isnan(array)] if self.column_type == "float64" else array
+            nulls = len(values) - len(present)
+            if len(present):
+                zone = [_zone_value(present.min()), _zone_value(present.max()), nulls]
+            else:
+                zone = [None, None, nulls]
+
+        self.file.write(array.tobytes())
+        self.zones.append(zone)
+        self.rows += len(values)
+
+    def close(self):
+        footer = json.dumps(
+            {
+                "type": self.column_type,
+                "rows": self.rows,
+                "zones": self.zones,
+                "dictionary": self.dictionary,
+            },
+            ensure_ascii=False,
+        ).encode("utf-8")
+        self.file.write(footer)
+        self.file.write(_TRAILER.pack(len(footer), MAGIC))
+        self.file.close()
+
+
+def write_table(directory, table, rows, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Grava a tabela no formato colunar. ``rows`` é um iterável reiniciável
+    (ou uma função que devolve um iterador): a primeira passada descobre os
+    tipos e o dicionário de cada coluna, a segunda grava bloco a bloco.
+    """
+    table = normalize_table_name(table)
+    columns = list(get_table_columns(table))
+    scan = rows if callable(rows) else (lambda: iter(rows))
+
+    kinds = [set() for _ in columns]
+    strings = [set() for _ in columns]
+    ordered = [True] * len(columns)  # Valores não decrescentes (ordem do ExternalSort)
+    previous = [None] * len(columns)
+    for row in scan():
+        for i, value in enumerate(row):
+            kinds[i].add(type(value))
+            if value is not None:
+                strings[i].add(value)
+            if ordered[i]:
+                current = _sort_value(value)
+                try:
+                    if previous[i] is not None and current < previous[i]:
+                        ordered[i] = False
+                except TypeError:
+                    ordered[i] = False  # Tipos que não se comparam: sem ordem
+                previous[i] = current
+
+    table_dir = os.path.join(directory, table)
+    os.makedirs(table_dir, exist_ok=True)
+    writers, descriptions = [], []
+    for i, name in enumerate(columns):
+        column_type = _column_type(kinds[i])
+        dictionary = sorted(strings[i], key=_sort_key) if column_type == "string" else None
+        filename = f"{name}.col"
+        writers.append(ColumnWriter(os.path.join(table_dir, filename), column_type, dictionary))
+        descriptions.append(
+            {"name": name, "type": column_type, "file": filename, "sorted": ordered[i]}
+        )
+
+    chunk = []
+    total = 0
+    for row in scan():
+        chunk.append(row)
+        if len(chunk) == chunk_rows:
+            for i, writer in enumerate(writers):
+                writer.write_chunk([r[i] for r in chunk])
+            total += len(chunk)
+            chunk = []
+    if chunk or not total:
+        for i, writer in enumerate(writers):
+            writer.write_chunk([r[i] for r in chunk])
+        total += len(chunk)
+    for writer in writers:
+        writer.close()
+
+    metadata = {"table": table, "rows": total, "chunk_rows": chunk_rows, "columns": descriptions}
+    with open(os.path.join(table_dir, TABLE_FILE), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=2)
+    return total
+
+
+def load_csv(source_directory, target_directory, tables=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Converte os CSVs de um diretório (ver CSVTableSource) para o formato colunar"""
+    source = CSVTableSource(source_directory)
+    loaded = {}
+    for table in tables or source.table_names():
+        loaded[table] = write_table(
+            target_directory, table, lambda t=table: source.scan(t), chunk_rows
+        )
+    return loaded
+
+
+class MappedColumn:
+    """Coluna mapeada em memória: os dados são uma visão NumPy do mmap, sem cópia"""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        size = len(self._mmap)
+        footer_size, magic = _TRAILER.unpack_from(self._mmap, size - _TRAILER.size)
+        if magic != MAGIC:
+            raise ValueError(f"Arquivo de coluna inválido: {path}")
+        footer_start = size - _TRAILER.size - footer_size
+        footer = json.loads(self._mmap[footer_start : footer_start + footer_size])
+
+        self.type = footer["type"]
+        self.rows = footer["rows"]
+        self.zones = footer["zones"]
+        self.data = np.frombuffer(self._mmap, dtype=_DTYPES[self.type], count=self.rows)
+        if self.type == "string":
+            # O último elemento (None) atende os códigos -1 na indexação
+            self.dictionary = np.array(footer["dictionary"] + [None], dtype=object)
+
+    def read(self, start, stop):
+        data = self.data[start:stop]
+        if self.type == "string":
+            return self.dictionary[data]
+        return data
+
+
+class _MappedTable:
+    def __init__(self, directory):
+        with open(os.path.join(directory, TABLE_FILE), encoding="utf-8") as f:
+            metadata = json.load(f)
+        self.rows = metadata["rows"]
+        self.chunk_rows = metadata["chunk_rows"]
+        self.columns = {
+            column["name"].lower(): MappedColumn(os.path.join(directory, column["file"]))
+            for column in metadata["columns"]
+        }
+        # Arquivos antigos não registram a ordem: nenhuma coluna ordenada
+        self.sorted_columns = [c["name"] for c in metadata["columns"] if c.get("sorted")]
+
+    @property
+    def chunks(self):
+        return -(-self.rows // self.chunk_rows)
+
+
+def _zone_may_match(op, zone, value):
+    low, high, _ = zone
+    if low is None:
+        return False  # Bloco só com nulos: nenhuma comparação é verdadeira
+    try:
+        if op == "=":
+            return low <= value <= high
+        if op == "<>":
+            return not (low == high == value)
+        if op == "<":
+            return low < value
+        if op == "<=":
+            return low <= value
+        if op == ">":
+            return high > value
+        if op == ">=":
+            return high >= value
+    except TypeError:
+        pass  # Tipos incomparáveis: o filtro decide
+    return True
+
+
+def chunk_may_match(condition, zones, chunk):
+    """
+    False quando o mapa de zonas garante que nenhuma linha do bloco satisfaz a
+    condição. ``zones`` mapeia column_key → lista de zonas da coluna.
+    """
+    if isinstance(condition, BoolExpr):
+        results = (chunk_may_match(e, zones, chunk) for e in condition.operands)
+        return all(results) if condition.op == "AND" else any(results)
+
+    if isinstance(condition, Comparison):
+        op, left, right = condition.op, condition.left, condition.right
+        if isinstance(right, ColumnRef) and isinstance(left, Literal):
+            op, left, right = _FLIPPED[op], right, left
+        if isinstance(left, ColumnRef) and isinstance(right, Literal):
+            column_zones = zones.get(column_key(left))
+            if column_zones is not None:
+                return _zone_may_match(op, column_zones[chunk], right.value)
+    return True
+
+
+class ColumnarTableSource:
+    """
+    Fonte de dados sobre o formato colunar. ``scan_batches`` entrega os arrays
+    mapeados diretamente ao motor vetorizado e, com a condição do σ acima do
+    scan, pula os blocos descartados pelo mapa de zonas.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._tables = {}
+        self.skipped_chunks = 0  # Blocos descartados pelos mapas de zonas
+
+    def __getstate__(self):
+        # Mapeamentos não atravessam processos; cada processo reabre os arquivos
+        state = self.__dict__.copy()
+        state["_tables"] = {}
+        return state
+
+    def table_names(self):
+        return [
+            entry
+            for entry in sorted(os.listdir(self.directory))
+            if os.path.exists(os.path.join(self.directory, entry, TABLE_FILE))
+        ]
+
+    def columns(self, table):
+        return list(get_table_columns(table))
+
+    def _table(self, table):
+        table = normalize_table_name(table)
+        mapped = self._tables.get(table)
+        if mapped is None:
+            for entry in os.listdir(self.directory):
+                if entry.lower() == table.lower():
+                    mapped = self._tables[table] = _MappedTable(
+                        os.path.join(self.directory, entry)
+                    )
+                    break
+            else:
+                raise FileNotFoundError(f"Tabela colunar '{table}' não encontrada")
+        return mapped
+
+    def _mapped_columns(self, table):
+        mapped = self._table(table)
+        return mapped, [mapped.columns[name.lower()] for name in self.columns(table)]
+
+    def row_count(self, table):
+        return self._table(table).rows
+
+    def sort_order(self, table):
+        """
+        Ordem em que ``scan`` entrega a tabela: a PK se os arquivos a guardam
+        ordenada, senão a primeira coluna ordenada (vazio se nenhuma)
+        """
+        sorted_columns = self._table(table).sorted_columns
+        primary_key = (get_primary_key(table) or "").lower()
+        for column in sorted_columns:
+            if column.lower() == primary_key:
+                return (column,)
+        return tuple(sorted_columns[:1])
+
+    def _ranges(self, table, condition=None, chunks=None):
+        """Intervalos [início, fim) de linhas dos blocos que podem ser relevantes"""
+        mapped, columns = self._mapped_columns(table)
+        zones = {}
+        if condition is not None:
+            table = normalize_table_name(table)
+            zones = {
+                column_key(ColumnRef(table, name)): column.zones
+                for name, column in zip(self.columns(table), columns)
+            }
+
+        start = stop = None
+        for chunk in chunks if chunks is not None else range(mapped.chunks):
+            if zones and not chunk_may_match(condition, zones, chunk):
+                self.skipped_chunks += 1
+                continue
+            chunk_start = chunk * mapped.chunk_rows
+            chunk_stop = min(chunk_start + mapped.chunk_rows, mapped.rows)
+            if start is not None and chunk_start == stop:
+                stop = chunk_stop  # Blocos vizinhos viram um só intervalo
+                continue
+            if start is not None:
+                yield start, stop
+            start, stop = chunk_start, chunk_stop
+        if start is not None:
+            yield start, stop
+
+    def scan_batches(self, table, batch_size, condition=None):
+        _, columns = self._mapped_columns(table)
+        for start, stop in self._ranges(table, condition):
+            for offset in range(start, stop, batch_size):
+                end = min(offset + batch_size, stop)
+                yield [column.read(offset, end) for column in columns]
+
+    def scan(self, table):
+        columns = [ColumnRef(table, name) for name in self.columns(table)]
+        for arrays in self.scan_batches(table, DEFAULT_CHUNK_ROWS):
+            yield from ColumnBatch(columns, arrays).rows()
+
+    def scan_partition(self, table, partition, partitions):
+        """Partições por blocos inteiros, para o ParallelExecutionEngine"""
+        mapped, columns = self._mapped_columns(table)
+        chunks = range(
+            mapped.chunks * partition // partitions,
+            mapped.chunks * (partition + 1) // partitions,
+        )
+        refs = [ColumnRef(table, name) for name in self.columns(table)]
+        for start, stop in self._ranges(table, chunks=chunks):
+            arrays = [column.read(start, stop) for column in columns]
+            yield from ColumnBatch(refs, arrays).rows()
+
+
+def declare_sort_orders(source, tables=None):
+    """
+    Registra no catálogo a ordem física das tabelas colunares, para que o
+    otimizador saiba que o scan já sai ordenado (ex: merge join sem ordenar)
+    """
+    declared = {}
+    for table in tables or source.table_names():
+        order = source.sort_order(table)
+        if tuple(get_sort_order(table)) != tuple(order):
+            set_sort_order(table, order)
+        declared[table] = order
+    return declared
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Converte CSV para o formato colunar")
+    parser.add_argument("source", help="Diretório com <Tabela>.csv")
+    parser.add_argument("target", help="Diretório de destino")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--table", action="append", dest="tables")
+    args = parser.parse_args()
+
+    for table, rows in load_csv(args.source, args.target, args.tables, args.chunk_rows).items():
+        print(f"{table}: {rows:,} linhas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+from algebra_expressions import Aggregation, Join, Projection, Selection, Sort, Table
+from metadata import get_foreign_keys, get_primary_key, normalize_column_name
+from sql_ast import BoolExpr, ColumnRef, Comparison
+
+DEFAULT_TABLE_ROWS = 1000
+
+# Seletividades clássicas (System R) quando não há estatísticas
+DEFAULT_SELECTIVITY = {
+    "=": 0.1,
+    "<>": 0.9,
+    "<": 1 / 3,
+    ">": 1 / 3,
+    "<=": 1 / 3,
+    ">=": 1 / 3,
+}
+
+
+class CardinalityEstimator:
+    """
+    Estimativas de cardinalidade usadas pelo otimizador.
+
+    Sem estatísticas coletadas, usa um número fixo de linhas por tabela
+    (configurável em ``table_rows``) e as seletividades padrão do System R;
+    junções FK → PK usam o catálogo para estimar 1 linha da tabela
+    referenciada por linha da tabela que contém a FK.
+    """
+
+    def __init__(self, table_rows=None, default_rows=DEFAULT_TABLE_ROWS):
+        self._table_rows = table_rows or {}
+        self.default_rows = default_rows
+
+    def table_rows(self, table):
+        return self._table_rows.get(table, self.default_rows)
+
+    def estimate_rows(self, expr):
+        """Cardinalidade estimada da saída de uma expressão algébrica"""
+        if isinstance(expr, Table):
+            return self.table_rows(expr.name)
+        if isinstance(expr, Selection):
+            return self.estimate_rows(expr.child) * self.selectivity(expr.condition)
+        if isinstance(expr, Projection):
+            return self.estimate_rows(expr.child)
+        if isinstance(expr, Join):
+            rows = self.estimate_rows(expr.left) * self.estimate_rows(expr.right)
+            if expr.condition is not None:
+                rows *= self.selectivity(expr.condition)
+            return rows
+        if isinstance(expr, Aggregation):
+            if not expr.groups:
+                return 1
+            groups = 1.0
+            for column in expr.groups:
+                groups *= self.distinct_values(column)
+            return min(groups, self.estimate_rows(expr.child))
+        if isinstance(expr, Sort):
+            rows = self.estimate_rows(expr.child)
+            return rows if expr.limit is None else min(rows, expr.limit)
+        return self.default_rows
+
+    def distinct_values(self, column):
+        """Número estimado de valores distintos da coluna (grupos de um GROUP BY)"""
+        if self._is_primary_key(column):
+            return self.table_rows(column.table)
+        return 1 / DEFAULT_SELECTIVITY["="]
+
+    def selectivity(self, expr):
+        """Fração das tuplas que satisfazem ``expr``"""
+        if isinstance(expr, BoolExpr):
+            selectivities = [self.selectivity(e) for e in expr.operands]
+            result = selectivities[0]
+            for s in selectivities[1:]:
+                if expr.op == "AND":
+                    result *= s
+                else:
+                    result = result + s - result * s
+            return result
+
+        if isinstance(expr, Comparison):
+            left, right = expr.left, expr.right
+            if isinstance(left, ColumnRef) and isinstance(right, ColumnRef):
+                if left.table != right.table:
+                    return self.join_selectivity(expr)
+            column = left if isinstance(left, ColumnRef) else right
+            if expr.op == "=" and isinstance(column, ColumnRef):
+                if self._is_primary_key(column):
+                    return 1 / max(self.table_rows(column.table), 1)
+            return DEFAULT_SELECTIVITY.get(expr.op, 1 / 3)
+
+        return 1.0
+
+    def join_selectivity(self, predicate):
+        """Seletividade de um predicado de junção entre duas tabelas"""
+        left, right = predicate.left, predicate.right
+        if predicate.op != "=":
+            return DEFAULT_SELECTIVITY.get(predicate.op, 1 / 3)
+
+        for fk, pk in ((left, right), (right, left)):
+            if self._references(fk, pk):
+                # Cada linha do lado FK casa com exatamente uma linha do lado PK
+                return 1 / max(self.table_rows(pk.table), 1)
+
+        return 1 / max(self.table_rows(left.table), self.table_rows(right.table), 1)
+
+    def _is_primary_key(self, column):
+        primary_key = get_primary_key(column.table)
+        return primary_key is not None and primary_key.lower() == column.column.lower()
+
+    def _references(self, fk, pk):
+        foreign_keys = get_foreign_keys(fk.table)
+        target = foreign_keys.get(normalize_column_name(fk.table, fk.column))
+        return (
+            target is not None
+            and target[0].lower() == pk.table.lower()
+            and target[1].lower() == pk.column.lower()
+        )
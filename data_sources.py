@@ -0,0 +1,124 @@
+import csv
+import os
+
+from metadata import get_table_columns, normalize_table_name
+
+
+def convert_value(text):
+    """Converte um campo de texto (CSV) para int, float, None ou str"""
+    if text == "":
+        return None
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+class MemoryTableSource:
+    """Tabelas mantidas em memória como listas de tuplas"""
+
+    def __init__(self, tables=None):
+        self.tables = {}
+        for name, rows in (tables or {}).items():
+            self.add_table(name, rows)
+
+    def add_table(self, name, rows):
+        self.tables[normalize_table_name(name)] = [tuple(row) for row in rows]
+
+    def table_names(self):
+        return list(self.tables)
+
+    def columns(self, table):
+        return list(get_table_columns(table))
+
+    def scan(self, table):
+        """Gera as linhas da tabela como tuplas na ordem das colunas"""
+        return iter(self.tables[normalize_table_name(table)])
+
+    def scan_partition(self, table, partition, partitions):
+        """Gera apenas o intervalo contíguo de linhas da partição"""
+        rows = self.tables[normalize_table_name(table)]
+        start = len(rows) * partition // partitions
+        end = len(rows) * (partition + 1) // partitions
+        return iter(rows[start:end])
+
+    def row_count(self, table):
+        return len(self.tables[normalize_table_name(table)])
+
+
+class CSVTableSource:
+    """
+    Diretório com um arquivo <Tabela>.csv por tabela, com cabeçalho.
+    As colunas são devolvidas na ordem do catálogo, não na do arquivo.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def table_names(self):
+        return [
+            os.path.splitext(entry)[0]
+            for entry in sorted(os.listdir(self.directory))
+            if entry.endswith(".csv")
+        ]
+
+    def columns(self, table):
+        return list(get_table_columns(table))
+
+    def path(self, table):
+        table = normalize_table_name(table)
+        for entry in os.listdir(self.directory):
+            name, extension = os.path.splitext(entry)
+            if extension == ".csv" and name.lower() == table.lower():
+                return os.path.join(self.directory, entry)
+        raise FileNotFoundError(f"Arquivo CSV da tabela '{table}' não encontrado")
+
+    def _positions(self, table, header):
+        header = [name.strip().lower() for name in header]
+        return [header.index(col.lower()) for col in self.columns(table)]
+
+    def scan(self, table):
+        with open(self.path(table), newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            positions = self._positions(table, next(reader))
+            for record in reader:
+                yield tuple(convert_value(record[i]) for i in positions)
+
+    def scan_partition(self, table, partition, partitions):
+        """
+        Lê só a faixa de bytes da partição: cada registro pertence à partição
+        em que começa. Supõe registros sem quebras de linha dentro de aspas.
+        """
+        path = self.path(table)
+        size = os.path.getsize(path)
+        start = size * partition // partitions
+        end = size * (partition + 1) // partitions
+
+        with open(path, "rb") as f:
+            header = f.readline()
+            positions = self._positions(table, next(csv.reader([header.decode("utf-8")])))
+            offset = len(header)
+            if start > offset:
+                # Descarta o registro que começou na partição anterior
+                f.seek(start - 1)
+                offset = start - 1 + len(f.readline())
+
+            def lines():
+                nonlocal offset
+                while offset < end:
+                    line = f.readline()
+                    if not line:
+                        return
+                    offset += len(line)
+                    yield line.decode("utf-8")
+
+            for record in csv.reader(lines()):
+                yield tuple(convert_value(record[i]) for i in positions)
+
+    def row_count(self, table):
+        with open(self.path(table), newline="", encoding="utf-8") as f:
+            return max(sum(1 for _ in csv.reader(f)) - 1, 0)
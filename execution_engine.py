@@ -0,0 +1,927 @@
+import heapq
+import operator
+from itertools import chain, groupby, islice
+
+from aggregation import aggregate_function
+from algebra_expressions import *
+from indexes import IndexJoinPath, IndexScanPath, IndexStore
+from metadata import get_sort_order, get_table_columns, normalize_table_name
+from predicate_compiler import COMPARATORS, PredicateCompiler, column_key, column_positions
+from spill import MemoryBudget, SpillFile, SpillMetrics, parse_size, row_size
+from sql_ast import ColumnRef, Comparison, conjuncts, make_bool
+
+NESTED_LOOP_BLOCK_SIZE = 1024
+GRACE_FANOUT = 16  # Partições por nível da Grace hash join
+GRACE_MAX_LEVELS = 4  # Níveis de reparticionamento antes de desistir de dividir
+SORT_MERGE_FANIN = 64  # Runs intercaladas de uma vez na ordenação externa
+
+class PhysicalOperator:
+    """
+    Operador físico no modelo Volcano: iterar sobre ele gera as linhas
+    (tuplas) sob demanda. ``columns`` descreve as colunas de cada tupla e
+    ``ordering`` as posições pelas quais a saída já sai ordenada (ASC).
+    """
+
+    columns = ()
+    children = ()
+    ordering = ()
+
+    def __iter__(self):
+        raise NotImplementedError
+
+    def describe(self):
+        return type(self).__name__
+
+
+class TableScan(PhysicalOperator):
+    def __init__(self, source, table):
+        self.source = source
+        self.table = normalize_table_name(table)
+        self.columns = [ColumnRef(self.table, c) for c in get_table_columns(self.table)]
+        self.ordering = _column_ordering(
+            self.table, self.columns, _scan_order(source, self.table)
+        )
+
+    def __iter__(self):
+        return iter(self.source.scan(self.table))
+
+    def describe(self):
+        return f"TableScan({self.table})"
+
+
+class IndexScan(PhysicalOperator):
+    """
+    Lê apenas as linhas da tabela que o índice indica para os termos do
+    caminho (sem termos, todas as linhas com chave), ordenadas pela chave
+    """
+
+    def __init__(self, indexes, path):
+        self.indexes = indexes
+        self.path = path
+        self.table = path.table
+        self.columns = [ColumnRef(self.table, c) for c in get_table_columns(self.table)]
+        self.ordering = _column_ordering(self.table, self.columns, [path.index.column])
+
+    def __iter__(self):
+        index = self.indexes.get(self.path.index)
+        try:
+            equals, low, low_inclusive, high, high_inclusive = self.path.bounds()
+            if equals is not None:
+                # Demais termos sobre a mesma coluna valem ou não para todas as linhas
+                if all(COMPARATORS[op](equals, v) for op, v in self.path.terms):
+                    return iter(index.lookup(equals))
+                return iter(())
+            if low is None and high is None:
+                return iter(index.scan())
+            return iter(index.range(low, low_inclusive, high, high_inclusive))
+        except TypeError:
+            return iter(())  # Limites de tipos incomparáveis: nenhuma linha
+
+    def describe(self):
+        return f"IndexScan({self.path.index.name}: {self.path.condition_text()})"
+
+
+def _scan_order(source, table):
+    """
+    Colunas pelas quais a fonte entrega a tabela ordenada: a própria fonte
+    sabe (``sort_order``, ex: arquivos colunares) ou vale a ordem declarada
+    no catálogo
+    """
+    sort_order = getattr(source, "sort_order", None)
+    if sort_order is not None:
+        return sort_order(table)
+    return get_sort_order(table)
+
+
+def _column_ordering(table, columns, names):
+    """Posições das colunas ``names`` da tabela, até a primeira que falta"""
+    positions = column_positions(columns)
+    ordering = []
+    for name in names:
+        position = positions.get((table.lower(), name.lower()))
+        if position is None:
+            break
+        ordering.append(position)
+    return tuple(ordering)
+
+
+class IndexLookup(PhysicalOperator):
+    """Lado interno de IndexNestedLoopJoin: linhas da chave definida pela junção"""
+
+    def __init__(self, indexes, definition, table):
+        self.indexes = indexes
+        self.definition = definition
+        self.table = normalize_table_name(table)
+        self.columns = [ColumnRef(self.table, c) for c in get_table_columns(self.table)]
+        self.key = None
+
+    def __iter__(self):
+        return iter(self.indexes.get(self.definition).lookup(self.key))
+
+    def describe(self):
+        return f"IndexLookup({self.definition.name})"
+
+
+class Filter(PhysicalOperator):
+    def __init__(self, child, condition, predicate=None):
+        self.child = child
+        self.children = (child,)
+        self.condition = condition
+        self.columns = child.columns
+        self.ordering = child.ordering
+        self.predicate = predicate or compile_predicate(condition, self.columns)
+
+    def __iter__(self):
+        return filter(self.predicate, self.child)
+
+    def describe(self):
+        return f"Filter({self.condition})"
+
+
+class Project(PhysicalOperator):
+    def __init__(self, child, attributes):
+        self.child = child
+        self.children = (child,)
+        positions = column_positions(child.columns)
+        self.indexes = [positions[column_key(attr)] for attr in attributes]
+        self.columns = [child.columns[i] for i in self.indexes]
+        ordering = []
+        for position in child.ordering:
+            if position not in self.indexes:
+                break  # A ordem só vale até a primeira coluna descartada
+            ordering.append(self.indexes.index(position))
+        self.ordering = tuple(ordering)
+
+    def __iter__(self):
+        if len(self.indexes) == 1:
+            # itemgetter com um índice devolve o valor, não uma tupla
+            i = self.indexes[0]
+            return ((row[i],) for row in self.child)
+        getter = operator.itemgetter(*self.indexes)
+        return (getter(row) for row in self.child)
+
+    def describe(self):
+        return f"Project({', '.join(map(str, self.columns))})"
+
+
+class NestedLoopJoin(PhysicalOperator):
+    """
+    Junção por laços aninhados em blocos: lê um bloco do lado esquerdo e
+    percorre o lado direito uma vez por bloco, sem materializá-lo.
+    """
+
+    def __init__(
+        self, left, right, condition, block_size=NESTED_LOOP_BLOCK_SIZE, predicate=None
+    ):
+        self.left = left
+        self.right = right
+        self.children = (left, right)
+        self.condition = condition
+        self.block_size = block_size
+        self.columns = list(left.columns) + list(right.columns)
+        if predicate is None and condition is not None:
+            predicate = compile_predicate(condition, self.columns)
+        self.predicate = predicate
+
+    def __iter__(self):
+        predicate = self.predicate
+        outer = iter(self.left)
+        while True:
+            block = list(islice(outer, self.block_size))
+            if not block:
+                return
+            for inner_row in self.right:
+                for outer_row in block:
+                    row = outer_row + inner_row
+                    if predicate is None or predicate(row):
+                        yield row
+
+    def describe(self):
+        return f"NestedLoopJoin({self.condition})"
+
+
+class HashJoin(PhysicalOperator):
+    """
+    Equi-junção: monta uma tabela hash com o lado direito (build) e percorre
+    o esquerdo (probe). Predicados que não são igualdades entre os dois lados
+    são avaliados sobre as linhas combinadas.
+
+    Com um orçamento de memória, se o lado build não couber a junção passa a
+    ser uma Grace hash join: os dois lados são particionados por hash em
+    arquivos temporários e cada par de partições é juntado separadamente
+    (reparticionando as que ainda não couberem).
+    """
+
+    def __init__(
+        self,
+        left,
+        right,
+        left_keys,
+        right_keys,
+        residual=None,
+        predicate=None,
+        budget=None,
+        spill_dir=None,
+    ):
+        self.left = left
+        self.right = right
+        self.children = (left, right)
+        self.left_keys = left_keys  # Posições das chaves no lado esquerdo
+        self.right_keys = right_keys  # Posições das chaves no lado direito
+        self.residual = residual
+        self.columns = list(left.columns) + list(right.columns)
+        if predicate is None and residual is not None:
+            predicate = compile_predicate(residual, self.columns)
+        self.predicate = predicate
+        self.budget = budget
+        self.spill_dir = spill_dir
+        self.spill = SpillMetrics()
+
+    def __iter__(self):
+        if self.budget is not None:
+            return self._iter_with_budget()
+
+        right_key = _key_getter(self.right_keys)
+        table = {}
+        for row in self.right:
+            key = right_key(row)
+            if None not in key:
+                table.setdefault(key, []).append(row)
+        return self._probe(table, self.left)
+
+    def _probe(self, table, probe_rows):
+        left_key = _key_getter(self.left_keys)
+        residual = self.predicate
+        for left_row in probe_rows:
+            matches = table.get(left_key(left_row))
+            if not matches:
+                continue
+            for right_row in matches:
+                row = left_row + right_row
+                if residual is None or residual(row):
+                    yield row
+
+    def _iter_with_budget(self):
+        right_key = _key_getter(self.right_keys)
+        budget = self.budget
+        table, built, reserved = {}, [], 0
+        build_rows = iter(self.right)
+        try:
+            for row in build_rows:
+                key = right_key(row)
+                if None in key:
+                    continue
+                size = row_size(row)
+                if not budget.reserve(size):
+                    # Não coube: tudo o que já foi lido vai para as partições
+                    budget.release(reserved)
+                    reserved = 0
+                    table = None
+                    pending = chain(built, [row], build_rows)
+                    yield from self._grace(pending, iter(self.left), 0)
+                    return
+                reserved += size
+                built.append(row)
+                table.setdefault(key, []).append(row)
+            built = None
+            yield from self._probe(table, self.left)
+        finally:
+            budget.release(reserved)
+
+    def _partition(self, rows, keys, level):
+        key_of = _key_getter(keys)
+        files = [SpillFile(self.spill, self.spill_dir) for _ in range(GRACE_FANOUT)]
+        for row in rows:
+            key = key_of(row)
+            if None not in key:
+                # O nível entra no hash para que a repartição separe as chaves
+                files[hash((level, key)) % GRACE_FANOUT].write(row)
+        return files
+
+    def _grace(self, build_rows, probe_rows, level):
+        self.spill.passes = max(self.spill.passes, level + 1)
+        self.spill.partitions += GRACE_FANOUT
+        build_files = self._partition(build_rows, self.right_keys, level)
+        probe_files = self._partition(probe_rows, self.left_keys, level)
+        right_key = _key_getter(self.right_keys)
+
+        try:
+            for build, probe in zip(build_files, probe_files):
+                if not build.rows or not probe.rows:
+                    continue
+                size = build.memory
+                if level + 1 < GRACE_MAX_LEVELS and not self.budget.reserve(size):
+                    yield from self._grace(build, probe, level + 1)
+                    continue
+                # No último nível a partição é carregada mesmo acima do orçamento
+                # (uma única chave muito frequente não tem como ser dividida)
+                reserved = size if level + 1 < GRACE_MAX_LEVELS else 0
+                try:
+                    table = {}
+                    for row in build:
+                        table.setdefault(right_key(row), []).append(row)
+                    yield from self._probe(table, probe)
+                finally:
+                    self.budget.release(reserved)
+        finally:
+            for f in build_files + probe_files:
+                f.close()
+
+    def describe(self):
+        keys = ", ".join(
+            f"{self.left.columns[l]} = {self.right.columns[r]}"
+            for l, r in zip(self.left_keys, self.right_keys)
+        )
+        return f"HashJoin({keys})"
+
+
+class _Descending:
+    """Inverte a comparação de um valor da chave de ordenação (ordem DESC)"""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+def _sort_value(value):
+    # Números antes de textos, NULL por último; tipos diferentes nunca se comparam
+    if value is None:
+        return (2, 0)
+    if isinstance(value, (int, float)):
+        return (0, value)
+    return (1, value)
+
+
+def sort_key(positions, descending=None):
+    """Função de chave para ordenar linhas pelas posições (ASC/DESC por coluna)"""
+    descending = descending or [False] * len(positions)
+    pairs = tuple(zip(positions, descending))
+
+    def key(row):
+        return tuple(
+            _Descending(_sort_value(row[i])) if desc else _sort_value(row[i])
+            for i, desc in pairs
+        )
+
+    return key
+
+
+class ExternalSort(PhysicalOperator):
+    """
+    Ordenação com orçamento de memória: enquanto couber ordena em memória;
+    quando estoura, grava sequências ordenadas (runs) em arquivos temporários
+    e as intercala, em várias passadas se houver mais de SORT_MERGE_FANIN.
+    """
+
+    def __init__(self, child, positions, descending=None, budget=None, spill_dir=None):
+        self.child = child
+        self.children = (child,)
+        self.columns = child.columns
+        self.positions = positions
+        self.descending = descending or [False] * len(positions)
+        self.key = sort_key(positions, self.descending)
+        self.ordering = () if any(self.descending) else tuple(positions)
+        self.budget = budget
+        self.spill_dir = spill_dir
+        self.spill = SpillMetrics()
+
+    def __iter__(self):
+        if self.budget is None:
+            return iter(sorted(self.child, key=self.key))
+        return self._iter_with_budget()
+
+    def _iter_with_budget(self):
+        buffer, reserved, runs = [], 0, []
+        try:
+            for row in self.child:
+                size = row_size(row)
+                if not self.budget.reserve(size):
+                    if buffer:
+                        runs.append(self._write_run(sorted(buffer, key=self.key)))
+                    buffer = []
+                    self.budget.release(reserved)
+                    reserved = 0
+                    if not self.budget.reserve(size):
+                        runs.append(self._write_run([row]))
+                        continue
+                buffer.append(row)
+                reserved += size
+
+            buffer.sort(key=self.key)
+            if not runs:
+                yield from buffer
+                return
+
+            runs.append(self._write_run(buffer))
+            buffer = []
+            self.budget.release(reserved)
+            reserved = 0
+            self.spill.passes = 1
+            while len(runs) > SORT_MERGE_FANIN:
+                # Passada intermediária: intercala grupos de runs em runs maiores
+                self.spill.passes += 1
+                merged = []
+                for i in range(0, len(runs), SORT_MERGE_FANIN):
+                    group = runs[i : i + SORT_MERGE_FANIN]
+                    merged.append(self._write_run(heapq.merge(*group, key=self.key)))
+                    for run in group:
+                        run.close()
+                runs = merged
+            yield from heapq.merge(*runs, key=self.key)
+        finally:
+            self.budget.release(reserved)
+            for run in runs:
+                run.close()
+
+    def _write_run(self, rows):
+        run = SpillFile(self.spill, self.spill_dir)
+        for row in rows:
+            run.write(row)
+        self.spill.runs += 1
+        return run
+
+    def describe(self):
+        keys = ", ".join(
+            f"{self.columns[i]}{' DESC' if desc else ''}"
+            for i, desc in zip(self.positions, self.descending)
+        )
+        return f"ExternalSort({keys})"
+
+
+class MergeJoin(PhysicalOperator):
+    """
+    Equi-junção por intercalação: as duas entradas chegam ordenadas pelas
+    chaves (ver ``ordered``) e são percorridas uma única vez, juntando os
+    grupos de linhas com a mesma chave. A saída fica ordenada pelas chaves
+    do lado esquerdo.
+    """
+
+    def __init__(self, left, right, left_keys, right_keys, residual=None, predicate=None):
+        self.left = left
+        self.right = right
+        self.children = (left, right)
+        self.left_keys = left_keys
+        self.right_keys = right_keys
+        self.residual = residual
+        self.columns = list(left.columns) + list(right.columns)
+        self.ordering = tuple(left_keys)
+        if predicate is None and residual is not None:
+            predicate = compile_predicate(residual, self.columns)
+        self.predicate = predicate
+
+    def _groups(self, rows, keys):
+        raw_key, key = _key_getter(keys), sort_key(keys)
+        rows = (row for row in rows if None not in raw_key(row))
+        return groupby(rows, key=key)
+
+    def __iter__(self):
+        residual = self.predicate
+        left = self._groups(self.left, self.left_keys)
+        right = self._groups(self.right, self.right_keys)
+        left_group = next(left, None)
+        right_group = next(right, None)
+        while left_group is not None and right_group is not None:
+            left_key, left_rows = left_group
+            right_key, right_rows = right_group
+            if left_key < right_key:
+                left_group = next(left, None)
+            elif right_key < left_key:
+                right_group = next(right, None)
+            else:
+                matches = list(right_rows)
+                for left_row in left_rows:
+                    for right_row in matches:
+                        row = left_row + right_row
+                        if residual is None or residual(row):
+                            yield row
+                left_group = next(left, None)
+                right_group = next(right, None)
+
+    def describe(self):
+        keys = ", ".join(
+            f"{self.left.columns[l]} = {self.right.columns[r]}"
+            for l, r in zip(self.left_keys, self.right_keys)
+        )
+        return f"MergeJoin({keys})"
+
+
+class HashAggregate(PhysicalOperator):
+    """
+    Agregação por hash em fluxo: cada linha da entrada atualiza os estados do
+    seu grupo e só a tabela hash (uma entrada por grupo) fica em memória. Na
+    fase PARTIAL_AGGREGATION a saída traz os estados em vez dos resultados;
+    na FINAL_AGGREGATION a entrada são esses estados, vindos de partições
+    diferentes, e eles são combinados.
+
+    Com um orçamento de memória, quando a tabela não cabe os estados parciais
+    são gravados em GRACE_FANOUT partições por hash do grupo; no fim cada
+    partição é combinada separadamente (um grupo fica sempre na mesma).
+    """
+
+    def __init__(self, child, groups, aggregates, phase=None, budget=None, spill_dir=None):
+        self.child = child
+        self.children = (child,)
+        self.groups = list(groups)
+        self.aggregates = list(aggregates)
+        self.phase = phase
+        self.columns = self.groups + self.aggregates
+        self.functions = [aggregate_function(aggregate) for aggregate in aggregates]
+        positions = column_positions(child.columns)
+        self.group_positions = [positions[column_key(ref)] for ref in groups]
+        if phase == FINAL_AGGREGATION:
+            # A entrada tem um estado por agregação, na coluna da própria agregação
+            self.value_positions = [positions[column_key(agg)] for agg in aggregates]
+        else:
+            self.value_positions = [
+                None if agg.argument is None else positions[column_key(agg.argument)]
+                for agg in aggregates
+            ]
+        self.budget = budget
+        self.spill_dir = spill_dir
+        self.spill = SpillMetrics()
+
+    def __iter__(self):
+        combine = self.phase == FINAL_AGGREGATION
+        if self.budget is None:
+            table = self._accumulate(
+                {}, self.child, self.group_positions, self.value_positions, combine
+            )
+            return self._output(table)
+        return self._iter_with_budget(combine)
+
+    def _steps(self, value_positions, combine):
+        return [
+            (i, function.merge if combine else function.update, position)
+            for i, (function, position) in enumerate(zip(self.functions, value_positions))
+        ]
+
+    def _accumulate(self, table, rows, group_positions, value_positions, combine):
+        group_of = _key_getter(group_positions)
+        steps = self._steps(value_positions, combine)
+        initial = [function.initial for function in self.functions]
+        for row in rows:
+            key = group_of(row)
+            states = table.get(key)
+            if states is None:
+                states = table[key] = list(initial)
+            for i, step, position in steps:
+                # COUNT(*) não tem coluna: conta toda linha
+                states[i] = step(states[i], True if position is None else row[position])
+        return table
+
+    def _output(self, table):
+        if not table and not self.group_positions:
+            # Sem GROUP BY sempre há uma linha (COUNT = 0, demais NULL)
+            table[()] = [function.initial for function in self.functions]
+        if self.phase == PARTIAL_AGGREGATION:
+            for key, states in table.items():
+                yield key + tuple(states)
+            return
+        functions = self.functions
+        for key, states in table.items():
+            yield key + tuple(f.result(state) for f, state in zip(functions, states))
+
+    def _iter_with_budget(self, combine):
+        group_of = _key_getter(self.group_positions)
+        steps = self._steps(self.value_positions, combine)
+        initial = [function.initial for function in self.functions]
+        group_size = row_size(tuple(initial))
+        budget = self.budget
+        table, reserved, files = {}, 0, None
+        try:
+            for row in self.child:
+                key = group_of(row)
+                states = table.get(key)
+                if states is None:
+                    size = row_size(key) + group_size
+                    if not budget.reserve(size):
+                        if files is None:
+                            files = [
+                                SpillFile(self.spill, self.spill_dir) for _ in range(GRACE_FANOUT)
+                            ]
+                            self.spill.partitions = GRACE_FANOUT
+                            self.spill.passes = 1
+                        self._spill_states(table, files)
+                        table = {}
+                        budget.release(reserved)
+                        reserved = 0
+                        if budget.reserve(size):
+                            reserved = size
+                    else:
+                        reserved += size
+                    states = table[key] = list(initial)
+                for i, step, position in steps:
+                    states[i] = step(states[i], True if position is None else row[position])
+
+            if files is None:
+                yield from self._output(table)
+                return
+
+            self._spill_states(table, files)
+            table = None
+            budget.release(reserved)
+            reserved = 0
+            # Estados gravados: grupos nas primeiras colunas, um estado por agregação
+            width = len(self.group_positions)
+            group_positions = list(range(width))
+            state_positions = list(range(width, width + len(self.functions)))
+            for partition in files:
+                if partition.rows:
+                    yield from self._output(
+                        self._accumulate({}, partition, group_positions, state_positions, True)
+                    )
+        finally:
+            budget.release(reserved)
+            for partition in files or ():
+                partition.close()
+
+    def _spill_states(self, table, files):
+        for key, states in table.items():
+            files[hash(key) % GRACE_FANOUT].write(key + tuple(states))
+
+    def describe(self):
+        aggregates = ", ".join(map(str, self.aggregates))
+        if self.groups:
+            aggregates = f"{', '.join(map(str, self.groups))}; {aggregates}"
+        phase = f" [{self.phase}]" if self.phase is not None else ""
+        return f"HashAggregate({aggregates}){phase}"
+
+
+class TopN(PhysicalOperator):
+    """
+    ORDER BY ... LIMIT n: um heap com no máximo n linhas guarda as primeiras
+    na ordem pedida enquanto a entrada passa (memória O(n), não da entrada).
+    """
+
+    def __init__(self, child, positions, descending, limit):
+        self.child = child
+        self.children = (child,)
+        self.columns = child.columns
+        self.positions = positions
+        self.descending = descending
+        self.limit = limit
+        self.key = sort_key(positions, descending)
+        self.ordering = () if any(descending) else tuple(positions)
+
+    def __iter__(self):
+        # nsmallest mantém um heap de tamanho n e preserva a ordem dos empates
+        return iter(heapq.nsmallest(self.limit, self.child, key=self.key))
+
+    def describe(self):
+        keys = ", ".join(
+            f"{self.columns[i]}{' DESC' if desc else ''}"
+            for i, desc in zip(self.positions, self.descending)
+        )
+        return f"TopN({keys}, {self.limit})"
+
+
+class Limit(PhysicalOperator):
+    """Primeiras ``limit`` linhas da entrada, que já chega na ordem pedida (None = todas)"""
+
+    def __init__(self, child, limit):
+        self.child = child
+        self.children = (child,)
+        self.columns = child.columns
+        self.ordering = child.ordering
+        self.limit = limit
+
+    def __iter__(self):
+        return islice(self.child, self.limit)
+
+    def describe(self):
+        return f"Limit({self.limit if self.limit is not None else 'todas'})"
+
+
+def ordered(operator, positions, budget=None, spill_dir=None):
+    """O operador, se já sai ordenado pelas posições; senão um ExternalSort sobre ele"""
+    positions = tuple(positions)
+    if tuple(operator.ordering[: len(positions)]) == positions:
+        return operator
+    return ExternalSort(operator, list(positions), budget=budget, spill_dir=spill_dir)
+
+
+_DEFAULT_COMPILER = PredicateCompiler()
+
+
+def compile_predicate(condition, columns):
+    return _DEFAULT_COMPILER.compile(condition, columns)
+
+
+class IndexNestedLoopJoin(PhysicalOperator):
+    """
+    Para cada linha externa, busca as linhas internas pelo índice da coluna de
+    junção. O lado interno (π/σ sobre um IndexLookup) é reiterado por busca.
+    """
+
+    def __init__(self, left, right, inner_side, lookup, outer_key, residual=None, predicate=None):
+        self.left = left
+        self.right = right
+        self.children = (left, right)
+        self.inner_side = inner_side
+        self.lookup = lookup
+        self.outer = right if inner_side == 0 else left
+        self.inner = left if inner_side == 0 else right
+        self.outer_key = outer_key  # Posição da chave na linha externa
+        self.residual = residual
+        self.columns = list(left.columns) + list(right.columns)
+        if predicate is None and residual is not None:
+            predicate = compile_predicate(residual, self.columns)
+        self.predicate = predicate
+
+    def __iter__(self):
+        lookup, inner, predicate = self.lookup, self.inner, self.predicate
+        inner_first = self.inner_side == 0
+        for outer_row in self.outer:
+            key = outer_row[self.outer_key]
+            if key is None:
+                continue
+            lookup.key = key
+            for inner_row in inner:
+                row = inner_row + outer_row if inner_first else outer_row + inner_row
+                if predicate is None or predicate(row):
+                    yield row
+
+    def describe(self):
+        return f"IndexNestedLoopJoin({self.lookup.definition.name})"
+
+
+def _key_getter(indexes):
+    indexes = tuple(indexes)
+    return lambda row: tuple(row[i] for i in indexes)
+
+
+def split_equi_join(condition, left_columns, right_columns):
+    """
+    Separa a condição de junção em pares de chaves de igualdade
+    (posição à esquerda, posição à direita) e um predicado residual.
+    """
+    left_positions = column_positions(left_columns)
+    right_positions = column_positions(right_columns)
+    left_keys, right_keys, residual = [], [], []
+
+    for term in conjuncts(condition):
+        if (
+            isinstance(term, Comparison)
+            and term.op == "="
+            and isinstance(term.left, ColumnRef)
+            and isinstance(term.right, ColumnRef)
+        ):
+            a, b = column_key(term.left), column_key(term.right)
+            if a in left_positions and b in right_positions:
+                left_keys.append(left_positions[a])
+                right_keys.append(right_positions[b])
+                continue
+            if b in left_positions and a in right_positions:
+                left_keys.append(left_positions[b])
+                right_keys.append(right_positions[a])
+                continue
+        residual.append(term)
+
+    return left_keys, right_keys, make_bool("AND", residual) if residual else None
+
+
+class ExecutionEngine:
+    """Compila o grafo de operadores em operadores físicos e os executa"""
+
+    def __init__(
+        self, source, estimator=None, indexes=None, memory_budget=None, spill_dir=None
+    ):
+        self.source = source
+        self.compiler = PredicateCompiler(estimator)
+        self.indexes = indexes if indexes is not None else IndexStore(source)
+        self.memory_budget = parse_size(memory_budget)  # Bytes por consulta (None = livre)
+        self.spill_dir = spill_dir
+        self._budget = None
+        self.instrumentation = None  # Ver explain_analyze.py
+
+    def compile(self, operator_graph):
+        # Cada consulta tem o seu orçamento, dividido entre os operadores dela
+        self._budget = (
+            MemoryBudget(self.memory_budget) if self.memory_budget is not None else None
+        )
+        return self._compile_node(operator_graph.root)
+
+    def execute(self, operator_graph):
+        """Devolve (colunas, iterador de linhas) do resultado da consulta"""
+        root = self.compile(operator_graph)
+        return root.columns, iter(root)
+
+    def _compile_node(self, node):
+        operator = self._build_operator(node)
+        if self.instrumentation is not None:
+            return self.instrumentation.wrap(node, operator)
+        return operator
+
+    def _build_operator(self, node):
+        expr = node.expr
+        children = [self._compile_node(child) for child in node.children]
+
+        path = getattr(node, "access_path", None)
+        if isinstance(expr, Table):
+            if isinstance(path, IndexJoinPath):
+                return IndexLookup(self.indexes, path.index, expr.name)
+            if isinstance(path, IndexScanPath) and not path.terms:
+                return IndexScan(self.indexes, path)  # Leitura ordenada para um merge join
+            return TableScan(self.source, expr.name)
+        if isinstance(expr, Selection) and isinstance(path, IndexScanPath):
+            scan = IndexScan(self.indexes, path)
+            if path.residual is None:
+                return scan
+            predicate = self._predicate(node, path.residual, scan.columns)
+            return Filter(scan, path.residual, predicate)
+        if isinstance(expr, Selection):
+            child = children[0]
+            predicate = self._predicate(node, expr.condition, child.columns)
+            return Filter(child, expr.condition, predicate)
+        if isinstance(expr, Projection):
+            return Project(children[0], expr.attributes)
+        if isinstance(expr, Aggregation):
+            aggregate = HashAggregate(
+                children[0],
+                expr.groups,
+                expr.aggregates,
+                expr.phase,
+                self._budget,
+                self.spill_dir,
+            )
+            node.spill = aggregate.spill
+            return aggregate
+        if isinstance(expr, Sort):
+            return self._sort(node, expr, children[0])
+        if isinstance(expr, Join):
+            left, right = children
+            left_keys, right_keys, residual = split_equi_join(
+                expr.condition, left.columns, right.columns
+            )
+            columns = list(left.columns) + list(right.columns)
+            if isinstance(path, IndexJoinPath):
+                outer = right if path.inner_side == 0 else left
+                inner = children[path.inner_side]
+                while inner.children:
+                    inner = inner.children[0]
+                inner = getattr(inner, "operator", inner)  # Sem a instrumentação
+                outer_key = column_positions(outer.columns)[column_key(path.outer_key)]
+                predicate = self._predicate(node, path.residual, columns)
+                return IndexNestedLoopJoin(
+                    left, right, path.inner_side, inner, outer_key, path.residual, predicate
+                )
+            if left_keys and expr.method == MERGE_JOIN:
+                predicate = self._predicate(node, residual, columns)
+                return MergeJoin(
+                    ordered(left, left_keys, self._budget, self.spill_dir),
+                    ordered(right, right_keys, self._budget, self.spill_dir),
+                    left_keys,
+                    right_keys,
+                    residual,
+                    predicate,
+                )
+            if left_keys and expr.method != NESTED_LOOP_JOIN:
+                predicate = self._predicate(node, residual, columns)
+                join = HashJoin(
+                    left,
+                    right,
+                    left_keys,
+                    right_keys,
+                    residual,
+                    predicate,
+                    self._budget,
+                    self.spill_dir,
+                )
+                node.spill = join.spill
+                return join
+            predicate = self._predicate(node, expr.condition, columns)
+            return NestedLoopJoin(left, right, expr.condition, predicate=predicate)
+
+        raise ValueError(f"Operador sem implementação física: {node.operator}")
+
+    def _sort(self, node, expr, child):
+        positions = column_positions(child.columns)
+        keys = [positions[column_key(item.expression)] for item in expr.keys]
+        descending = [item.descending for item in expr.keys]
+        if not any(descending) and tuple(child.ordering[: len(keys)]) == tuple(keys):
+            return Limit(child, expr.limit)  # Já sai ordenado (ex: merge join, ordem física)
+        if expr.limit is not None:
+            return TopN(child, keys, descending, expr.limit)
+        sort = ExternalSort(child, keys, descending, self._budget, self.spill_dir)
+        node.spill = sort.spill
+        return sort
+
+    def _predicate(self, node, condition, columns):
+        """
+        Compila a condição uma única vez por nó do grafo e layout de colunas;
+        como o grafo fica no QueryCache, reexecuções reutilizam o código gerado.
+        """
+        if condition is None:
+            return None
+        key = (condition, tuple(column_key(ref) for ref in columns))
+        predicate = node.compiled.get(key)
+        if predicate is None:
+            predicate = node.compiled[key] = self.compiler.compile(condition, columns)
+        return predicate
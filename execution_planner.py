@@ -1,9 +1,28 @@
+from algebra_expressions import HASH_JOIN, MERGE_JOIN, NESTED_LOOP_JOIN, Aggregation, Sort
+from indexes import IndexJoinPath, IndexScanPath, presorted
+from sql_ast import ColumnRef, Comparison, conjuncts
+
+
+_JOIN_METHODS = {
+    HASH_JOIN: "hash join (tabela hash com a entrada direita)",
+    MERGE_JOIN: "merge join (entradas ordenadas pelas chaves)",
+    NESTED_LOOP_JOIN: "laços aninhados",
+}
+
+
 class ExecutionStep:
-    def __init__(self, step_number, operation, details, dependencies=None):
+    def __init__(self, step_number, operation, details, dependencies=None, node=None):
         self.step_number = step_number
         self.operation = operation
         self.details = details
         self.dependencies = dependencies if dependencies else []
+        self.node = node  # Nó do grafo (métricas da execução ficam nele)
+
+    @property
+    def spill(self):
+        """SpillMetrics da última execução, se o passo precisou usar o disco"""
+        metrics = getattr(self.node, "spill", None)
+        return metrics if metrics is not None and metrics.spilled else None
 
     def __str__(self):
         deps = (
@@ -11,54 +30,217 @@ class ExecutionStep:
             if self.dependencies
             else ""
         )
-        return f"Passo {self.step_number}: {self.operation} - {self.details}{deps}"
+        spill = f" [disco: {self.spill}]" if self.spill else ""
+        return f"Passo {self.step_number}: {self.operation} - {self.details}{deps}{spill}"
+
+    def to_dict(self):
+        return {
+            "step": self.step_number,
+            "operation": self.operation,
+            "details": self.details,
+            "dependencies": list(self.dependencies),
+        }
+
+
+class ExecutionStage:
+    """
+    Grupo de passos executado em paralelo sobre as partições dos dados: um
+    scan com os filtros/projeções acima dele, ou uma junção com os operadores
+    acima dela até a próxima junção. Agregação e ordenação terminam no
+    coordenador, que combina as saídas de todas as partições.
+    """
+
+    def __init__(self, stage_number, description, dependencies=None, coordinator=False):
+        self.stage_number = stage_number
+        self.description = description
+        self.dependencies = dependencies if dependencies else []
+        self.coordinator = coordinator  # Roda uma vez, sobre as partições reunidas
+        self.steps = []
+
+    def __str__(self):
+        steps = ", ".join(str(step.step_number) for step in self.steps)
+        deps = (
+            f" (depende de: {', '.join(str(s.stage_number) for s in self.dependencies)})"
+            if self.dependencies
+            else ""
+        )
+        label = "passos" if len(self.steps) > 1 else "passo"
+        return f"Estágio {self.stage_number}: {label} {steps} - {self.description}{deps}"
+
+    def to_dict(self):
+        return {
+            "stage": self.stage_number,
+            "description": self.description,
+            "steps": [step.step_number for step in self.steps],
+            "dependencies": [stage.stage_number for stage in self.dependencies],
+        }
 
 
 class ExecutionPlan:
-    def __init__(self):
+    def __init__(self, parallelism=1):
         self.steps = []
+        self.stages = []
+        self.parallelism = parallelism  # Grau de paralelismo (partições por estágio)
 
     def add_step(self, step):
         self.steps.append(step)
 
-    def to_string(self):
+    def add_stage(self, stage):
+        self.stages.append(stage)
+
+    def schedule(self):
+        """
+        Agrupa os estágios em rodadas: cada rodada só depende das anteriores,
+        então seus estágios podem executar ao mesmo tempo.
+        """
+        level = {}
+        for stage in self.stages:  # Os estágios estão em pós-ordem
+            level[stage] = 1 + max((level[d] for d in stage.dependencies), default=0)
+        rounds = [[] for _ in range(max(level.values(), default=0))]
+        for stage in self.stages:
+            rounds[level[stage] - 1].append(stage)
+        return rounds
+
+    def to_dict(self):
+        return {
+            "parallelism": self.parallelism,
+            "steps": [step.to_dict() for step in self.steps],
+            "stages": [stage.to_dict() for stage in self.stages],
+            "schedule": [[stage.stage_number for stage in stages] for stages in self.schedule()],
+        }
+
+    def to_string(self, analysis=None):
+        """Com ``analysis`` (explain_analyze.AnalyzeReport) cada passo mostra o que ocorreu"""
         result = "PLANO DE EXECUÇÃO\n"
         result += "=" * 80 + "\n\n"
-        result += "Ordem de execução (sequencial, das folhas para a raiz):\n\n"
+        result += "Passos (das folhas para a raiz):\n\n"
 
         for step in self.steps:
-            result += str(step) + "\n"
+            actual = analysis.step_annotation(step.node) if analysis is not None else ""
+            result += str(step) + actual + "\n"
+
+        result += f"\nEstágios paralelos (grau de paralelismo: {self.parallelism}):\n\n"
+        for stage in self.stages:
+            result += str(stage) + "\n"
+
+        spilled = [step for step in self.steps if step.spill]
+        if spilled:
+            result += "\nUso de disco na última execução (orçamento de memória excedido):\n\n"
+            for step in spilled:
+                result += f"Passo {step.step_number}: {step.spill}\n"
+
+        result += "\nAgendamento:\n\n"
+        for i, stages in enumerate(self.schedule(), 1):
+            numbers = ", ".join(str(stage.stage_number) for stage in stages)
+            if len(stages) > 1:
+                result += f"Rodada {i}: estágios {numbers} (em paralelo)\n"
+            else:
+                result += f"Rodada {i}: estágio {numbers}\n"
 
         return result
 
 
 class ExecutionPlanner:
-    def __init__(self):
+    def __init__(self, parallelism=1):
         self.step_counter = 0
+        self.stage_counter = 0
+        self.parallelism = parallelism
 
     def create_plan(self, operator_graph):
-        plan = ExecutionPlan()
+        plan = ExecutionPlan(self.parallelism)
         self.step_counter = 0
+        self.stage_counter = 0
 
         self._traverse_postorder(operator_graph.root, plan)
 
         return plan
 
-    def _traverse_postorder(self, node, plan, parent_steps=None):
-        if parent_steps is None:
-            parent_steps = []
+    def _new_stage(self, plan, description, dependencies=None, coordinator=False):
+        self.stage_counter += 1
+        stage = ExecutionStage(self.stage_counter, description, dependencies, coordinator)
+        plan.add_stage(stage)
+        return stage
+
+    def _aggregation_details(self, expr):
+        aggregates = ", ".join(map(str, expr.aggregates))
+        if not expr.groups:
+            return f"Calcular {aggregates} sobre todas as tuplas"
+        groups = ", ".join(map(str, expr.groups))
+        return f"Agrupar por {groups} em tabela hash e calcular {aggregates}"
+
+    def _sort_details(self, node):
+        expr = node.expr
+        keys = ", ".join(map(str, expr.keys))
+        if not expr.keys:
+            return f"Devolver as primeiras {expr.limit} tuplas"
+        if presorted(node):
+            # Mesma verificação do ExecutionEngine: a entrada já vem ordenada
+            if expr.limit is None:
+                return f"Repassar as tuplas, que já chegam ordenadas por {keys}"
+            return f"Devolver as primeiras {expr.limit} tuplas, que já chegam ordenadas por {keys}"
+        if expr.limit is None:
+            return f"Ordenar tuplas por {keys}"
+        return f"Manter as {expr.limit} primeiras tuplas por {keys} em um heap limitado"
+
+    def _final_stage(self, plan, node, child_stage):
+        """Estágio do coordenador que recebe a agregação/ordenação de ``node``"""
+        if child_stage.coordinator:
+            return child_stage
+        if isinstance(node.expr, Aggregation):
+            description = (
+                f"agregação final no coordenador dos estados parciais "
+                f"de {self.parallelism} partição(ões)"
+            )
+        elif not node.expr.keys:
+            description = f"LIMIT {node.expr.limit} no coordenador"
+        elif node.expr.limit is not None:
+            description = (
+                f"top-{node.expr.limit} no coordenador sobre os top-{node.expr.limit} "
+                f"de {self.parallelism} partição(ões)"
+            )
+        else:
+            description = f"ordenação no coordenador de {self.parallelism} partição(ões)"
+        return self._new_stage(plan, description, [child_stage], coordinator=True)
+
+    def _join_stage_description(self, node):
+        condition = getattr(node.expr, "condition", None)
+        partitions = self.parallelism
+        if any(
+            isinstance(term, Comparison)
+            and term.op == "="
+            and isinstance(term.left, ColumnRef)
+            and isinstance(term.right, ColumnRef)
+            for term in conjuncts(condition)
+        ):
+            return f"junção em {partitions} partição(ões) redistribuídas por hash das chaves"
+        return f"junção em {partitions} partição(ões), entrada direita difundida"
 
+    def _traverse_postorder(self, node, plan):
+        """Devolve (número do passo, estágio) do nó"""
         current_dependencies = []
+        child_stages = []
 
         # Processar filhos primeiro
         for child in node.children:
-            child_step = self._traverse_postorder(child, plan, current_dependencies)
-            if child_step:
-                current_dependencies.append(child_step)
+            child_step, child_stage = self._traverse_postorder(child, plan)
+            current_dependencies.append(child_step)
+            child_stages.append(child_stage)
 
         self.step_counter += 1
 
-        if node.operator == "Tabela":
+        access_path = getattr(node, "access_path", None)
+
+        if node.operator == "Tabela" and isinstance(access_path, IndexScanPath):
+            step = ExecutionStep(
+                self.step_counter, "Scan por Índice", access_path.describe(), []
+            )
+
+        elif node.operator == "Tabela" and isinstance(access_path, IndexJoinPath):
+            step = ExecutionStep(
+                self.step_counter, "Acesso por Índice", access_path.describe(), []
+            )
+
+        elif node.operator == "Tabela":
             step = ExecutionStep(
                 self.step_counter,
                 "Scan de Tabela",
@@ -66,6 +248,25 @@ class ExecutionPlanner:
                 [],
             )
 
+        elif node.operator == "Seleção (σ)" and isinstance(access_path, IndexScanPath):
+            details = (
+                f"Filtrar tuplas usando condição: {access_path.residual}"
+                if access_path.residual is not None
+                else f"Condição atendida pelo índice '{access_path.index.name}'"
+            )
+            step = ExecutionStep(
+                self.step_counter, "Aplicar Seleção", details, current_dependencies
+            )
+
+        elif node.operator == "Junção (⋈)" and isinstance(access_path, IndexJoinPath):
+            step = ExecutionStep(
+                self.step_counter,
+                "Executar Junção com Índice",
+                f"Laços aninhados com o índice '{access_path.index.name}' "
+                f"usando condição: {node.details}",
+                current_dependencies,
+            )
+
         elif node.operator == "Seleção (σ)":
             step = ExecutionStep(
                 self.step_counter,
@@ -82,18 +283,48 @@ class ExecutionPlanner:
                 current_dependencies,
             )
 
-        elif node.operator == "Junção (⋈)":
+        elif isinstance(node.expr, Aggregation):
+            step = ExecutionStep(
+                self.step_counter,
+                "Agregar",
+                self._aggregation_details(node.expr),
+                current_dependencies,
+            )
+
+        elif isinstance(node.expr, Sort):
             step = ExecutionStep(
                 self.step_counter,
-                "Executar Junção",
-                f"Juntar tabelas usando condição: {node.details}",
+                "Ordenar" if node.expr.keys and not presorted(node) else "Limitar",
+                self._sort_details(node),
                 current_dependencies,
             )
 
+        elif node.operator == "Junção (⋈)":
+            details = f"Juntar tabelas usando condição: {node.details}"
+            method = _JOIN_METHODS.get(getattr(node.expr, "method", None))
+            if method is not None:
+                details += f" por {method}"
+            step = ExecutionStep(
+                self.step_counter, "Executar Junção", details, current_dependencies
+            )
+
         else:
             step = ExecutionStep(
                 self.step_counter, node.operator, node.details, current_dependencies
             )
 
+        step.node = node
         plan.add_step(step)
-        return self.step_counter
+
+        if not child_stages:
+            stage = self._new_stage(
+                plan, f"scan de '{node.details}' em {self.parallelism} partição(ões)"
+            )
+        elif isinstance(node.expr, (Aggregation, Sort)):
+            stage = self._final_stage(plan, node, child_stages[0])
+        elif len(child_stages) == 1:
+            stage = child_stages[0]  # Operador unário roda no estágio do filho
+        else:
+            stage = self._new_stage(plan, self._join_stage_description(node), child_stages)
+        stage.steps.append(step)
+        return self.step_counter, stage
@@ -0,0 +1,341 @@
+"""
+EXPLAIN ANALYZE: executa a consulta com cada operador físico instrumentado e
+relata, por nó do grafo, tempo de relógio e de CPU, linhas de entrada e
+saída, lotes, pico de memória e cardinalidade estimada versus real.
+
+A instrumentação só existe quando pedida: os motores apenas consultam
+``instrumentation`` ao compilar o plano, então a execução normal não paga
+nada por linha.
+
+    report = explain_analyze(ExecutionEngine(fonte), result.graph)
+    print(report.to_text())
+    report.to_json()
+    result.graph.render_graphviz("grafo", analysis=report)
+"""
+
+import json
+import time
+import tracemalloc
+
+from cost_model import CardinalityEstimator
+
+# Cores do mapa de calor: nós sem tempo relevante → nós que dominam a consulta
+_COLD = (0xFF, 0xFF, 0xFF)
+_HOT = (0xE5, 0x39, 0x35)
+
+
+class OperatorStats:
+    def __init__(self, operator):
+        self.operator = operator  # Operador físico (sem o invólucro)
+        self.wall_time = 0.0  # Segundos, incluindo os filhos
+        self.cpu_time = 0.0
+        self.rows = 0  # Linhas produzidas (somando todas as execuções)
+        self.batches = 0
+        self.loops = 0  # Vezes que o operador foi iterado (lado interno de junções)
+        self.peak_memory = 0  # Bytes alocados a mais no pior momento
+
+
+class Instrumentation:
+    """Mede as chamadas dos operadores; com ``memory`` usa tracemalloc"""
+
+    def __init__(self, memory=True):
+        self.memory = memory
+        self.stats = {}  # GraphNode -> OperatorStats
+        self._frames = []  # [memória no início, maior pico visto] por chamada aberta
+
+    def wrap(self, node, operator):
+        stats = self.stats[node] = OperatorStats(operator)
+        if hasattr(operator, "batches"):
+            return InstrumentedBatchOperator(operator, stats, self)
+        return InstrumentedOperator(operator, stats, self)
+
+    def enter(self):
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._frames:
+                # O pico do chamador até aqui seria perdido no reset
+                self._frames[-1][1] = max(self._frames[-1][1], peak)
+            tracemalloc.reset_peak()
+            self._frames.append([current, current])
+        return time.perf_counter(), time.process_time()
+
+    def exit(self, stats, token):
+        wall, cpu = token
+        stats.wall_time += time.perf_counter() - wall
+        stats.cpu_time += time.process_time() - cpu
+        if self.memory:
+            start, seen = self._frames.pop()
+            peak = max(tracemalloc.get_traced_memory()[1], seen)
+            stats.peak_memory = max(stats.peak_memory, peak - start)
+            if self._frames:
+                self._frames[-1][1] = max(self._frames[-1][1], peak)
+
+
+class InstrumentedOperator:
+    """Invólucro de um operador linha a linha que mede cada next()"""
+
+    def __init__(self, operator, stats, instrumentation):
+        self.operator = operator
+        self.stats = stats
+        self.instrumentation = instrumentation
+
+    @property
+    def columns(self):
+        return self.operator.columns
+
+    @property
+    def children(self):
+        return self.operator.children
+
+    @property
+    def ordering(self):
+        return getattr(self.operator, "ordering", ())
+
+    def describe(self):
+        return self.operator.describe()
+
+    def __iter__(self):
+        stats, instrumentation = self.stats, self.instrumentation
+        stats.loops += 1
+        iterator = None
+        while True:
+            token = instrumentation.enter()
+            try:
+                if iterator is None:
+                    iterator = iter(self.operator)
+                row = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                instrumentation.exit(stats, token)
+            stats.rows += 1
+            yield row
+
+
+class InstrumentedBatchOperator(InstrumentedOperator):
+    """Mesmo invólucro para operadores vetorizados: mede cada lote"""
+
+    def batches(self):
+        stats, instrumentation = self.stats, self.instrumentation
+        stats.loops += 1
+        iterator = None
+        while True:
+            token = instrumentation.enter()
+            try:
+                if iterator is None:
+                    iterator = iter(self.operator.batches())
+                batch = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                instrumentation.exit(stats, token)
+            stats.batches += 1
+            stats.rows += batch.size
+            yield batch
+
+    def __iter__(self):
+        for batch in self.batches():
+            yield from batch.rows()
+
+
+def _format_bytes(nbytes):
+    for unit in ("B", "KB", "MB"):
+        if nbytes < 1024:
+            return f"{nbytes:.0f} {unit}" if unit == "B" else f"{nbytes:.1f} {unit}"
+        nbytes /= 1024
+    return f"{nbytes:.1f} GB"
+
+
+def heat_color(share):
+    """Cor de preenchimento para a fração do tempo total gasta no nó"""
+    share = min(max(share, 0.0), 1.0)
+    channels = (round(c + (h - c) * share) for c, h in zip(_COLD, _HOT))
+    return "#" + "".join(f"{c:02X}" for c in channels)
+
+
+class NodeReport:
+    def __init__(self, node, stats, estimated_rows, children):
+        self.node = node
+        self.stats = stats
+        self.estimated_rows = estimated_rows
+        self.children = children
+        child_time = sum(c.stats.wall_time for c in children if c.stats is not None)
+        child_cpu = sum(c.stats.cpu_time for c in children if c.stats is not None)
+        self.self_time = max(stats.wall_time - child_time, 0.0) if stats else 0.0
+        self.self_cpu_time = max(stats.cpu_time - child_cpu, 0.0) if stats else 0.0
+        executed = [c.stats.rows for c in children if c.stats is not None]
+        self.rows_in = sum(executed) if executed else None
+        self.share = 0.0
+
+    def physical(self):
+        return self.stats.operator.describe() if self.stats else None
+
+    def to_dict(self):
+        stats = self.stats
+        result = {
+            "operator": self.node.operator,
+            "details": self.node.details,
+            "physical": self.physical(),
+            "estimated_rows": self.estimated_rows,
+            "actual_rows": stats.rows if stats else None,
+            "rows_in": self.rows_in,
+            "loops": stats.loops if stats else 0,
+            "batches": stats.batches if stats else 0,
+            "wall_time_ms": stats.wall_time * 1000 if stats else 0.0,
+            "self_time_ms": self.self_time * 1000,
+            "cpu_time_ms": stats.cpu_time * 1000 if stats else 0.0,
+            "self_cpu_time_ms": self.self_cpu_time * 1000,
+            "time_share": self.share,
+            "peak_memory_bytes": stats.peak_memory if stats else 0,
+        }
+        spill = getattr(self.node, "spill", None)
+        if spill is not None and spill.spilled:
+            result["spill"] = {
+                "bytes": spill.bytes_spilled,
+                "files": spill.files,
+                "partitions": spill.partitions,
+                "runs": spill.runs,
+                "passes": spill.passes,
+            }
+        result["children"] = [child.to_dict() for child in self.children]
+        return result
+
+    def summary(self, memory=True):
+        """Resumo de uma linha com as métricas do nó"""
+        stats = self.stats
+        if stats is None:
+            return "não executado"
+        estimated = (
+            f"{self.estimated_rows:,.0f}" if self.estimated_rows is not None else "?"
+        )
+        parts = [f"linhas estimadas {estimated} / reais {stats.rows:,}"]
+        if self.rows_in is not None:
+            parts.append(f"entrada {self.rows_in:,}")
+        if stats.loops > 1:
+            parts.append(f"{stats.loops:,} execuções")
+        if stats.batches:
+            parts.append(f"{stats.batches:,} lotes")
+        parts.append(
+            f"tempo {self.self_time * 1000:.3f} ms ({self.share:.1%}), "
+            f"total {stats.wall_time * 1000:.3f} ms"
+        )
+        parts.append(f"CPU {self.self_cpu_time * 1000:.3f} ms")
+        if memory:
+            parts.append(f"pico de memória {_format_bytes(stats.peak_memory)}")
+        return "; ".join(parts)
+
+
+class AnalyzeReport:
+    def __init__(self, operator_graph, instrumentation, estimator, wall_time, cpu_time, rows):
+        self.graph = operator_graph
+        self.memory = instrumentation.memory
+        self.wall_time = wall_time
+        self.cpu_time = cpu_time
+        self.rows = rows  # Linhas do resultado
+        self._reports = {}
+        self.root = self._build(operator_graph.root, instrumentation, estimator)
+        total = sum(report.self_time for report in self._reports.values()) or 1.0
+        for report in self._reports.values():
+            report.share = report.self_time / total
+
+    def _build(self, node, instrumentation, estimator):
+        children = [self._build(child, instrumentation, estimator) for child in node.children]
+        estimated = estimator.estimate_rows(node.expr) if node.expr is not None else None
+        stats = instrumentation.stats.get(node)
+        if stats is not None and not stats.loops:
+            stats = None  # Compilado mas nunca lido (ex.: tabela substituída pelo índice)
+        report = NodeReport(node, stats, estimated, children)
+        self._reports[node] = report
+        return report
+
+    def node_report(self, node):
+        return self._reports.get(node)
+
+    def time_share(self, node):
+        report = self._reports.get(node)
+        return report.share if report else 0.0
+
+    def node_color(self, node):
+        return heat_color(self.time_share(node))
+
+    def node_label(self, node):
+        """Linha extra para o rótulo do nó no grafo"""
+        report = self._reports.get(node)
+        if report is None or report.stats is None:
+            return ""
+        return f"{report.self_time * 1000:.2f} ms ({report.share:.0%}) · {report.stats.rows:,} linhas"
+
+    def step_annotation(self, node):
+        report = self._reports.get(node)
+        if report is None or report.stats is None:
+            return ""
+        return f" [real: {report.stats.rows:,} linhas, {report.self_time * 1000:.3f} ms]"
+
+    def to_dict(self):
+        return {
+            "wall_time_ms": self.wall_time * 1000,
+            "cpu_time_ms": self.cpu_time * 1000,
+            "rows": self.rows,
+            "plan": self.root.to_dict(),
+        }
+
+    def to_json(self, indent=2):
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=indent)
+
+    def to_text(self):
+        lines = [
+            "EXPLAIN ANALYZE",
+            "=" * 80,
+            f"Tempo total: {self.wall_time * 1000:.3f} ms (CPU {self.cpu_time * 1000:.3f} ms), "
+            f"{self.rows:,} linhas no resultado",
+            "",
+        ]
+        self._text(self.root, 0, lines)
+        return "\n".join(lines)
+
+    def _text(self, report, depth, lines):
+        indent = "  " * depth
+        physical = report.physical()
+        name = f"{report.node.operator}: {report.node.details}"
+        if physical:
+            name += f"  → {physical}"
+        lines.append(f"{indent}{name}")
+        lines.append(f"{indent}    {report.summary(self.memory)}")
+        spill = getattr(report.node, "spill", None)
+        if spill is not None and spill.spilled:
+            lines.append(f"{indent}    disco: {spill}")
+        for child in report.children:
+            self._text(child, depth + 1, lines)
+
+
+def explain_analyze(engine, operator_graph, estimator=None, memory=True):
+    """
+    Executa o grafo no motor (ExecutionEngine ou BatchExecutionEngine) com
+    instrumentação e devolve um AnalyzeReport. ``memory`` mede o pico de
+    memória com tracemalloc, o que deixa a execução mais lenta.
+    """
+    instrumentation = Instrumentation(memory)
+    started_tracing = memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    try:
+        wall, cpu = time.perf_counter(), time.process_time()
+        engine.instrumentation = instrumentation
+        try:
+            root = engine.compile(operator_graph)
+        finally:
+            engine.instrumentation = None
+        rows = sum(1 for _ in root)
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+
+    return AnalyzeReport(
+        operator_graph,
+        instrumentation,
+        estimator or CardinalityEstimator(),
+        wall,
+        cpu,
+        rows,
+    )
@@ -1,10 +1,10 @@
-import graphviz
+import os
 
 from algebra_expressions import *
 
 
 class GraphNode:
-    def __init__(self, operator, details, children=None):
+    def __init__(self, operator, details, children=None, expr=None):
         self.operator = (
             operator  # Tipo de operador (Projection, Selection, Join, Table)
         )
@@ -12,6 +12,10 @@ class GraphNode:
         # Filhos (operadores abaixo)
         self.children = children if children else []
         self.id = None  # ID único para o nó no grafo
+        self.expr = expr  # Expressão algébrica que originou o nó
+        self.compiled = {}  # Predicados compilados por layout de colunas
+        self.access_path = None  # Índice escolhido (ver indexes.AccessPathSelector)
+        self.spill = None  # SpillMetrics da última execução, se o operador usa disco
 
     def add_child(self, child):
         self.children.append(child)
@@ -22,22 +26,30 @@ class OperatorGraph:
         self.root = root  # Nó raiz (última operação)
         self.node_counter = 0  # Contador para IDs únicos
 
-    def render_graphviz(self, filename="query_graph", view=False):
+    def to_dot(self, analysis=None):
+        """Grafo no formato do graphviz (Digraph); ``.source`` traz o código DOT"""
+        import graphviz  # Só quem desenha o grafo precisa do graphviz
+
         dot = graphviz.Digraph(comment="Query Execution Graph")
         dot.attr(rankdir="TB")  # Top to Bottom
         dot.attr("node", shape="box", style="rounded,filled", fontname="Arial")
 
         # Configurar estilos
         self.node_counter = 0
-        self._add_nodes_to_graphviz(dot, self.root)
+        self._add_nodes_to_graphviz(dot, self.root, analysis=analysis)
+        return dot
+
+    def render_graphviz(self, filename="query_graph", view=False, analysis=None):
+        """Com ``analysis`` (explain_analyze.AnalyzeReport) os nós viram um mapa de calor do tempo"""
+        dot = self.to_dot(analysis)
 
         # Renderizar
-        output_path = f"/tmp/{filename}"
+        output_path = os.path.join("/tmp", filename)  # Caminhos absolutos são mantidos
         dot.render(output_path, format="png", cleanup=True, view=view)
 
         return f"{output_path}.png"
 
-    def _add_nodes_to_graphviz(self, dot, node, parent_id=None):
+    def _add_nodes_to_graphviz(self, dot, node, parent_id=None, analysis=None):
         """Adiciona nós recursivamente ao grafo Graphviz"""
         # Gerar ID único
         node.id = f"node_{self.node_counter}"
@@ -53,6 +65,12 @@ class OperatorGraph:
         elif node.operator == "Junção (⋈)":
             color = "#F3E5F5"  # Roxo claro
             label = f"⋈\n{node.details}"
+        elif node.operator == "Agregação (γ)":
+            color = "#FCE4EC"  # Rosa claro
+            label = f"γ\n{node.details}"
+        elif node.operator == "Ordenação (τ)":
+            color = "#E0F7FA"  # Ciano claro
+            label = f"τ\n{node.details}"
         elif node.operator == "Tabela":
             color = "#E8F5E9"  # Verde claro
             label = node.details
@@ -60,6 +78,17 @@ class OperatorGraph:
             color = "#F5F5F5"  # Cinza claro
             label = f"{node.operator}\n{node.details}"
 
+        if node.access_path is not None:
+            label += f"\n[índice {node.access_path.index.name}]"
+        elif getattr(node.expr, "method", None) is not None:
+            label += f"\n[{node.expr.method}]"
+
+        if analysis is not None:
+            color = analysis.node_color(node)
+            extra = analysis.node_label(node)
+            if extra:
+                label += f"\n{extra}"
+
         # Adicionar nó
         dot.node(node.id, label, fillcolor=color)
 
@@ -69,7 +98,7 @@ class OperatorGraph:
 
         # Processar filhos
         for child in node.children:
-            self._add_nodes_to_graphviz(dot, child, node.id)
+            self._add_nodes_to_graphviz(dot, child, node.id, analysis)
 
 
 class GraphBuilder:
@@ -80,22 +109,41 @@ class GraphBuilder:
     def _build_node(self, expr):
         if isinstance(expr, Projection):
             # Nó de projeção
-            attrs = ", ".join(expr.attributes)
-            node = GraphNode("Projeção (π)", attrs)
+            attrs = ", ".join(map(str, expr.attributes))
+            node = GraphNode("Projeção (π)", attrs, expr=expr)
             child = self._build_node(expr.child)
             node.add_child(child)
             return node
 
         elif isinstance(expr, Selection):
             # Nó de seleção
-            node = GraphNode("Seleção (σ)", expr.condition)
+            node = GraphNode("Seleção (σ)", str(expr.condition), expr=expr)
             child = self._build_node(expr.child)
             node.add_child(child)
             return node
 
+        elif isinstance(expr, Aggregation):
+            # Nó de agregação: grupos; funções
+            details = ", ".join(map(str, expr.aggregates))
+            if expr.groups:
+                details = f"{', '.join(map(str, expr.groups))}; {details}"
+            node = GraphNode("Agregação (γ)", details, expr=expr)
+            node.add_child(self._build_node(expr.child))
+            return node
+
+        elif isinstance(expr, Sort):
+            # Nó de ordenação (e/ou LIMIT)
+            details = ", ".join(map(str, expr.keys))
+            if expr.limit is not None:
+                details = f"{details} LIMIT {expr.limit}".strip()
+            node = GraphNode("Ordenação (τ)", details, expr=expr)
+            node.add_child(self._build_node(expr.child))
+            return node
+
         elif isinstance(expr, Join):
             # Nó de junção
-            node = GraphNode("Junção (⋈)", expr.condition)
+            condition = str(expr.condition) if expr.condition is not None else "×"
+            node = GraphNode("Junção (⋈)", condition, expr=expr)
             left_child = self._build_node(expr.left)
             right_child = self._build_node(expr.right)
             node.add_child(left_child)
@@ -104,7 +152,7 @@ class GraphBuilder:
 
         elif isinstance(expr, Table):
             # Nó folha (tabela)
-            node = GraphNode("Tabela", expr.name)
+            node = GraphNode("Tabela", expr.name, expr=expr)
             return node
 
         else:
@@ -0,0 +1,112 @@
+"""
+Renderização do grafo de operadores fora da thread da interface.
+
+O DOT de cada plano é montado na thread principal (é barato) e o ``dot``
+roda numa thread de trabalho. As imagens ficam num diretório temporário,
+uma por hash do DOT, de modo que planos repetidos não são desenhados de
+novo; as menos usadas são apagadas quando o limite é atingido.
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_MAX_IMAGES = 64
+
+
+class GraphImageCache:
+    """Cache LRU de PNGs indexado pelo hash do código DOT"""
+
+    def __init__(self, directory=None, max_entries=DEFAULT_MAX_IMAGES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._owns_directory = directory is None
+        self._images = OrderedDict()  # hash -> caminho do PNG
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(source):
+        return hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+    def _directory(self):
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix="grafos-")
+        os.makedirs(self.directory, exist_ok=True)
+        return self.directory
+
+    def get(self, source):
+        """Caminho da imagem já desenhada para esse DOT (ou None)"""
+        key = self.key(source)
+        with self._lock:
+            path = self._images.get(key)
+            if path is None:
+                return None
+            if not os.path.exists(path):
+                del self._images[key]
+                return None
+            self._images.move_to_end(key)
+            return path
+
+    def render(self, source):
+        """Devolve o PNG do DOT, chamando o ``dot`` só se ainda não estiver no cache"""
+        path = self.get(source)
+        if path is not None:
+            return path
+
+        import graphviz
+
+        key = self.key(source)
+        path = graphviz.Source(source).render(
+            filename=key, directory=self._directory(), format="png", cleanup=True
+        )
+        with self._lock:
+            self._images[key] = path
+            self._images.move_to_end(key)
+            while len(self._images) > self.max_entries:
+                _, old = self._images.popitem(last=False)
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+        return path
+
+    def clear(self):
+        """Apaga todas as imagens (e o diretório, se foi criado pelo cache)"""
+        with self._lock:
+            paths = list(self._images.values())
+            self._images.clear()
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        if self._owns_directory and self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+
+
+class BackgroundRenderer:
+    """
+    Desenha grafos numa thread de trabalho. ``submit`` devolve um Future com
+    (caminho, resultado de ``postprocess(caminho)``); a interface deve buscar
+    o resultado na sua própria thread (por exemplo com ``Tk.after``).
+    """
+
+    def __init__(self, cache=None, workers=1):
+        self.cache = cache or GraphImageCache()
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="graphviz")
+
+    def submit(self, source, postprocess=None):
+        return self._executor.submit(self._render, source, postprocess)
+
+    def _render(self, source, postprocess):
+        path = self.cache.render(source)
+        return path, postprocess(path) if postprocess is not None else None
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.cache.clear()
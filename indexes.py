@@ -0,0 +1,512 @@
+import math
+from bisect import bisect_left, bisect_right
+from itertools import chain
+
+from algebra_expressions import *
+from cost_model import CardinalityEstimator
+from metadata import (
+    HASH_INDEX,
+    get_indexes,
+    get_sort_order,
+    get_table_columns,
+    normalize_table_name,
+)
+from predicate_compiler import column_key
+from sql_ast import ColumnRef, Comparison, Literal, conjuncts, make_bool
+
+# Custos relativos a ler uma linha numa varredura sequencial
+SEQUENTIAL_ROW_COST = 1.0
+INDEX_PROBE_COST = 4.0  # Uma busca no índice (inclui reiniciar o lado interno)
+INDEX_ROW_COST = 1.0  # Cada linha obtida pelo índice
+SORT_ROW_COST = 0.5  # Por linha e por nível de uma ordenação (n log n)
+
+
+def sort_cost(rows):
+    return rows * max(math.log2(max(rows, 1.0)), 1.0) * SORT_ROW_COST
+
+_FLIPPED = {"=": "=", "<": ">", ">": "<", "<=": ">=", ">=": "<="}
+
+
+def _kind(value):
+    """Números e textos ficam em listas ordenadas separadas (não são comparáveis)"""
+    if isinstance(value, (int, float)):
+        return "number"
+    return type(value).__name__
+
+
+class HashIndex:
+    def __init__(self, definition, rows, position):
+        self.definition = definition
+        self.entries = {}
+        for row in rows:
+            key = row[position]
+            if key is not None:
+                self.entries.setdefault(key, []).append(row)
+
+    def lookup(self, value):
+        try:
+            return self.entries.get(value, ())
+        except TypeError:
+            return ()
+
+
+class SortedIndex:
+    """
+    Índice ordenado (B-tree estático): chaves ordenadas e as linhas na mesma
+    ordem; igualdades e intervalos são resolvidos com busca binária.
+    """
+
+    def __init__(self, definition, rows, position):
+        self.definition = definition
+        groups = {}
+        for row in rows:
+            key = row[position]
+            if key is not None and key == key:  # NULL e NaN não entram
+                groups.setdefault(_kind(key), []).append((key, row))
+        self.keys = {}
+        self.rows = {}
+        for kind, entries in groups.items():
+            entries.sort(key=lambda entry: entry[0])
+            self.keys[kind] = [key for key, _ in entries]
+            self.rows[kind] = [row for _, row in entries]
+
+    def lookup(self, value):
+        return self.range(value, True, value, True)
+
+    def scan(self):
+        """Todas as linhas com chave, em ordem (números antes dos demais tipos)"""
+        kinds = sorted(self.rows, key=lambda kind: (kind != "number", kind))
+        return chain.from_iterable(self.rows[kind] for kind in kinds)
+
+    def range(self, low=None, low_inclusive=True, high=None, high_inclusive=True):
+        """Linhas com low <(=) chave <(=) high; None = sem limite"""
+        bound = low if low is not None else high
+        kind = _kind(bound)
+        if high is not None and _kind(high) != kind:
+            return []
+        keys = self.keys.get(kind)
+        if not keys:
+            return []
+        start = 0
+        if low is not None:
+            start = (bisect_left if low_inclusive else bisect_right)(keys, low)
+        stop = len(keys)
+        if high is not None:
+            stop = (bisect_right if high_inclusive else bisect_left)(keys, high)
+        return self.rows[kind][start:stop]
+
+
+class IndexStore:
+    """
+    Estruturas físicas dos índices do catálogo, construídas sob demanda com
+    uma varredura da fonte de dados e reaproveitadas entre consultas.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self._indexes = {}
+
+    def get(self, definition):
+        key = (definition.table.lower(), definition.column.lower(), definition.kind)
+        index = self._indexes.get(key)
+        if index is None:
+            table = normalize_table_name(definition.table)
+            columns = [c.lower() for c in get_table_columns(table)]
+            position = columns.index(definition.column.lower())
+            index_class = HashIndex if definition.kind == HASH_INDEX else SortedIndex
+            index = self._indexes[key] = index_class(
+                definition, self.source.scan(table), position
+            )
+        return index
+
+    def invalidate(self, table=None):
+        """Descarta os índices construídos (de uma tabela ou de todas)"""
+        if table is None:
+            self._indexes.clear()
+        else:
+            for key in [k for k in self._indexes if k[0] == table.lower()]:
+                del self._indexes[key]
+
+
+class IndexScanPath:
+    """Caminho de acesso escolhido para σ sobre uma tabela: leitura pelo índice"""
+
+    def __init__(self, index, table, terms, residual):
+        self.index = index  # IndexDefinition
+        self.table = table
+        self.terms = terms  # [(op, valor)] sobre a coluna indexada (vazio = índice todo)
+        self.residual = residual  # Restante da condição (ou None)
+
+    @property
+    def ordering(self):
+        """Ordem da saída: a coluna indexada (B-tree, ou igualdade em qualquer índice)"""
+        return ((self.table.lower(), self.index.column.lower()),)
+
+    def bounds(self):
+        """(igualdade, low, low_inclusive, high, high_inclusive) mais restritivos"""
+        equals = low = high = None
+        low_inclusive = high_inclusive = True
+        for op, value in self.terms:
+            if op == "=":
+                equals = value
+            elif op in (">", ">="):
+                if low is None or value > low or (value == low and op == ">"):
+                    low, low_inclusive = value, op == ">="
+            elif high is None or value < high or (value == high and op == "<"):
+                high, high_inclusive = value, op == "<="
+        return equals, low, low_inclusive, high, high_inclusive
+
+    def condition_text(self):
+        return " AND ".join(f"{self.index.column} {op} {value!r}" for op, value in self.terms)
+
+    def describe(self):
+        if not self.terms:
+            return (
+                f"Ler '{self.table}' inteira pelo índice '{self.index.name}' "
+                f"({self.index.kind}), em ordem de {self.index.column}"
+            )
+        return (
+            f"Ler '{self.table}' pelo índice '{self.index.name}' "
+            f"({self.index.kind}) com {self.condition_text()}"
+        )
+
+
+class IndexJoinPath:
+    """Junção por laços aninhados com índice: cada linha externa busca no índice"""
+
+    def __init__(self, index, inner_side, outer_key, inner_key, residual):
+        self.index = index
+        self.inner_side = inner_side  # 0 = filho esquerdo, 1 = direito
+        self.outer_key = outer_key  # ColumnRef do lado externo
+        self.inner_key = inner_key  # ColumnRef indexada do lado interno
+        self.residual = residual
+
+    def describe(self):
+        return (
+            f"Buscar em '{self.inner_key.table}' pelo índice '{self.index.name}' "
+            f"({self.index.kind}) para cada {self.outer_key}"
+        )
+
+
+def _index_terms(condition, table):
+    """Termos coluna-op-literal da tabela, normalizados com a coluna à esquerda"""
+    terms = []
+    for term in conjuncts(condition):
+        if not isinstance(term, Comparison) or term.op not in _FLIPPED:
+            continue
+        column, literal, op = term.left, term.right, term.op
+        if isinstance(literal, ColumnRef) and isinstance(column, Literal):
+            column, literal, op = literal, column, _FLIPPED[op]
+        if (
+            isinstance(column, ColumnRef)
+            and isinstance(literal, Literal)
+            and literal.value is not None
+            and (column.table or "").lower() == table.lower()
+        ):
+            terms.append((term, column, op, literal.value))
+    return terms
+
+
+def _leaf_table(expr):
+    """Tabela na base de uma cadeia de π/σ (None se houver junções)"""
+    while isinstance(expr, (Projection, Selection)):
+        expr = expr.child
+    return expr if isinstance(expr, Table) else None
+
+
+def _leaf_node(node):
+    while node.children:
+        node = node.children[0]
+    return node
+
+
+def _leaf_selection(expr):
+    """σ logo acima da tabela numa cadeia de π/σ (None se não houver)"""
+    while isinstance(expr, (Projection, Selection)):
+        if isinstance(expr, Selection) and isinstance(expr.child, Table):
+            return expr
+        expr = expr.child
+    return None
+
+
+def _scan_path(index, table, condition, usable):
+    """IndexScanPath com os termos ``usable`` e o restante da condição como resíduo"""
+    used = {id(t[0]) for t in usable}
+    rest = [t for t in conjuncts(condition) if id(t) not in used]
+    return IndexScanPath(
+        index,
+        normalize_table_name(table),
+        [(op, value) for _, op, value in usable],
+        make_bool("AND", rest) if rest else None,
+    )
+
+
+def physical_ordering(table):
+    """Ordem (chaves de coluna) em que a varredura da tabela entrega as linhas"""
+    return tuple((table.lower(), column.lower()) for column in get_sort_order(table))
+
+
+def merge_keys(join):
+    """Chaves de coluna (esquerda, direita) das igualdades entre os lados da junção"""
+    side_tables = [
+        {table.lower() for table in side.get_tables()} for side in (join.left, join.right)
+    ]
+    keys = ([], [])
+    for term in conjuncts(join.condition):
+        if not (
+            isinstance(term, Comparison)
+            and term.op == "="
+            and isinstance(term.left, ColumnRef)
+            and isinstance(term.right, ColumnRef)
+        ):
+            continue
+        a, b = term.left, term.right
+        if (b.table or "").lower() in side_tables[0]:
+            a, b = b, a
+        a_table, b_table = (a.table or "").lower(), (b.table or "").lower()
+        if a_table in side_tables[0] and b_table in side_tables[1]:
+            keys[0].append((a_table, a.column.lower()))
+            keys[1].append((b_table, b.column.lower()))
+    return tuple(keys[0]), tuple(keys[1])
+
+
+def output_ordering(node):
+    """
+    Ordem (chaves de coluna) em que o operador do nó do grafo entrega as
+    linhas, pelas mesmas regras de ``PhysicalOperator.ordering`` no
+    ExecutionEngine, com a ordem física das tabelas vinda do catálogo
+    """
+    expr, path = node.expr, node.access_path
+    if isinstance(expr, Table):
+        if isinstance(path, IndexScanPath) and not path.terms:
+            return path.ordering
+        if isinstance(path, IndexJoinPath):
+            return ()
+        return physical_ordering(expr.name)
+    if isinstance(expr, Selection):
+        if isinstance(path, IndexScanPath):
+            return path.ordering
+        return output_ordering(node.children[0])
+    if isinstance(expr, Projection):
+        attributes = {column_key(attribute) for attribute in expr.attributes}
+        ordering = []
+        for key in output_ordering(node.children[0]):
+            if key not in attributes:
+                break  # A ordem só vale até a primeira coluna descartada
+            ordering.append(key)
+        return tuple(ordering)
+    if isinstance(expr, Sort):
+        if presorted(node):
+            return output_ordering(node.children[0])
+        if any(item.descending for item in expr.keys):
+            return ()
+        return tuple(column_key(item.expression) for item in expr.keys)
+    if isinstance(expr, Join) and expr.method == MERGE_JOIN:
+        if not isinstance(path, IndexJoinPath):
+            return merge_keys(expr)[0]
+    return ()
+
+
+def presorted(node):
+    """A entrada do τ já sai na ordem pedida (ORDER BY só ASC): basta o LIMIT"""
+    expr = node.expr
+    if any(item.descending for item in expr.keys):
+        return False
+    keys = tuple(column_key(item.expression) for item in expr.keys)
+    return output_ordering(node.children[0])[: len(keys)] == keys
+
+
+def ordered_access(expr, estimator):
+    """
+    Leituras da folha ``expr`` (π/σ sobre uma tabela) que já entregam as
+    linhas ordenadas: [(ordem, custo, caminho)], com a ordem como chaves de
+    coluna e o caminho None para a varredura na ordem física da tabela.
+
+    Uma B-tree também pode ser lida inteira em ordem; ela não guarda chaves
+    NULL, o que só é correto porque o resultado alimenta um merge join pela
+    coluna indexada (NULL nunca satisfaz a igualdade).
+    """
+    table = _leaf_table(expr)
+    if table is None:
+        return []
+    name = normalize_table_name(table.name)
+    rows = estimator.table_rows(name)
+    options = []
+    physical = physical_ordering(name)
+    if physical:
+        options.append((physical, rows * SEQUENTIAL_ROW_COST, None))
+
+    selection = _leaf_selection(expr)
+    condition = selection.condition if selection is not None else None
+    by_column = {}
+    for term, column, op, value in _index_terms(condition, name):
+        by_column.setdefault(column.column.lower(), []).append((term, op, value))
+
+    for index in get_indexes(name):
+        usable = [t for t in by_column.get(index.column.lower(), ()) if index.supports(t[1])]
+        if not usable and index.kind == HASH_INDEX:
+            continue  # Hash só entrega linhas (e ordem) para uma igualdade
+        selectivity = 1.0
+        if usable:
+            selectivity = estimator.selectivity(make_bool("AND", [t[0] for t in usable]))
+        path = _scan_path(index, name, condition, usable)
+        options.append(
+            (path.ordering, INDEX_PROBE_COST + selectivity * rows * INDEX_ROW_COST, path)
+        )
+    return options
+
+
+class AccessPathSelector:
+    """
+    Escolhe, por custo, onde usar índices no grafo de operadores: σ sobre
+    uma tabela vira leitura pelo índice e junções por igualdade viram laços
+    aninhados com índice quando o lado externo é pequeno. As escolhas ficam
+    em ``GraphNode.access_path``. Junções cujo algoritmo já foi fixado pelo
+    otimizador (``Join.method``) só usam índice se o método for INDEX_JOIN;
+    as entradas de um merge join são lidas por um índice ordenado pela chave
+    quando isso sai mais barato que ordená-las.
+    """
+
+    def __init__(self, estimator=None):
+        self.estimator = estimator or CardinalityEstimator()
+
+    def choose(self, operator_graph):
+        self._visit(operator_graph.root)
+        return operator_graph
+
+    def _visit(self, node):
+        for child in node.children:
+            self._visit(child)
+        expr = node.expr
+        if isinstance(expr, Selection) and isinstance(expr.child, Table):
+            path = self._scan_path(expr)
+            if path is not None:
+                node.access_path = path
+                node.children[0].access_path = path
+        elif isinstance(expr, Join) and expr.condition is not None:
+            if expr.method is None:
+                path = self._join_path(expr)
+            elif expr.method == INDEX_JOIN:
+                path = self._join_path(expr, forced=True)  # Índice do lado direito
+            else:
+                path = None
+                if expr.method == MERGE_JOIN:
+                    self._ordered_inputs(node)
+            if path is not None:
+                node.access_path = path
+                inner = node.children[path.inner_side]
+                for inner_node in self._chain(inner):
+                    inner_node.access_path = None  # σ interno vira filtro das buscas
+                _leaf_node(inner).access_path = path
+
+    def _ordered_inputs(self, node):
+        """Escolhe a leitura de cada lado do merge join que já sai na ordem das chaves"""
+        for side, required in zip(node.children, merge_keys(node.expr)):
+            if required:
+                self._order_input(side, tuple(required))
+
+    def _order_input(self, node, required):
+        expr = node.expr
+        table = _leaf_table(expr)
+        if table is None:
+            return  # Junções abaixo: a ordem vem delas ou de uma ordenação
+        chain = list(self._chain(node))
+        current = chain[-1].access_path
+        if isinstance(current, IndexJoinPath):
+            return
+        ordering = current.ordering if current is not None else physical_ordering(table.name)
+        if ordering[: len(required)] == required:
+            return
+
+        options = [
+            (cost, path)
+            for ordering, cost, path in ordered_access(expr, self.estimator)
+            if ordering[: len(required)] == required
+        ]
+        if not options:
+            return
+        cost, path = min(options, key=lambda option: option[0])
+        unordered = self.estimator.table_rows(table.name) * SEQUENTIAL_ROW_COST + sort_cost(
+            self.estimator.estimate_rows(expr)
+        )
+        if cost >= unordered:
+            return
+        selection = _leaf_selection(expr)
+        for chain_node in chain:
+            if chain_node.expr is table or chain_node.expr is selection:
+                chain_node.access_path = path
+
+    def _chain(self, node):
+        while True:
+            yield node
+            if not node.children:
+                return
+            node = node.children[0]
+
+    def _scan_path(self, selection):
+        table = selection.child.name
+        rows = self.estimator.table_rows(table)
+        best, best_cost = None, rows * SEQUENTIAL_ROW_COST
+
+        by_column = {}
+        for term, column, op, value in _index_terms(selection.condition, table):
+            by_column.setdefault(column.column.lower(), []).append((term, op, value))
+
+        for column, terms in by_column.items():
+            for index in get_indexes(table, column):
+                usable = [t for t in terms if index.supports(t[1])]
+                if not usable:
+                    continue
+                selectivity = self.estimator.selectivity(make_bool("AND", [t[0] for t in usable]))
+                cost = INDEX_PROBE_COST + selectivity * rows * INDEX_ROW_COST
+                if cost < best_cost:
+                    best, best_cost = (index, usable), cost
+
+        if best is None:
+            return None
+        index, usable = best
+        return _scan_path(index, table, selection.condition, usable)
+
+    def _join_path(self, join, forced=False):
+        left_rows = self.estimator.estimate_rows(join.left)
+        right_rows = self.estimator.estimate_rows(join.right)
+        best, best_cost = None, (left_rows + right_rows) * SEQUENTIAL_ROW_COST  # Hash join
+        if forced:
+            best_cost = float("inf")
+
+        sides = (join.left, join.right)
+        terms = list(conjuncts(join.condition))
+        for term in terms:
+            if not (
+                isinstance(term, Comparison)
+                and term.op == "="
+                and isinstance(term.left, ColumnRef)
+                and isinstance(term.right, ColumnRef)
+            ):
+                continue
+            for inner_side in (1,) if forced else (0, 1):
+                table = _leaf_table(sides[inner_side])
+                if table is None:
+                    continue
+                for inner_key, outer_key in ((term.left, term.right), (term.right, term.left)):
+                    if (inner_key.table or "").lower() != table.name.lower():
+                        continue
+                    indexes = get_indexes(table.name, inner_key.column)
+                    if not indexes:
+                        continue
+                    outer_rows = left_rows if inner_side == 1 else right_rows
+                    inner_rows = self.estimator.table_rows(table.name)
+                    matches = inner_rows * self.estimator.join_selectivity(term)
+                    cost = outer_rows * (INDEX_PROBE_COST + matches * INDEX_ROW_COST)
+                    if cost < best_cost:
+                        # Hash é o mais barato para igualdade; B-tree também serve
+                        index = min(indexes, key=lambda i: i.kind != HASH_INDEX)
+                        best, best_cost = (index, inner_side, outer_key, inner_key, term), cost
+
+        if best is None:
+            return None
+        index, inner_side, outer_key, inner_key, used = best
+        rest = [t for t in terms if t is not used]
+        return IndexJoinPath(
+            index, inner_side, outer_key, inner_key, make_bool("AND", rest) if rest else None
+        )
@@ -0,0 +1,169 @@
+from algebra_expressions import *
+from cost_model import CardinalityEstimator
+from sql_ast import conjuncts, make_bool, referenced_tables
+
+DEFAULT_DP_THRESHOLD = 10
+
+
+class _Relation:
+    __slots__ = ("expr", "tables", "rows")
+
+    def __init__(self, expr, tables, rows):
+        self.expr = expr  # Subárvore original (normalmente uma Table)
+        self.tables = tables  # Tabelas cobertas pela subárvore
+        self.rows = rows  # Cardinalidade estimada após os filtros locais
+
+
+class _Predicate:
+    __slots__ = ("expr", "mask", "selectivity")
+
+    def __init__(self, expr, mask, selectivity):
+        self.expr = expr
+        self.mask = mask  # Bits das relações referenciadas
+        self.selectivity = selectivity
+
+
+class JoinOrderOptimizer:
+    """
+    Escolhe a ordem das junções por programação dinâmica (Selinger) sobre
+    árvores left-deep, minimizando a soma das cardinalidades intermediárias.
+    Só considera produtos cartesianos quando o grafo de junção é desconexo.
+    Acima de ``dp_threshold`` relações usa uma heurística gulosa.
+    """
+
+    def __init__(self, estimator=None, dp_threshold=DEFAULT_DP_THRESHOLD):
+        self.estimator = estimator or CardinalityEstimator()
+        self.dp_threshold = dp_threshold
+
+    def reorder(self, join_expr, filters=None):
+        """
+        Reordena a árvore de junções ``join_expr``. ``filters`` é a condição
+        do WHERE (ou None), usada apenas para estimar as cardinalidades.
+        """
+        leaves = []
+        predicates = []
+        self._collect(join_expr, leaves, predicates)
+        if len(leaves) < 3:
+            return join_expr
+
+        filter_terms = conjuncts(filters)
+        relations = [self._make_relation(leaf, filter_terms) for leaf in leaves]
+        predicates = [self._make_predicate(p, relations) for p in predicates]
+
+        if len(relations) > self.dp_threshold:
+            order = self._greedy_order(relations, predicates)
+        else:
+            order = self._dp_order(relations, predicates)
+
+        return self._build_tree(order, relations, predicates)
+
+    def _collect(self, expr, leaves, predicates):
+        if isinstance(expr, Join):
+            self._collect(expr.left, leaves, predicates)
+            self._collect(expr.right, leaves, predicates)
+            predicates.extend(conjuncts(expr.condition))
+        else:
+            leaves.append(expr)
+
+    def _make_relation(self, expr, filter_terms):
+        tables = {t.lower() for t in expr.get_tables()}
+        rows = 1.0
+        for table in expr.get_tables():
+            rows *= self.estimator.table_rows(table)
+        for term in filter_terms:
+            term_tables = {t.lower() for t in referenced_tables(term)}
+            if term_tables and term_tables <= tables:
+                rows *= self.estimator.selectivity(term)
+        return _Relation(expr, tables, max(rows, 1.0))
+
+    def _make_predicate(self, expr, relations):
+        mask = 0
+        for table in referenced_tables(expr):
+            for i, relation in enumerate(relations):
+                if table.lower() in relation.tables:
+                    mask |= 1 << i
+        return _Predicate(expr, mask, self.estimator.selectivity(expr))
+
+    def _cardinality(self, mask, relations, predicates, memo):
+        if mask in memo:
+            return memo[mask]
+        rows = 1.0
+        for i, relation in enumerate(relations):
+            if mask & (1 << i):
+                rows *= relation.rows
+        for predicate in predicates:
+            # Predicados de uma só relação já entraram em relation.rows
+            if predicate.mask & (predicate.mask - 1) and predicate.mask & mask == predicate.mask:
+                rows *= predicate.selectivity
+        memo[mask] = max(rows, 1.0)
+        return memo[mask]
+
+    def _connected(self, rest, i, predicates):
+        bit = 1 << i
+        for predicate in predicates:
+            if predicate.mask & bit and predicate.mask & rest:
+                if predicate.mask & ~(rest | bit) == 0:
+                    return True
+        return False
+
+    def _dp_order(self, relations, predicates):
+        n = len(relations)
+        full = (1 << n) - 1
+        memo = {}
+
+        for allow_cartesian in (False, True):
+            best = {1 << i: (0.0, (i,)) for i in range(n)}
+            for mask in range(1, full + 1):
+                if mask in best:
+                    continue
+                rows = self._cardinality(mask, relations, predicates, memo)
+                for i in range(n):
+                    bit = 1 << i
+                    rest = mask ^ bit
+                    if not mask & bit or rest not in best:
+                        continue
+                    if not allow_cartesian and not self._connected(rest, i, predicates):
+                        continue
+                    cost = best[rest][0] + rows
+                    if mask not in best or cost < best[mask][0]:
+                        best[mask] = (cost, best[rest][1] + (i,))
+            if full in best:
+                return best[full][1]
+
+        return tuple(range(n))
+
+    def _greedy_order(self, relations, predicates):
+        memo = {}
+        remaining = set(range(len(relations)))
+        first = min(remaining, key=lambda i: relations[i].rows)
+        order = [first]
+        mask = 1 << first
+        remaining.discard(first)
+
+        while remaining:
+            candidates = [i for i in remaining if self._connected(mask, i, predicates)]
+            if not candidates:
+                candidates = remaining  # Grafo desconexo: produto cartesiano
+            chosen = min(
+                candidates,
+                key=lambda i: self._cardinality(mask | (1 << i), relations, predicates, memo),
+            )
+            order.append(chosen)
+            mask |= 1 << chosen
+            remaining.discard(chosen)
+
+        return tuple(order)
+
+    def _build_tree(self, order, relations, predicates):
+        pending = list(predicates)
+        result = relations[order[0]].expr
+        mask = 1 << order[0]
+
+        for i in order[1:]:
+            mask |= 1 << i
+            applicable = [p for p in pending if p.mask & mask == p.mask]
+            pending = [p for p in pending if p.mask & mask != p.mask]
+            condition = make_bool("AND", [p.expr for p in applicable]) if applicable else None
+            result = Join(condition, result, relations[i].expr)
+
+        return result
@@ -1,11 +1,21 @@
 import tkinter as tk
 from tkinter import messagebox, scrolledtext, ttk
 
-from algebra_converter import AlgebraConverter
-from execution_planner import ExecutionPlanner
-from graph_builder import GraphBuilder
-from query_optimizer import QueryOptimizer
-from sql_parser import SQLParser
+from graph_renderer import BackgroundRenderer
+from query_pipeline import QueryPipeline
+
+GRAPH_MAX_SIZE = (750, 550)
+GRAPH_POLL_MS = 50  # Intervalo para verificar se o grafo ficou pronto
+
+
+def _thumbnail(image_path):
+    """Abre e reduz a imagem (roda na thread de trabalho, junto com o dot)"""
+    from PIL import Image
+
+    img = Image.open(image_path)
+    img.thumbnail(GRAPH_MAX_SIZE, Image.Resampling.LANCZOS)
+    img.load()
+    return img
 
 
 class QueryProcessorApp:
@@ -15,13 +25,12 @@ class QueryProcessorApp:
         self.root.geometry("1200x800")
 
         # Inicializar componentes
-        self.parser = SQLParser()
-        self.algebra_converter = AlgebraConverter()
-        self.optimizer = QueryOptimizer()
-        self.graph_builder = GraphBuilder()
-        self.execution_planner = ExecutionPlanner()
+        self.pipeline = QueryPipeline()
+        self.graph_renderer = BackgroundRenderer()
+        self.graph_request = 0  # Só o grafo da última consulta é exibido
 
         self.create_widgets()
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
 
     def create_widgets(self):
         # Frame principal
@@ -106,27 +115,26 @@ class QueryProcessorApp:
                 messagebox.showwarning("Atenção", "Por favor, insira uma consulta SQL.")
                 return
 
-            # HU1: Parsing e Validação
-            is_valid, message, parsed_query = self.parser.parse(sql_query)
+            # HU1: Parsing e Validação (demais etapas reaproveitadas do cache)
+            is_valid, message, result = self.pipeline.process(sql_query)
 
             if not is_valid:
                 messagebox.showerror("Erro de Validação", message)
                 return
 
-            print("parsed query", parsed_query)
+            print("parsed query", result.statement)
 
-            # HU2: Conversão para Álgebra Relacional
-            algebra_expr = self.algebra_converter.convert(parsed_query)
+            # HU2: Conversão para Álgebra Relacional (passos guardados no cache)
+            step1, step2, _ = result.steps
             self.algebra_text.insert(1.0, "PASSO 1 - HEURÍSTICA DE JUNÇÃO:\n\n")
-            self.algebra_text.insert(tk.END, algebra_expr.to_string())
+            self.algebra_text.insert(tk.END, step1.to_string())
 
             # HU4: Otimização
-            optimized_algebra = self.optimizer.optimize(algebra_expr)
+            optimized_algebra = result.optimized
             self.algebra_text.insert(tk.END, "\n\n" + "=" * 60 + "\n")
             self.algebra_text.insert(
                 tk.END, "PASSO 2 - HEURÍSTICA DE REDUÇÃO DE TUPLAS:\n\n"
             )
-            step2 = self.optimizer._apply_tuple_reduction(algebra_expr)
             self.algebra_text.insert(tk.END, step2.to_string())
             self.algebra_text.insert(tk.END, "\n\n" + "=" * 60 + "\n")
             self.algebra_text.insert(
@@ -135,62 +143,84 @@ class QueryProcessorApp:
             self.algebra_text.insert(tk.END, optimized_algebra.to_string())
 
             # HU3: Construção do Grafo
-            graph = self.graph_builder.build_graph(optimized_algebra)
+            graph = result.graph
 
-            # Gerar grafo visual
-            try:
-                image_path = graph.render_graphviz(
-                    filename="grafo_consulta", view=False
-                )
+            # Gerar grafo visual numa thread de trabalho (a interface não congela)
+            self._render_graph(graph)
 
-                # Carregar e exibir imagem
-                from PIL import Image, ImageTk
+            # HU5: Plano de Execução
+            execution_plan = result.plan
+            self.execution_text.insert(1.0, execution_plan.to_string())
 
-                img = Image.open(image_path)
+            messagebox.showinfo("Sucesso", "Consulta processada com sucesso!")
 
-                # Redimensionar se necessário
-                max_width = 750
-                max_height = 550
-                img.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
+        except Exception as e:
+            messagebox.showerror("Erro", f"Erro ao processar consulta:\n{str(e)}")
 
-                photo = ImageTk.PhotoImage(img)
+    def _render_graph(self, graph):
+        self.graph_request += 1
+        request = self.graph_request
+        try:
+            source = graph.to_dot().source
+        except Exception as e:
+            self._show_graph_error(e)
+            return
+
+        self._clear_graph_frame()
+        ttk.Label(self.graph_inner_frame, text="Gerando grafo...").pack(padx=10, pady=10)
+        future = self.graph_renderer.submit(source, _thumbnail)
+        self.root.after(GRAPH_POLL_MS, self._poll_graph, future, request)
+
+    def _poll_graph(self, future, request):
+        if request != self.graph_request:
+            return  # Outra consulta foi processada; a imagem fica só no cache
+        if not future.done():
+            self.root.after(GRAPH_POLL_MS, self._poll_graph, future, request)
+            return
+        try:
+            image_path, img = future.result()
+        except Exception as e:
+            self._show_graph_error(e)
+            return
+        self._show_graph(image_path, img)
 
-                # Limpar frame anterior
-                for widget in self.graph_inner_frame.winfo_children():
-                    widget.destroy()
+    def _clear_graph_frame(self):
+        for widget in self.graph_inner_frame.winfo_children():
+            widget.destroy()
 
-                # Criar label com imagem
-                label = ttk.Label(self.graph_inner_frame, image=photo)
-                label.image = photo  # Manter referência
-                label.pack(padx=10, pady=10)
+    def _show_graph(self, image_path, img):
+        from PIL import ImageTk
 
-                # Adicionar botão para salvar
-                save_btn = ttk.Button(
-                    self.graph_inner_frame,
-                    text="Salvar Grafo como PNG",
-                    command=lambda: self._save_graph(image_path),
-                )
-                save_btn.pack(pady=5)
+        photo = ImageTk.PhotoImage(img)  # Precisa ser criada na thread do Tk
 
-            except Exception as e:
-                # Se falhar, mostrar mensagem de erro
-                error_label = ttk.Label(
-                    self.graph_inner_frame,
-                    text=f"Erro ao gerar grafo visual: {
-                        e
-                    }\n\nVerifique se o Graphviz está instalado.",
-                    foreground="red",
-                )
-                error_label.pack(padx=10, pady=10)
+        self._clear_graph_frame()
 
-            # HU5: Plano de Execução
-            execution_plan = self.execution_planner.create_plan(graph)
-            self.execution_text.insert(1.0, execution_plan.to_string())
+        # Criar label com imagem
+        label = ttk.Label(self.graph_inner_frame, image=photo)
+        label.image = photo  # Manter referência
+        label.pack(padx=10, pady=10)
 
-            messagebox.showinfo("Sucesso", "Consulta processada com sucesso!")
+        # Adicionar botão para salvar
+        save_btn = ttk.Button(
+            self.graph_inner_frame,
+            text="Salvar Grafo como PNG",
+            command=lambda: self._save_graph(image_path),
+        )
+        save_btn.pack(pady=5)
+
+    def _show_graph_error(self, error):
+        self._clear_graph_frame()
+        error_label = ttk.Label(
+            self.graph_inner_frame,
+            text=f"Erro ao gerar grafo visual: {error}\n\n"
+            "Verifique se o Graphviz está instalado.",
+            foreground="red",
+        )
+        error_label.pack(padx=10, pady=10)
 
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao processar consulta:\n{str(e)}")
+    def close(self):
+        self.graph_renderer.shutdown()  # Apaga as imagens temporárias
+        self.root.destroy()
 
     def _save_graph(self, image_path):
         import shutil
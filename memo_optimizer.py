@@ -0,0 +1,447 @@
+"""
+Otimizador baseado em memo (estilo Cascades/Volcano) para as regiões de
+junções da consulta.
+
+Cada região é uma árvore de junções consecutivas; as subárvores abaixo dela
+(π/σ sobre tabelas, já reescritas pelas regras) são as folhas. O memo guarda
+um grupo por conjunto de folhas (máscara de bits) e, em cada grupo, as
+expressões lógicas equivalentes ``(grupo esquerdo, grupo direito)``. As
+regras de transformação (comutatividade e associatividade) só acrescentam
+expressões que ainda não existem, então cada subconjunto de relações é
+explorado uma única vez, por mais caminhos que levem a ele.
+
+Na fase de custo cada expressão é implementada por hash join, merge join,
+laços aninhados ou laços aninhados com índice, e o grupo guarda o plano mais
+barato para cada propriedade requerida (ordem das linhas). O merge join pede
+as entradas ordenadas pelas chaves; se o plano do filho não entrega essa
+ordem, o custo de uma ordenação (enforcer) é somado. O plano vencedor volta
+como álgebra, com o algoritmo escolhido em ``Join.method``.
+"""
+
+import math
+from collections import deque
+
+from algebra_expressions import *
+from cost_model import CardinalityEstimator
+from indexes import (
+    INDEX_PROBE_COST,
+    INDEX_ROW_COST,
+    SEQUENTIAL_ROW_COST,
+    _leaf_table,
+    ordered_access,
+    sort_cost,
+)
+from metadata import get_indexes
+from predicate_compiler import column_key
+from sql_ast import ColumnRef, Comparison, conjuncts, make_bool, referenced_tables
+
+DEFAULT_MEMO_THRESHOLD = 8  # Acima disso a ordem das junções fica com a heurística
+
+# Custos relativos a ler uma linha numa varredura sequencial (ver indexes.py)
+HASH_BUILD_ROW_COST = 1.5  # Inserir uma linha na tabela hash
+HASH_PROBE_ROW_COST = 1.0
+MERGE_ROW_COST = 1.0  # Avançar uma linha na intercalação
+NESTED_LOOP_PAIR_COST = 0.2  # Avaliar a condição para um par de linhas
+OUTPUT_ROW_COST = 1.0  # Produzir uma linha intermediária
+
+_NESTED_LOOP_BLOCK = 1024  # Mesmo bloco do NestedLoopJoin
+
+
+class _Leaf:
+    __slots__ = ("expr", "tables", "rows", "scan_cost", "table", "orders")
+
+    def __init__(self, expr, rows, scan_cost, orders=()):
+        self.expr = expr
+        self.tables = {t.lower() for t in expr.get_tables()}
+        self.rows = rows
+        self.scan_cost = scan_cost
+        self.table = _leaf_table(expr)  # Base de π/σ (candidata a busca por índice)
+        self.orders = orders  # [(ordem, custo)] das leituras que já saem ordenadas
+
+
+class _Predicate:
+    __slots__ = ("expr", "mask", "selectivity", "columns")
+
+    def __init__(self, expr, mask, selectivity, columns):
+        self.expr = expr
+        self.mask = mask
+        self.selectivity = selectivity
+        self.columns = columns  # ((máscara, ColumnRef), (máscara, ColumnRef)) se for a = b
+
+
+class Group:
+    """Classe de equivalência: todas as formas de juntar as folhas de ``mask``"""
+
+    __slots__ = ("mask", "rows", "expressions", "consumers", "winners")
+
+    def __init__(self, mask, rows):
+        self.mask = mask
+        self.rows = rows
+        self.expressions = {}  # (esquerdo, direito) -> None, na ordem de inserção
+        self.consumers = []  # (grupo pai, grupo direito) onde este grupo está à esquerda
+        self.winners = {}  # ordem requerida -> Winner
+
+
+class Winner:
+    """Melhor plano de um grupo para uma ordem requerida"""
+
+    __slots__ = ("cost", "method", "left", "right", "left_order", "right_order", "keys", "order")
+
+    def __init__(
+        self,
+        cost,
+        method=None,
+        left=None,
+        right=None,
+        left_order=(),
+        right_order=(),
+        keys=(),
+        order=(),
+    ):
+        self.cost = cost
+        self.method = method  # None = folha ou ordenação sobre o melhor plano sem ordem
+        self.left = left
+        self.right = right
+        self.left_order = left_order
+        self.right_order = right_order
+        self.keys = keys  # Predicados usados como chaves do merge join
+        self.order = order  # Ordem que o plano entrega
+
+
+class Memo:
+    """Grupos de uma região de junções, indexados pela máscara de folhas"""
+
+    def __init__(self, leaves, predicates, cardinality):
+        self.leaves = leaves
+        self.predicates = predicates
+        self.groups = {}
+        self._cardinality = cardinality
+        self._pending = deque()
+
+    def group(self, mask):
+        group = self.groups.get(mask)
+        if group is None:
+            group = self.groups[mask] = Group(mask, self._cardinality(mask))
+        return group
+
+    def add(self, mask, left, right):
+        """Registra a expressão no grupo; devolve False se ela já existia"""
+        group = self.group(mask)
+        if (left, right) in group.expressions:
+            return False
+        group.expressions[(left, right)] = None
+        self._pending.append((mask, left, right))
+        return True
+
+    @property
+    def expression_count(self):
+        return sum(len(group.expressions) for group in self.groups.values())
+
+
+class MemoOptimizer:
+    """
+    Explora as árvores de junção equivalentes (inclusive bushy) e os
+    algoritmos físicos de cada junção, escolhendo o plano de menor custo.
+    Produtos cartesianos só são criados se o grafo de junção for desconexo.
+    """
+
+    def __init__(self, estimator=None, threshold=DEFAULT_MEMO_THRESHOLD):
+        self.estimator = estimator or CardinalityEstimator()
+        self.threshold = threshold
+        self.last_memo = None  # Memo da última região otimizada (depuração)
+
+    def optimize(self, expr):
+        if isinstance(expr, Join):
+            return self._optimize_region(expr)
+        if isinstance(expr, (Projection, Selection, Aggregation, Sort)):
+            return expr.replace(child=self.optimize(expr.child))
+        return expr
+
+    def _optimize_region(self, join):
+        leaves, predicates, seed = [], [], []
+        self._collect(join, leaves, predicates, seed)
+        leaves = [self.optimize(leaf) for leaf in leaves]  # Regiões mais abaixo
+        if len(leaves) > self.threshold:
+            return self._rebuild(join, iter(leaves))
+
+        leaves = [self._make_leaf(leaf) for leaf in leaves]
+        predicates = [self._make_predicate(term, leaves) for term in predicates]
+        cardinalities = {}
+
+        def cardinality(mask):
+            if mask not in cardinalities:
+                rows = 1.0
+                for i, leaf in enumerate(leaves):
+                    if mask & (1 << i):
+                        rows *= leaf.rows
+                for predicate in predicates:
+                    if predicate.mask and predicate.mask & mask == predicate.mask:
+                        rows *= predicate.selectivity
+                cardinalities[mask] = max(rows, 1.0)
+            return cardinalities[mask]
+
+        memo = Memo(leaves, predicates, cardinality)
+        for i in range(len(leaves)):
+            memo.group(1 << i)
+        for mask, left, right in seed:
+            memo.add(mask, left, right)
+        self._explore(memo, self._disconnected(leaves, predicates))
+        self.last_memo = memo
+
+        full = (1 << len(leaves)) - 1
+        self._best(memo, full, ())
+        return self._extract(memo, full, (), root=True)
+
+    def _collect(self, expr, leaves, predicates, seed):
+        """Folhas e predicados da região; ``seed`` recebe as junções originais"""
+        if not isinstance(expr, Join):
+            leaves.append(expr)
+            return 1 << (len(leaves) - 1)
+        left = self._collect(expr.left, leaves, predicates, seed)
+        right = self._collect(expr.right, leaves, predicates, seed)
+        predicates.extend(conjuncts(expr.condition))
+        seed.append((left | right, left, right))
+        return left | right
+
+    def _rebuild(self, expr, leaves):
+        """Mesma árvore com as folhas trocadas (região grande demais para o memo)"""
+        if not isinstance(expr, Join):
+            return next(leaves)
+        left = self._rebuild(expr.left, leaves)
+        return expr.replace(left=left, right=self._rebuild(expr.right, leaves))
+
+    def _make_leaf(self, expr):
+        scan_rows = 1.0
+        for table in expr.get_tables():
+            scan_rows *= self.estimator.table_rows(table)
+        rows = max(self.estimator.estimate_rows(expr), 1.0)
+        orders = [(order, cost) for order, cost, _ in ordered_access(expr, self.estimator)]
+        return _Leaf(expr, rows, scan_rows * SEQUENTIAL_ROW_COST, orders)
+
+    def _mask_of(self, tables, leaves):
+        mask = 0
+        for table in tables:
+            for i, leaf in enumerate(leaves):
+                if table.lower() in leaf.tables:
+                    mask |= 1 << i
+        return mask
+
+    def _make_predicate(self, term, leaves):
+        mask = self._mask_of(referenced_tables(term), leaves)
+        columns = None
+        if (
+            isinstance(term, Comparison)
+            and term.op == "="
+            and isinstance(term.left, ColumnRef)
+            and isinstance(term.right, ColumnRef)
+        ):
+            left = self._mask_of(referenced_tables(term.left), leaves)
+            right = self._mask_of(referenced_tables(term.right), leaves)
+            if left and right and not left & right:
+                columns = ((left, term.left), (right, term.right))
+        return _Predicate(term, mask, self.estimator.selectivity(term), columns)
+
+    def _disconnected(self, leaves, predicates):
+        full = (1 << len(leaves)) - 1
+        reached = 1
+        changed = True
+        while changed:
+            changed = False
+            for predicate in predicates:
+                mask = predicate.mask
+                if mask & reached and mask & ~reached and mask & (mask - 1):
+                    reached |= mask
+                    changed = True
+        return reached != full
+
+    def _connected(self, memo, left, right):
+        for predicate in memo.predicates:
+            mask = predicate.mask
+            if mask & left and mask & right and mask & ~(left | right) == 0:
+                return True
+        return False
+
+    # Exploração ----------------------------------------------------------
+
+    def _explore(self, memo, allow_cartesian):
+        """
+        Aplica as regras até não surgirem expressões novas. Cada expressão é
+        processada uma vez: gera a comutada e, para cada expressão do seu
+        grupo esquerdo (inclusive as que ainda vão surgir, via ``consumers``),
+        a associada.
+        """
+        while memo._pending:
+            mask, left, right = memo._pending.popleft()
+            memo.add(mask, right, left)  # Comutatividade: A ⋈ B → B ⋈ A
+
+            left_group = memo.groups[left]
+            left_group.consumers.append((mask, right))
+            for a, b in list(left_group.expressions):
+                self._associate(memo, mask, a, b, right, allow_cartesian)
+            for parent, c in list(memo.groups[mask].consumers):
+                self._associate(memo, parent, left, right, c, allow_cartesian)
+
+    def _associate(self, memo, mask, a, b, c, allow_cartesian):
+        """Associatividade: (A ⋈ B) ⋈ C → A ⋈ (B ⋈ C)"""
+        if not allow_cartesian and not self._connected(memo, b, c):
+            return
+        memo.add(b | c, b, c)
+        memo.add(mask, a, b | c)
+
+    # Custo ---------------------------------------------------------------
+
+    def _spanning(self, memo, mask, left, right):
+        """Predicados avaliados na junção de ``left`` com ``right``"""
+        return [
+            p
+            for p in memo.predicates
+            if p.mask & mask == p.mask and p.mask & ~left and p.mask & ~right
+        ]
+
+    def _keys(self, predicates, left):
+        """Pares (predicado, coluna à esquerda, coluna à direita) das igualdades"""
+        keys = []
+        for predicate in predicates:
+            if predicate.columns is None:
+                continue
+            (mask_a, a), (mask_b, b) = predicate.columns
+            if mask_a & left == mask_a and not mask_b & left:
+                keys.append((predicate, column_key(a), column_key(b)))
+            elif mask_b & left == mask_b and not mask_a & left:
+                keys.append((predicate, column_key(b), column_key(a)))
+        return keys
+
+    def _best(self, memo, mask, order):
+        group = memo.groups[mask]
+        winner = group.winners.get(order)
+        if winner is not None:
+            return winner
+
+        winner = None
+        if not mask & (mask - 1):
+            leaf = memo.leaves[mask.bit_length() - 1]
+            if not order:
+                winner = Winner(leaf.scan_cost)
+            # Varredura na ordem física ou leitura por índice ordenado
+            for leaf_order, cost in leaf.orders:
+                if leaf_order[: len(order)] == order and (winner is None or cost < winner.cost):
+                    winner = Winner(cost, order=leaf_order)
+        else:
+            for left, right in group.expressions:
+                for candidate in self._implementations(memo, group, left, right):
+                    if candidate.order[: len(order)] != order:
+                        continue
+                    if winner is None or candidate.cost < winner.cost:
+                        winner = candidate
+
+        if order:
+            # Enforcer: o melhor plano sem ordem seguido de uma ordenação
+            unordered = self._best(memo, mask, ())
+            cost = unordered.cost + sort_cost(group.rows)
+            if winner is None or cost < winner.cost:
+                winner = Winner(cost, order=order)
+
+        group.winners[order] = winner
+        return winner
+
+    def _implementations(self, memo, group, left, right):
+        left_group, right_group = memo.groups[left], memo.groups[right]
+        left_rows, right_rows = left_group.rows, right_group.rows
+        output = group.rows * OUTPUT_ROW_COST
+        left_cost = self._best(memo, left, ()).cost
+        right_cost = self._best(memo, right, ()).cost
+        predicates = self._spanning(memo, group.mask, left, right)
+        keys = self._keys(predicates, left)
+
+        blocks = math.ceil(left_rows / _NESTED_LOOP_BLOCK)
+        yield Winner(
+            left_cost
+            + blocks * right_cost
+            + left_rows * right_rows * NESTED_LOOP_PAIR_COST
+            + output,
+            NESTED_LOOP_JOIN,
+            left,
+            right,
+        )
+        if not keys:
+            return
+
+        yield Winner(
+            left_cost
+            + right_cost
+            + left_rows * HASH_PROBE_ROW_COST
+            + right_rows * HASH_BUILD_ROW_COST
+            + output,
+            HASH_JOIN,
+            left,
+            right,
+        )
+
+        left_order = tuple(k[1] for k in keys)
+        right_order = tuple(k[2] for k in keys)
+        yield Winner(
+            self._best(memo, left, left_order).cost
+            + self._best(memo, right, right_order).cost
+            + (left_rows + right_rows) * MERGE_ROW_COST
+            + output,
+            MERGE_JOIN,
+            left,
+            right,
+            left_order,
+            right_order,
+            tuple(k[0] for k in keys),
+            left_order,
+        )
+
+        index_cost = self._index_cost(memo, right, keys)
+        if index_cost is not None:
+            yield Winner(
+                left_cost + left_rows * index_cost + output, INDEX_JOIN, left, right
+            )
+
+    def _index_cost(self, memo, right, keys):
+        """Custo por linha externa de buscar o lado direito pelo índice (None se não houver)"""
+        if right & (right - 1):
+            return None
+        table = memo.leaves[right.bit_length() - 1].table
+        if table is None:
+            return None
+        best = None
+        for predicate, _, (inner_table, inner_column) in keys:
+            if inner_table != table.name.lower() or not get_indexes(table.name, inner_column):
+                continue
+            matches = self.estimator.table_rows(table.name) * self.estimator.join_selectivity(
+                predicate.expr
+            )
+            cost = INDEX_PROBE_COST + matches * INDEX_ROW_COST
+            if best is None or cost < best:
+                best = cost
+        return best
+
+    # Extração ------------------------------------------------------------
+
+    def _extract(self, memo, mask, order, root=False):
+        winner = memo.groups[mask].winners[order]
+        if winner.method is None:
+            if mask & (mask - 1):
+                return self._extract(memo, mask, (), root)  # A ordenação fica no executor
+            return memo.leaves[mask.bit_length() - 1].expr
+
+        left = self._extract(memo, winner.left, winner.left_order)
+        right = self._extract(memo, winner.right, winner.right_order)
+        terms = [p.expr for p in winner.keys]
+        for predicate in memo.predicates:
+            if predicate in winner.keys:
+                continue
+            mask_p = predicate.mask
+            if mask_p & (mask_p - 1):
+                placed = mask_p & mask == mask_p and mask_p & ~winner.left and mask_p & ~winner.right
+            elif mask_p:
+                # Filtro de uma folha só: fica na junção que recebe a folha
+                placed = mask_p in (winner.left, winner.right)
+            else:
+                placed = root  # Sem tabelas (constantes): na raiz da região
+            if placed:
+                terms.append(predicate.expr)
+        condition = make_bool("AND", terms) if terms else None
+        return Join(condition, left, right, winner.method)
@@ -107,54 +107,355 @@ SCHEMA = {
 # }
 
 
+HASH_INDEX = "hash"
+BTREE_INDEX = "btree"
+INDEX_KINDS = (HASH_INDEX, BTREE_INDEX)
+
+
+class IndexDefinition:
+    """
+    Índice secundário sobre uma coluna. ``hash`` atende igualdades; ``btree``
+    (ordenado) atende igualdades e intervalos.
+    """
+
+    __slots__ = ("name", "table", "column", "kind")
+
+    def __init__(self, name, table, column, kind=BTREE_INDEX):
+        self.name = name
+        self.table = table
+        self.column = column
+        self.kind = kind
+
+    def supports(self, op):
+        return op == "=" or (self.kind == BTREE_INDEX and op in ("<", "<=", ">", ">="))
+
+    def __repr__(self):
+        return f"IndexDefinition({self.name!r}, {self.table}.{self.column}, {self.kind})"
+
+
+class Catalog:
+    """
+    Índices do esquema com chave em minúsculas, montados uma única vez.
+    Todas as consultas (tabela, coluna, FK) são buscas O(1) em dicionários.
+
+    Com um ``loader`` (ver schema_loader.py) apenas os nomes das tabelas são
+    lidos na criação; a definição de cada tabela é carregada e indexada na
+    primeira vez em que ela é referenciada.
+    """
+
+    def __init__(self, schema=None, loader=None):
+        self.schema = schema if schema is not None else {}
+        self.loader = loader
+        self.version = 0  # Incrementa a cada alteração do esquema
+        self._table_versions = {}  # tabela -> versão da última alteração
+        self._tables = {}  # nome em minúsculas -> nome canônico
+        self._pending = set()  # tabelas conhecidas ainda não carregadas
+        self._columns = {}  # tabela canônica -> {coluna minúscula: coluna}
+        self._foreign_keys = {}  # tabela -> {coluna fk: (tabela ref, coluna ref)}
+        self._referenced_by = {}  # tabela ref -> {(tabela, coluna fk): coluna ref}
+        self._fk_pairs = {}  # (tabela, tabela ref) -> (coluna fk, coluna ref)
+        self._indexes = {}  # tabela -> {coluna minúscula: [IndexDefinition]}
+
+        for name, definition in self.schema.items():
+            self._index_table(name, definition)
+
+        if loader is not None:
+            for name in loader.table_names():
+                if name.lower() not in self._tables:
+                    self._tables[name.lower()] = name
+                    self._pending.add(name)
+
+    def add_table(self, name, definition):
+        """Adiciona ou altera uma tabela reindexando apenas ela"""
+        canonical = self._tables.get(name.lower())
+        if canonical is not None:
+            if canonical in self._pending:
+                self._pending.discard(canonical)
+                del self._tables[name.lower()]
+            else:
+                self._unindex_table(canonical)
+                del self.schema[canonical]
+        self.schema[name] = definition
+        self._index_table(name, definition)
+        self._touch(name)
+
+    alter_table = add_table
+
+    def drop_table(self, name):
+        canonical = self._tables.get(name.lower())
+        if canonical is None:
+            return False
+        if canonical in self._pending:
+            self._pending.discard(canonical)
+            del self._tables[name.lower()]
+        else:
+            self._unindex_table(canonical)
+            del self.schema[canonical]
+        self._touch(canonical)
+        return True
+
+    def _touch(self, name):
+        self.version += 1
+        self._table_versions[name.lower()] = self.version
+
+    def table_version(self, table_name):
+        """Versão do catálogo em que a tabela foi alterada pela última vez"""
+        return self._table_versions.get(table_name.lower(), 0)
+
+    def table_names(self):
+        return list(self._tables.values())
+
+    def _resolve(self, table_name):
+        """Nome canônico da tabela (carregando-a se necessário) ou None"""
+        canonical = self._tables.get(table_name.lower())
+        if canonical is not None and canonical in self._pending:
+            self._pending.discard(canonical)
+            definition = self.loader.load_table(canonical)
+            self.schema[canonical] = definition
+            self._index_table(canonical, definition)
+        return canonical
+
+    def _load_all(self):
+        for name in list(self._pending):
+            self._resolve(name)
+
+    def _index_table(self, name, definition):
+        self._tables[name.lower()] = name
+        self._columns[name] = {col.lower(): col for col in definition["columns"]}
+
+        foreign_keys = definition.get("foreign_keys", {})
+        self._foreign_keys[name] = foreign_keys
+        for fk_col, (ref_table, ref_col) in foreign_keys.items():
+            self._referenced_by.setdefault(ref_table, {})[(name, fk_col)] = ref_col
+            self._fk_pairs.setdefault((name, ref_table), (fk_col, ref_col))
+        self._indexes[name] = self._index_definitions(name, definition)
+
+    def _index_definitions(self, name, definition):
+        """Índices automáticos (B-tree na PK, hash nas FKs) mais os declarados"""
+        indexes = {}
+
+        def add(index):
+            indexes.setdefault(index.column.lower(), []).append(index)
+
+        primary_key = definition.get("primary_key")
+        if primary_key:
+            add(IndexDefinition(f"{name}_pkey", name, primary_key, BTREE_INDEX))
+        for fk_col in definition.get("foreign_keys", {}):
+            add(IndexDefinition(f"{name}_{fk_col}_fkey", name, fk_col, HASH_INDEX))
+        for index_name, spec in (definition.get("indexes") or {}).items():
+            add(IndexDefinition(index_name, name, spec["column"], spec.get("kind", BTREE_INDEX)))
+        return indexes
+
+    def _unindex_table(self, name):
+        del self._tables[name.lower()]
+        del self._columns[name]
+        del self._indexes[name]
+
+        for fk_col, (ref_table, ref_col) in self._foreign_keys.pop(name).items():
+            self._referenced_by.get(ref_table, {}).pop((name, fk_col), None)
+            self._fk_pairs.pop((name, ref_table), None)
+
+    def normalize_table_name(self, table_name):
+        return self._tables.get(table_name.lower(), table_name)
+
+    def table_exists(self, table_name):
+        return table_name.lower() in self._tables
+
+    def get_table_columns(self, table_name):
+        canonical = self._resolve(table_name)
+        if canonical is None:
+            return None
+        return self.schema[canonical]["columns"]
+
+    def column_exists_in_table(self, table_name, column_name):
+        canonical = self._resolve(table_name)
+        return canonical is not None and column_name.lower() in self._columns[canonical]
+
+    def normalize_column_name(self, table_name, column_name):
+        canonical = self._resolve(table_name)
+        if canonical is None:
+            return column_name
+        return self._columns[canonical].get(column_name.lower(), column_name)
+
+    def get_primary_key(self, table_name):
+        canonical = self._resolve(table_name)
+        if canonical is None:
+            return None
+        return self.schema[canonical].get("primary_key")
+
+    def get_foreign_keys(self, table_name):
+        canonical = self._resolve(table_name)
+        if canonical is None:
+            return {}
+        return self._foreign_keys[canonical]
+
+    def get_referencing_foreign_keys(self, table_name):
+        """FKs de outras tabelas que apontam para esta: {(tabela, coluna fk): coluna}"""
+        # O índice reverso depende de todas as tabelas: força a carga completa
+        self._load_all()
+        return self._referenced_by.get(self.normalize_table_name(table_name), {})
+
+    def create_index(self, table_name, column_name, kind=BTREE_INDEX, name=None):
+        """
+        Equivalente a CREATE INDEX: registra o índice na definição da tabela,
+        o que muda a versão dela e invalida os planos guardados em cache.
+        """
+        canonical = self._resolve(table_name)
+        if canonical is None:
+            raise KeyError(f"Tabela '{table_name}' não existe no esquema")
+        if column_name.lower() not in self._columns[canonical]:
+            raise KeyError(f"Coluna '{column_name}' não existe na tabela '{canonical}'")
+        if kind not in INDEX_KINDS:
+            raise ValueError(f"Tipo de índice inválido: '{kind}'")
+
+        column = self._columns[canonical][column_name.lower()]
+        name = name or f"{canonical}_{column}_idx"
+        definition = dict(self.schema[canonical])
+        definition["indexes"] = dict(definition.get("indexes") or {})
+        definition["indexes"][name] = {"column": column, "kind": kind}
+        self.add_table(canonical, definition)
+        return self.get_index(canonical, name)
+
+    def drop_index(self, table_name, index_name):
+        canonical = self._resolve(table_name)
+        if canonical is None:
+            return False
+        declared = self.schema[canonical].get("indexes") or {}
+        if index_name not in declared:
+            return False  # Índices de PK/FK acompanham as restrições
+        definition = dict(self.schema[canonical])
+        definition["indexes"] = {k: v for k, v in declared.items() if k != index_name}
+        self.add_table(canonical, definition)
+        return True
+
+    def get_indexes(self, table_name, column_name=None):
+        """Índices da tabela (ou só os da coluna informada)"""
+        canonical = self._resolve(table_name)
+        if canonical is None:
+            return []
+        indexes = self._indexes[canonical]
+        if column_name is not None:
+            return list(indexes.get(column_name.lower(), ()))
+        return [index for column in indexes.values() for index in column]
+
+    def get_sort_order(self, table_name):
+        """
+        Colunas pelas quais as linhas da tabela estão gravadas em ordem
+        (``"sort_order"`` na definição); vazio se a ordem física é desconhecida
+        """
+        canonical = self._resolve(table_name)
+        if canonical is None:
+            return ()
+        columns = self._columns[canonical]
+        return tuple(
+            columns.get(column.lower(), column)
+            for column in self.schema[canonical].get("sort_order") or ()
+        )
+
+    def set_sort_order(self, table_name, column_names):
+        """
+        Declara a ordem física das linhas (como um índice clusterizado); muda a
+        versão da tabela, invalidando os planos guardados em cache
+        """
+        canonical = self._resolve(table_name)
+        if canonical is None:
+            raise KeyError(f"Tabela '{table_name}' não existe no esquema")
+        for column in column_names:
+            if column.lower() not in self._columns[canonical]:
+                raise KeyError(f"Coluna '{column}' não existe na tabela '{canonical}'")
+        definition = dict(self.schema[canonical])
+        if column_names:
+            definition["sort_order"] = tuple(
+                self._columns[canonical][column.lower()] for column in column_names
+            )
+        else:
+            definition.pop("sort_order", None)
+        self.add_table(canonical, definition)
+
+    def get_index(self, table_name, index_name):
+        for index in self.get_indexes(table_name):
+            if index.name == index_name:
+                return index
+        return None
+
+    def find_join_path(self, table1, table2):
+        table1_norm = self._resolve(table1) or table1
+        table2_norm = self._resolve(table2) or table2
+
+        # Verifica se há relação direta
+        pair = self._fk_pairs.get((table1_norm, table2_norm))
+        if pair:
+            return (table1_norm, pair[0], table2_norm, pair[1])
+
+        # Verifica relação inversa
+        pair = self._fk_pairs.get((table2_norm, table1_norm))
+        if pair:
+            return (table2_norm, pair[0], table1_norm, pair[1])
+
+        return None
+
+
+CATALOG = Catalog(SCHEMA)
+
+
+def set_catalog(catalog):
+    """Troca o catálogo usado pelas funções deste módulo"""
+    global CATALOG
+    CATALOG = catalog
+    return catalog
+
+
+def get_catalog():
+    return CATALOG
+
+
 def get_table_columns(table_name):
-    table_name_normalized = normalize_table_name(table_name)
-    if table_name_normalized in SCHEMA:
-        return SCHEMA[table_name_normalized]["columns"]
-    return None
+    return CATALOG.get_table_columns(table_name)
 
 
 def table_exists(table_name):
-    return normalize_table_name(table_name) in SCHEMA
+    return CATALOG.table_exists(table_name)
 
 
 def column_exists_in_table(table_name, column_name):
-    columns = get_table_columns(table_name)
-    if columns:
-        column_name_lower = column_name.lower()
-        return any(col.lower() == column_name_lower for col in columns)
-    return False
+    return CATALOG.column_exists_in_table(table_name, column_name)
+
+
+def normalize_column_name(table_name, column_name):
+    return CATALOG.normalize_column_name(table_name, column_name)
 
 
 def normalize_table_name(table_name):
-    table_name_lower = table_name.lower()
-    for schema_table in SCHEMA.keys():
-        if schema_table.lower() == table_name_lower:
-            return schema_table
-    return table_name
+    return CATALOG.normalize_table_name(table_name)
+
+
+def get_primary_key(table_name):
+    return CATALOG.get_primary_key(table_name)
 
 
 def get_foreign_keys(table_name):
-    table_name_normalized = normalize_table_name(table_name)
-    if table_name_normalized in SCHEMA:
-        return SCHEMA[table_name_normalized].get("foreign_keys", {})
-    return {}
+    return CATALOG.get_foreign_keys(table_name)
+
+
+def get_referencing_foreign_keys(table_name):
+    return CATALOG.get_referencing_foreign_keys(table_name)
 
 
 def find_join_path(table1, table2):
-    table1_norm = normalize_table_name(table1)
-    table2_norm = normalize_table_name(table2)
-
-    # Verifica se há relação direta
-    fks1 = get_foreign_keys(table1_norm)
-    for fk_col, (ref_table, ref_col) in fks1.items():
-        if ref_table == table2_norm:
-            return (table1_norm, fk_col, table2_norm, ref_col)
-
-    # Verifica relação inversa
-    fks2 = get_foreign_keys(table2_norm)
-    for fk_col, (ref_table, ref_col) in fks2.items():
-        if ref_table == table1_norm:
-            return (table2_norm, fk_col, table1_norm, ref_col)
-
-    return None
+    return CATALOG.find_join_path(table1, table2)
+
+
+def create_index(table_name, column_name, kind=BTREE_INDEX, name=None):
+    return CATALOG.create_index(table_name, column_name, kind, name)
+
+
+def get_indexes(table_name, column_name=None):
+    return CATALOG.get_indexes(table_name, column_name)
+
+
+def get_sort_order(table_name):
+    return CATALOG.get_sort_order(table_name)
+
+
+def set_sort_order(table_name, column_names):
+    return CATALOG.set_sort_order(table_name, column_names)
@@ -0,0 +1,312 @@
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+
+from algebra_expressions import *
+from execution_engine import ExecutionEngine, PhysicalOperator, TableScan, split_equi_join
+from graph_builder import GraphNode, OperatorGraph
+from metadata import get_catalog, set_catalog
+
+DEFAULT_PARALLELISM = os.cpu_count() or 1
+
+
+def partition_of(key, partitions):
+    """
+    Partição de uma chave de junção. hash() de textos muda a cada processo,
+    então textos usam CRC32; números mantêm hash() para que 3 e 3.0 (iguais
+    no HashJoin) caiam na mesma partição.
+    """
+    h = 0
+    for value in key:
+        if isinstance(value, (int, float)):
+            part = hash(value)
+        else:
+            part = zlib.crc32(str(value).encode("utf-8"))
+        h = (h * 1000003 + part) & 0xFFFFFFFFFFFFFFFF
+    return h % partitions
+
+
+class Exchange(AlgebraExpression):
+    """
+    Folha de um fragmento que recebe as linhas produzidas por outro estágio
+    (a troca de dados entre processos passa pelo coordenador).
+    """
+
+    __slots__ = ("index", "columns")
+
+    def __init__(self, index, columns):
+        object.__setattr__(self, "index", index)  # 0 = entrada esquerda, 1 = direita
+        object.__setattr__(self, "columns", tuple(columns))
+        self._freeze()
+
+    def to_string(self, indent=0):
+        return f"{'  ' * indent}⇄ entrada {self.index}"
+
+    def get_tables(self):
+        return []
+
+
+class PartitionedTableScan(TableScan):
+    def __init__(self, source, table, partition, partitions):
+        super().__init__(source, table)
+        self.partition = partition
+        self.partitions = partitions
+
+    def __iter__(self):
+        scan_partition = getattr(self.source, "scan_partition", None)
+        if scan_partition is not None:
+            return iter(scan_partition(self.table, self.partition, self.partitions))
+        return islice(self.source.scan(self.table), self.partition, None, self.partitions)
+
+    def describe(self):
+        return f"TableScan({self.table}, partição {self.partition + 1}/{self.partitions})"
+
+
+class RowsInput(PhysicalOperator):
+    def __init__(self, columns, rows):
+        self.columns = columns
+        self.rows = rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+class _PartitionEngine(ExecutionEngine):
+    """Compila um fragmento do plano para rodar sobre uma única partição"""
+
+    def __init__(self, source, partition, partitions, inputs=None):
+        super().__init__(source)
+        self.partition = partition
+        self.partitions = partitions
+        self.inputs = inputs
+
+    def _build_operator(self, node):
+        expr = node.expr
+        if isinstance(expr, Table):
+            return PartitionedTableScan(self.source, expr.name, self.partition, self.partitions)
+        if isinstance(expr, Exchange):
+            return RowsInput(expr.columns, self.inputs[expr.index])
+        return super()._build_operator(node)
+
+
+def _graph(expr):
+    """Envolve a expressão algébrica num grafo de operadores para o ExecutionEngine"""
+
+    def node(expr):
+        if isinstance(expr, (Projection, Selection, Aggregation, Sort)):
+            children = [node(expr.child)]
+        elif isinstance(expr, Join):
+            children = [node(expr.left), node(expr.right)]
+        else:
+            children = []
+        return GraphNode(type(expr).__name__, "", children, expr=expr)
+
+    return OperatorGraph(node(expr))
+
+
+# Estado dos processos do pool: a fonte de dados é enviada uma única vez
+_worker_source = None
+
+
+def _init_worker(catalog, source):
+    global _worker_source
+    set_catalog(catalog)
+    _worker_source = source
+
+
+def _execute_partition(fragment, partition, partitions, inputs, keys):
+    """
+    Executa o fragmento sobre uma partição. Com ``keys`` a saída já volta
+    dividida em baldes pelo hash dessas colunas, prontos para a junção.
+    """
+    engine = _PartitionEngine(_worker_source, partition, partitions, inputs)
+    rows = engine.compile(_graph(fragment))
+    if keys is None:
+        return list(rows)
+    buckets = [[] for _ in range(partitions)]
+    for row in rows:
+        buckets[partition_of([row[i] for i in keys], partitions)].append(row)
+    return buckets
+
+
+def _stage_join(expr):
+    """Junção na base da cadeia de operadores unários (None se for um scan)"""
+    while isinstance(expr, (Projection, Selection, Aggregation, Sort)):
+        expr = expr.child
+    return expr if isinstance(expr, Join) else None
+
+
+def _replace_join(expr, join, replacement):
+    if expr is join:
+        return replacement
+    return expr.replace(child=_replace_join(expr.child, join, replacement))
+
+
+def _split_final(expr):
+    """
+    Divide a consulta no γ/τ mais baixo acima das junções: devolve (corpo,
+    final), com o corpo executado nas partições e o final executado uma vez
+    no coordenador sobre as saídas reunidas (lidas pela Exchange 0). Um γ é
+    dividido em agregação parcial e final; τ com LIMIT guarda os n primeiros
+    de cada partição e de novo no coordenador. (expr, None) sem γ nem τ.
+    """
+    above, lowest = [], None
+    node = expr
+    while isinstance(node, (Projection, Aggregation, Sort)):
+        above.append(node)
+        if isinstance(node, (Aggregation, Sort)):
+            lowest = len(above)
+        if isinstance(node, Aggregation):
+            break
+        node = node.child
+    if lowest is None:
+        return expr, None
+
+    above = above[:lowest]
+    split = above.pop()
+    if isinstance(split, Aggregation):
+        body = split.replace(phase=PARTIAL_AGGREGATION)
+        split = split.replace(phase=FINAL_AGGREGATION)
+    elif split.limit is not None:
+        body = split
+    else:
+        body = split.child
+    return body, above + [split]
+
+
+class _Stage:
+    """
+    Fragmento do plano executado como N tarefas, uma por partição. Estágios
+    de scan começam com uma tabela; estágios de junção recebem as saídas de
+    dois estágios filhos (particionadas por hash ou difundidas).
+    """
+
+    def __init__(self, expr, keys):
+        self.expr = expr
+        self.keys = keys  # Posições para particionar a saída (None = livre)
+        self.join = _stage_join(expr)
+        self.partitioned = False  # Junção com entradas particionadas por hash
+        self.children = []
+        self.futures = None
+
+
+class ParallelExecutionEngine:
+    """
+    Executa o plano em um pool de processos. Cada scan é dividido em
+    partições; junções por igualdade redistribuem as duas entradas por hash
+    das chaves (cada processo junta um par de partições) e as demais difundem
+    a entrada direita inteira para todas as partições da esquerda. Agregações
+    rodam em duas fases (parcial em cada partição, final no coordenador) e
+    ORDER BY ... LIMIT n devolve só n linhas de cada partição.
+    """
+
+    def __init__(self, source, parallelism=None):
+        self.source = source
+        self.parallelism = max(parallelism or DEFAULT_PARALLELISM, 1)
+        self._local = ExecutionEngine(source)
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                self.parallelism,
+                initializer=_init_worker,
+                initargs=(get_catalog(), self.source),
+            )
+        return self._pool
+
+    def execute(self, operator_graph):
+        """Devolve (colunas, iterador de linhas); as partições são materializadas"""
+        root = operator_graph.root.expr
+        body, final = _split_final(root)
+        stage = self._build_stage(body, None)
+        self._submit_scans(stage)
+        partitions = self._result(stage)
+        if final is None:
+            return self._columns(root), chain.from_iterable(partitions)
+
+        # Agregação final / ordenação no coordenador, sobre todas as partições
+        plan = final[-1].replace(child=Exchange(0, self._columns(body)))
+        for expr in reversed(final[:-1]):
+            plan = expr.replace(child=plan)
+        engine = _PartitionEngine(self.source, 0, 1, (chain.from_iterable(partitions),))
+        operator = engine.compile(_graph(plan))
+        return operator.columns, iter(operator)
+
+    def _columns(self, expr):
+        return self._local.compile(_graph(expr)).columns
+
+    def _build_stage(self, expr, keys):
+        stage = _Stage(expr, keys)
+        join = stage.join
+        if join is not None:
+            left_keys, right_keys, _ = split_equi_join(
+                join.condition, self._columns(join.left), self._columns(join.right)
+            )
+            stage.partitioned = bool(left_keys)
+            stage.children = [
+                self._build_stage(join.left, left_keys or None),
+                self._build_stage(join.right, right_keys or None),
+            ]
+        return stage
+
+    def _submit_scans(self, stage):
+        """Dispara de imediato todos os estágios de scan, que não têm dependências"""
+        if stage.join is None:
+            stage.futures = [
+                self.pool.submit(
+                    _execute_partition, stage.expr, i, self.parallelism, None, stage.keys
+                )
+                for i in range(self.parallelism)
+            ]
+        for child in stage.children:
+            self._submit_scans(child)
+
+    def _result(self, stage):
+        """Linhas de cada partição da saída do estágio"""
+        if stage.futures is None:
+            left, right = (self._result(child) for child in stage.children)
+            if not stage.partitioned:
+                right = [list(chain.from_iterable(right))] * self.parallelism
+            join = stage.join
+            fragment = _replace_join(
+                stage.expr,
+                join,
+                join.replace(
+                    left=Exchange(0, self._columns(join.left)),
+                    right=Exchange(1, self._columns(join.right)),
+                ),
+            )
+            stage.futures = [
+                self.pool.submit(
+                    _execute_partition,
+                    fragment,
+                    i,
+                    self.parallelism,
+                    (left[i], right[i]),
+                    stage.keys,
+                )
+                for i in range(self.parallelism)
+            ]
+
+        results = [future.result() for future in stage.futures]
+        if stage.keys is None:
+            return results
+        # Balde j de cada tarefa forma a partição j
+        return [
+            list(chain.from_iterable(buckets[j] for buckets in results))
+            for j in range(self.parallelism)
+        ]
@@ -0,0 +1,179 @@
+import operator
+
+from cost_model import CardinalityEstimator
+from sql_ast import BoolExpr, ColumnRef, Comparison, Literal, make_bool
+
+COMPARATORS = {
+    "=": operator.eq,
+    "<>": operator.ne,
+    "<": operator.lt,
+    ">": operator.gt,
+    "<=": operator.le,
+    ">=": operator.ge,
+}
+
+
+def column_key(ref):
+    """Chave (tabela, coluna) em minúsculas usada para localizar colunas"""
+    return ((ref.table or "").lower(), ref.column.lower())
+
+
+def column_positions(columns):
+    return {column_key(ref): i for i, ref in enumerate(columns)}
+
+
+def evaluate(expr, row, positions):
+    """Avalia uma expressão da AST sobre uma linha (None = desconhecido)"""
+    if isinstance(expr, ColumnRef):
+        return row[positions[column_key(expr)]]
+    if isinstance(expr, Literal):
+        return expr.value
+    if isinstance(expr, Comparison):
+        left = evaluate(expr.left, row, positions)
+        right = evaluate(expr.right, row, positions)
+        if left is None or right is None:
+            return None
+        try:
+            return COMPARATORS[expr.op](left, right)
+        except TypeError:
+            return False  # Tipos incomparáveis (ex: texto < número)
+    if isinstance(expr, BoolExpr):
+        if expr.op == "AND":
+            for operand in expr.operands:
+                if not evaluate(operand, row, positions):
+                    return False
+            return True
+        for operand in expr.operands:
+            if evaluate(operand, row, positions):
+                return True
+        return False
+    raise ValueError(f"Expressão não suportada: {expr!r}")
+
+
+_PYTHON_OPERATORS = {"=": "==", "<>": "!=", "<": "<", ">": ">", "<=": "<=", ">=": ">="}
+
+# Custo relativo de avaliar um termo: comparar textos é mais caro que números
+_NUMBER_COST = 1.0
+_TEXT_COST = 2.0
+
+
+def _constant_comparison(op, left, right):
+    try:
+        return COMPARATORS[op](left, right)
+    except TypeError:
+        return False
+
+
+def fold_constants(expr):
+    """
+    Simplifica a expressão: comparações entre literais viram True/False e
+    AND/OR com operandos constantes são reduzidos. Devolve um bool quando a
+    expressão inteira é constante.
+    """
+    if isinstance(expr, Comparison):
+        if isinstance(expr.left, Literal) and isinstance(expr.right, Literal):
+            return _constant_comparison(expr.op, expr.left.value, expr.right.value)
+        return expr
+
+    if isinstance(expr, BoolExpr):
+        neutral = expr.op == "AND"  # True é neutro no AND, False no OR
+        operands = []
+        for operand in expr.operands:
+            folded = fold_constants(operand)
+            if folded is True or folded is False:
+                if folded != neutral:
+                    return folded  # AND com False / OR com True
+                continue
+            operands.append(folded)
+        if not operands:
+            return neutral
+        return make_bool(expr.op, operands)
+
+    return expr
+
+
+class PredicateCompiler:
+    """
+    Compila condições da AST em funções Python especializadas para um layout
+    de colunas: referências viram índices da tupla, constantes são dobradas e
+    os termos de AND/OR são ordenados para que os mais baratos e seletivos
+    sejam avaliados primeiro (com curto-circuito do próprio Python).
+    """
+
+    def __init__(self, estimator=None):
+        self.estimator = estimator or CardinalityEstimator()
+
+    def compile(self, condition, columns):
+        positions = column_positions(columns)
+        folded = fold_constants(condition)
+        if folded is True or folded is False:
+            constant = folded
+            return lambda row: constant
+
+        namespace = {"_evaluate": evaluate, "_condition": folded, "_positions": positions}
+        body = self._generate(folded, positions, namespace)
+        source = (
+            "def predicate(row):\n"
+            "    try:\n"
+            f"        return {body}\n"
+            "    except TypeError:\n"
+            "        return bool(_evaluate(_condition, row, _positions))\n"
+        )
+        exec(compile(source, f"<predicado: {folded}>", "exec"), namespace)
+        predicate = namespace["predicate"]
+        predicate.source = source
+        return predicate
+
+    def _generate(self, expr, positions, namespace):
+        if isinstance(expr, BoolExpr):
+            operands = self._order(expr)
+            joiner = " and " if expr.op == "AND" else " or "
+            parts = [self._generate(e, positions, namespace) for e in operands]
+            return "(" + joiner.join(parts) + ")"
+
+        if isinstance(expr, Comparison):
+            left = self._operand(expr.left, positions, namespace)
+            right = self._operand(expr.right, positions, namespace)
+            op = _PYTHON_OPERATORS[expr.op]
+            # NULL nunca satisfaz uma comparação
+            guards = [
+                f"{code} is not None"
+                for code, node in ((left, expr.left), (right, expr.right))
+                if isinstance(node, ColumnRef)
+            ]
+            if expr.op == "=" and len(guards) < 2:
+                guards = []  # None == constante já é False
+            return "(" + " and ".join(guards + [f"{left} {op} {right}"]) + ")"
+
+        raise ValueError(f"Expressão não suportada: {expr!r}")
+
+    def _operand(self, expr, positions, namespace):
+        if isinstance(expr, ColumnRef):
+            return f"row[{positions[column_key(expr)]}]"
+        name = f"_c{len(namespace)}"
+        namespace[name] = expr.value
+        return name
+
+    def _order(self, expr):
+        """
+        Ordena os termos por rank: no AND, o que mais descarta por unidade de
+        custo vem primeiro; no OR, o que mais aceita.
+        """
+
+        def rank(term):
+            selectivity = self.estimator.selectivity(term)
+            if expr.op == "AND":
+                return (1.0 - selectivity) / self._cost(term)
+            return selectivity / self._cost(term)
+
+        return sorted(expr.operands, key=rank, reverse=True)
+
+    def _cost(self, expr):
+        if isinstance(expr, BoolExpr):
+            return sum(self._cost(e) for e in expr.operands)
+        if isinstance(expr, Comparison):
+            for side in (expr.left, expr.right):
+                if isinstance(side, Literal) and isinstance(side.value, str):
+                    return _TEXT_COST
+            return _NUMBER_COST
+        return _NUMBER_COST
@@ -0,0 +1,142 @@
+"""
+Classificação dos termos de uma condição e forma normal conjuntiva (CNF).
+
+Cada termo de um AND é classificado pelas tabelas que referencia: filtro de
+uma tabela, predicado de junção entre duas ou residual sobre três ou mais
+(termos sem tabela, como 1 = 0, são constantes). As regras de rewrite_rules
+levam cada termo ao nó mais baixo que contém todas as suas tabelas.
+
+Um OR não é um conjunto de termos e por isso não desceria inteiro. Convertido
+para CNF ele vira um AND de cláusulas, e as cláusulas de uma só tabela descem
+como filtros:
+
+    (A.x = 1 AND B.y = 2) OR (A.x = 3 AND B.y = 4)
+    → (A.x = 1 OR A.x = 3) AND (B.y = 2 OR B.y = 4)
+      AND (A.x = 1 OR B.y = 4) AND (B.y = 2 OR A.x = 3)
+"""
+
+from sql_ast import BoolExpr, conjuncts, make_bool, referenced_tables
+
+CONSTANT = "constante"  # Nenhuma tabela
+FILTER = "filtro"  # Uma tabela
+JOIN_PREDICATE = "juncao"  # Duas tabelas
+RESIDUAL = "residual"  # Três ou mais tabelas
+
+DEFAULT_MAX_CNF_CLAUSES = 16  # A distribuição do OR pode crescer exponencialmente
+
+
+def predicate_tables(term):
+    """Tabelas (em minúsculas) referenciadas pelo termo"""
+    return frozenset(table.lower() for table in referenced_tables(term))
+
+
+def predicate_kind(tables):
+    if not tables:
+        return CONSTANT
+    if len(tables) == 1:
+        return FILTER
+    if len(tables) == 2:
+        return JOIN_PREDICATE
+    return RESIDUAL
+
+
+class Predicate:
+    """Termo de um AND com as tabelas que usa e sua classe"""
+
+    __slots__ = ("term", "tables", "kind")
+
+    def __init__(self, term):
+        self.term = term
+        self.tables = predicate_tables(term)
+        self.kind = predicate_kind(self.tables)
+
+    def __repr__(self):
+        return f"Predicate({self.kind}, {self.term.render()!r})"
+
+
+def classify(condition):
+    """Lista de Predicate dos termos da condição (vazia para None)"""
+    return [Predicate(term) for term in conjuncts(condition)]
+
+
+def _clauses(expr, limit):
+    """Cláusulas (listas de átomos) da CNF de ``expr``; None acima de ``limit``"""
+    if not isinstance(expr, BoolExpr):
+        return [[expr]]
+    parts = []
+    for operand in expr.operands:
+        clauses = _clauses(operand, limit)
+        if clauses is None:
+            return None
+        parts.append(clauses)
+    if expr.op == "AND":
+        result = [clause for clauses in parts for clause in clauses]
+    else:
+        result = [[]]
+        for clauses in parts:
+            result = [left + right for left in result for right in clauses]
+            if len(result) > limit:
+                return None
+    return result if len(result) <= limit else None
+
+
+def _simplify(clauses):
+    """Tira átomos repetidos e cláusulas absorvidas: a AND (a OR b) → a"""
+    unique = []
+    for clause in clauses:
+        atoms = []
+        for atom in clause:
+            if atom not in atoms:
+                atoms.append(atom)
+        unique.append(atoms)
+
+    kept = []
+    for i, clause in enumerate(unique):
+        atoms = set(clause)
+        absorbed = any(
+            set(other) < atoms or (set(other) == atoms and j < i)
+            for j, other in enumerate(unique)
+            if j != i
+        )
+        if not absorbed:
+            kept.append(clause)
+    return kept
+
+
+def to_cnf(expr, max_clauses=DEFAULT_MAX_CNF_CLAUSES):
+    """
+    Lista de termos (cláusulas) cujo AND equivale a ``expr``, ou None se a
+    CNF passar de ``max_clauses`` cláusulas.
+    """
+    clauses = _clauses(expr, max_clauses)
+    if clauses is None:
+        return None
+    return [make_bool("OR", clause) for clause in _simplify(clauses)]
+
+
+def _atom_count(expr):
+    """Número de comparações (folhas de AND/OR) da expressão"""
+    if isinstance(expr, BoolExpr):
+        return sum(_atom_count(operand) for operand in expr.operands)
+    return 1
+
+
+def split_disjunction(term, max_clauses=DEFAULT_MAX_CNF_CLAUSES):
+    """
+    CNF de um OR que tem algum ramo AND, se ela valer a pena: alguma cláusula
+    usa menos tabelas que o termo (pode descer mais na árvore) ou a CNF não
+    tem mais comparações que o original (fatoração: (a ∧ b) ∨ (a ∧ c) →
+    a ∧ (b ∨ c)). None quando o termo deve ficar como está.
+    """
+    if not (isinstance(term, BoolExpr) and term.op == "OR"):
+        return None
+    if not any(isinstance(operand, BoolExpr) for operand in term.operands):
+        return None
+    clauses = to_cnf(term, max_clauses)
+    if clauses is None:
+        return None
+    tables = predicate_tables(term)
+    narrower = any(len(predicate_tables(clause)) < len(tables) for clause in clauses)
+    if narrower or sum(map(_atom_count, clauses)) <= _atom_count(term):
+        return clauses
+    return None
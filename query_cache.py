@@ -0,0 +1,262 @@
+from collections import OrderedDict
+
+from algebra_expressions import *
+from metadata import get_catalog
+from sql_ast import BoolExpr, Comparison, JoinClause, Literal, SelectStatement
+from sql_lexer import tokenize
+
+
+def fingerprint_query(sql_query):
+    """
+    Impressão digital normalizada da consulta: espaços e maiúsculas/minúsculas
+    ignorados e literais substituídos por '?'. Devolve (fingerprint, literais),
+    com os literais na ordem em que aparecem no texto. O número do LIMIT faz
+    parte do fingerprint: ele muda o plano (top-N) e não é um literal da AST.
+
+    Só nomes de tabela (após FROM/JOIN) e nomes qualificados (Tabela.coluna)
+    são passados para minúsculas. Um identificador solto pode ser um valor
+    (UF = CE vira Literal "identifier") e mantém a grafia original.
+    """
+    parts = []
+    literals = []
+    previous = None
+    tokens = tokenize(sql_query)
+    for i, token in enumerate(tokens):
+        kind = token.kind
+        if kind == "NUMBER" and previous == "LIMIT":
+            parts.append(token.value)
+        elif kind == "NUMBER":
+            parts.append("?")
+            value = float(token.value) if "." in token.value else int(token.value)
+            literals.append(Literal(value, "number", token.value))
+        elif kind == "STRING":
+            parts.append("?")
+            literals.append(Literal(token.value, "string"))
+        elif kind == "IDENT":
+            qualified = (i > 0 and tokens[i - 1].kind == "DOT") or tokens[i + 1].kind == "DOT"
+            if qualified or previous in ("FROM", "JOIN"):
+                parts.append(token.value.lower())
+            else:
+                parts.append(token.value)
+        elif kind not in ("EOF", "SEMICOLON"):
+            parts.append(token.value)
+        previous = token.value if kind == "KEYWORD" else None
+    return " ".join(parts), tuple(literals)
+
+
+class CachedQuery:
+    """Resultado de todas as etapas do pipeline para uma consulta"""
+
+    __slots__ = ("statement", "algebra", "optimized", "graph", "plan", "literals", "steps")
+
+    def __init__(self, statement, algebra, optimized, graph, plan, literals=(), steps=()):
+        self.statement = statement  # AST validada
+        self.algebra = algebra  # Álgebra inicial
+        self.optimized = optimized  # Álgebra otimizada
+        self.graph = graph  # Grafo de operadores
+        self.plan = plan  # Plano de execução
+        self.literals = literals  # Literais da consulta, em ordem de aparição
+        self.steps = steps  # Álgebra após os passos intermediários da otimização
+
+
+class QueryCache:
+    """
+    Cache LRU de consultas já processadas, indexado pelo fingerprint.
+
+    Consultas com a mesma forma e literais diferentes reaproveitam a AST e a
+    álgebra otimizada; os literais são trocados no lugar dos antigos e o
+    grafo/plano precisam ser reconstruídos (campos ``graph``/``plan`` = None).
+    Uma entrada é descartada quando alguma tabela da qual depende muda no
+    catálogo (ou quando o catálogo é trocado).
+    """
+
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # fingerprint -> (entrada, catálogo, versões das tabelas, reaproveitável)
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, sql_query, key=None):
+        if key is None:
+            key = fingerprint_query(sql_query)
+        fingerprint, literals = key
+
+        item = self._entries.get(fingerprint)
+        if item is None:
+            self.misses += 1
+            return None
+
+        entry, catalog, versions, rebindable = item
+        if not self._is_current(catalog, versions):
+            del self._entries[fingerprint]
+            self.invalidations += 1
+            self.misses += 1
+            return None
+
+        # render() e não text: o número 3 e a string '3' têm o mesmo text
+        if [lit.render() for lit in literals] == [lit.render() for lit in entry.literals]:
+            self._entries.move_to_end(fingerprint)
+            self.hits += 1
+            return entry
+
+        if not rebindable:
+            # A otimização criou literais novos (ex: constantes dobradas):
+            # trocar apenas os da consulta daria um plano errado
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(fingerprint)
+        self.hits += 1
+        return self._rebind(entry, literals, sql_query)
+
+    def put(self, sql_query, entry, key=None):
+        if key is None:
+            key = fingerprint_query(sql_query)
+        fingerprint, literals = key
+        entry.literals = literals
+
+        catalog = get_catalog()
+        versions = {table: catalog.table_version(table) for table in entry.statement.tables}
+
+        # Só dá para trocar os literais se a otimização não criou literais
+        # novos nem consumiu algum (ex.: 1 = 1 dobrado): nesses casos o plano
+        # depende dos valores e consultas com outros literais viram miss
+        source_ids = {id(lit) for lit in _statement_literals(entry.statement)}
+        rebindable = all(
+            {id(lit) for lit in _algebra_literals(tree)} == source_ids
+            for tree in (entry.algebra, *entry.steps, entry.optimized)
+        )
+
+        self._entries[fingerprint] = (entry, catalog, versions, rebindable)
+        self._entries.move_to_end(fingerprint)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _is_current(self, catalog, versions):
+        current = get_catalog()
+        if current is not catalog:
+            return False
+        return all(
+            current.table_version(table) == version for table, version in versions.items()
+        )
+
+    def _rebind(self, entry, literals, sql_query):
+        # Os nós Literal da AST são os mesmos objetos reaproveitados pela
+        # álgebra otimizada, então a troca é feita por identidade
+        old_literals = _statement_literals(entry.statement)
+        mapping = {id(old): new for old, new in zip(old_literals, literals)}
+
+        statement = entry.statement
+        statement = SelectStatement(
+            statement.columns,
+            statement.from_table,
+            [
+                JoinClause(join.table, _rebind_expression(join.condition, mapping))
+                for join in statement.joins
+            ],
+            _rebind_expression(statement.where, mapping),
+            " ".join(sql_query.split()),
+            statement.group_by,
+            statement.order_by,
+            statement.limit,
+        )
+        return CachedQuery(
+            statement,
+            _rebind_algebra(entry.algebra, mapping),
+            _rebind_algebra(entry.optimized, mapping),
+            None,
+            None,
+            literals,
+            tuple(_rebind_algebra(step, mapping) for step in entry.steps),
+        )
+
+
+def _expression_literals(expr, literals):
+    if isinstance(expr, Literal):
+        if expr.kind in ("number", "string"):
+            literals.append(expr)
+    elif isinstance(expr, Comparison):
+        _expression_literals(expr.left, literals)
+        _expression_literals(expr.right, literals)
+    elif isinstance(expr, BoolExpr):
+        for operand in expr.operands:
+            _expression_literals(operand, literals)
+    return literals
+
+
+def _statement_literals(statement):
+    """Literais numéricos/strings da AST na ordem do texto da consulta"""
+    literals = []
+    for join in statement.joins:
+        _expression_literals(join.condition, literals)
+    if statement.where is not None:
+        _expression_literals(statement.where, literals)
+    return literals
+
+
+def _algebra_literals(expr, literals=None):
+    if literals is None:
+        literals = []
+    if isinstance(expr, (Selection, Join)):
+        _expression_literals(expr.condition, literals)
+    if isinstance(expr, Join):
+        _algebra_literals(expr.left, literals)
+        _algebra_literals(expr.right, literals)
+    elif isinstance(expr, (Projection, Selection, Aggregation, Sort)):
+        _algebra_literals(expr.child, literals)
+    return literals
+
+
+def _rebind_expression(expr, mapping):
+    """Troca os literais; subexpressões sem literais trocados são reaproveitadas"""
+    if isinstance(expr, Literal):
+        return mapping.get(id(expr), expr)
+    if isinstance(expr, Comparison):
+        left = _rebind_expression(expr.left, mapping)
+        right = _rebind_expression(expr.right, mapping)
+        if left is expr.left and right is expr.right:
+            return expr
+        return Comparison(expr.op, left, right)
+    if isinstance(expr, BoolExpr):
+        operands = [_rebind_expression(e, mapping) for e in expr.operands]
+        if all(new is old for new, old in zip(operands, expr.operands)):
+            return expr
+        return BoolExpr(expr.op, operands)
+    return expr
+
+
+def _rebind_algebra(expr, mapping):
+    if isinstance(expr, (Projection, Aggregation, Sort)):
+        return expr.replace(child=_rebind_algebra(expr.child, mapping))
+    if isinstance(expr, Selection):
+        return expr.replace(
+            condition=_rebind_expression(expr.condition, mapping),
+            child=_rebind_algebra(expr.child, mapping),
+        )
+    if isinstance(expr, Join):
+        return expr.replace(
+            condition=_rebind_expression(expr.condition, mapping),
+            left=_rebind_algebra(expr.left, mapping),
+            right=_rebind_algebra(expr.right, mapping),
+        )
+    return expr
@@ -0,0 +1,200 @@
+"""
+Linha de comando sem interface gráfica: lê consultas de arquivos ou da
+entrada padrão e escreve a álgebra, a álgebra otimizada e o plano de
+execução em texto ou JSON (uma linha por consulta).
+
+    python -m query_cli consultas.sql
+    python -m query_cli --format json --lines < consultas.txt > planos.jsonl
+    echo "SELECT Status.Descricao FROM Status" | python -m query_cli --show plan
+    python -m query_cli --check --lines --processes 4 log_de_consultas.txt
+
+graphviz só é importado com --graph-dir; tkinter e Pillow nunca.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+from itertools import tee
+
+from query_pipeline import QueryPipeline
+
+SECTIONS = ("algebra", "optimized", "plan")
+
+# Separa as consultas nos ';' que não estão dentro de literais de texto
+_STATEMENT_RE = re.compile(r"(?:'(?:''|[^'])*'|[^;'])+")
+
+
+def split_statements(text):
+    """Consultas de um texto separadas por ';' (trechos vazios são ignorados)"""
+    for match in _STATEMENT_RE.finditer(text):
+        statement = match.group().strip()
+        if statement:
+            yield statement
+
+
+def read_queries(paths, lines=False):
+    """Consultas dos arquivos (ou da entrada padrão), uma por linha com ``lines``"""
+    for path in paths or ["-"]:
+        stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+        try:
+            if lines:
+                for line in stream:
+                    line = line.strip().rstrip(";").strip()
+                    if line:
+                        yield line
+            else:
+                yield from split_statements(stream.read())
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+
+def describe_query(number, query, valid, message, result, sections):
+    """Dicionário com as seções pedidas de uma consulta processada"""
+    output = {"query": number, "sql": query, "valid": valid, "message": message}
+    if valid:
+        if "algebra" in sections:
+            output["algebra"] = result.algebra.to_string()
+        if "optimized" in sections:
+            output["optimized"] = result.optimized.to_string()
+        if "plan" in sections:
+            output["plan"] = result.plan.to_dict()
+    return output
+
+
+def format_text(number, query, valid, message, result, sections):
+    lines = [f"-- Consulta {number}: {' '.join(query.split())}"]
+    if not valid:
+        lines.append(f"ERRO: {message}")
+        return "\n".join(lines) + "\n"
+    if "algebra" in sections:
+        lines += ["", "ÁLGEBRA RELACIONAL:", "", result.algebra.to_string()]
+    if "optimized" in sections:
+        lines += ["", "ÁLGEBRA OTIMIZADA:", "", result.optimized.to_string()]
+    if "plan" in sections:
+        lines += ["", result.plan.to_string()]
+    return "\n".join(lines) + "\n"
+
+
+def _parse_sections(value):
+    sections = [s.strip() for s in value.split(",") if s.strip()]
+    unknown = [s for s in sections if s not in SECTIONS]
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"seção desconhecida: {', '.join(unknown)} (use {', '.join(SECTIONS)})"
+        )
+    return sections
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m query_cli",
+        description="Processa consultas SQL sem interface gráfica",
+    )
+    parser.add_argument(
+        "files", nargs="*", help="Arquivos com consultas separadas por ';' (padrão: stdin)"
+    )
+    parser.add_argument(
+        "--lines", action="store_true", help="Uma consulta por linha, sem procurar ';'"
+    )
+    parser.add_argument("--format", choices=("text", "json"), default="text")
+    parser.add_argument(
+        "--show",
+        type=_parse_sections,
+        default=list(SECTIONS),
+        help="Seções a mostrar, separadas por vírgula (algebra,optimized,plan)",
+    )
+    parser.add_argument("--schema", help="Esquema JSON/YAML, diretório ou banco SQLite")
+    parser.add_argument("--stats", help="Estatísticas salvas por table_statistics")
+    parser.add_argument("--parallelism", type=int, default=1)
+    parser.add_argument(
+        "--graph-dir", help="Desenha o grafo de cada consulta em PNG (requer graphviz)"
+    )
+    parser.add_argument(
+        "--quiet", action="store_true", help="Só reporta as consultas inválidas"
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Apenas valida as consultas (sem álgebra nem plano), em lote",
+    )
+    parser.add_argument(
+        "--processes", type=int, help="Processos para validar com --check"
+    )
+    return parser
+
+
+def _load_schema(args):
+    if args.schema:
+        from metadata import set_catalog
+        from schema_loader import load_catalog
+
+        set_catalog(load_catalog(args.schema))
+
+
+def _make_pipeline(args):
+    estimator = None
+    _load_schema(args)
+    if args.stats:
+        from table_statistics import StatisticsEstimator, StatisticsStore
+
+        estimator = StatisticsEstimator(StatisticsStore(args.stats))
+    return QueryPipeline(estimator=estimator, parallelism=args.parallelism)
+
+
+def check(args):
+    """Valida as consultas com SQLParser.parse_many; devolve o nº de inválidas"""
+    from sql_parser import SQLParser
+
+    queries, to_parse = tee(read_queries(args.files, args.lines))
+    results = SQLParser().parse_many(to_parse, processes=args.processes, with_ast=False)
+    write = sys.stdout.write
+    invalid = 0
+
+    for number, (query, (valid, message, _)) in enumerate(zip(queries, results), 1):
+        if not valid:
+            invalid += 1
+        elif args.quiet:
+            continue
+        if args.format == "json":
+            output = describe_query(number, query, valid, message, None, ())
+            write(json.dumps(output, ensure_ascii=False) + "\n")
+        else:
+            write(format_text(number, query, valid, message, None, ()) + "\n")
+    return invalid
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.check:
+        _load_schema(args)
+        return 1 if check(args) else 0
+
+    pipeline = _make_pipeline(args)
+    write = sys.stdout.write
+    invalid = 0
+
+    for number, query in enumerate(read_queries(args.files, args.lines), 1):
+        valid, message, result = pipeline.process(query)
+        if not valid:
+            invalid += 1
+        elif args.quiet:
+            continue
+        elif args.graph_dir:
+            os.makedirs(args.graph_dir, exist_ok=True)
+            name = os.path.join(os.path.abspath(args.graph_dir), f"consulta_{number}")
+            result.graph.render_graphviz(name)
+
+        if args.format == "json":
+            output = describe_query(number, query, valid, message, result, args.show)
+            write(json.dumps(output, ensure_ascii=False) + "\n")
+        else:
+            write(format_text(number, query, valid, message, result, args.show) + "\n")
+
+    return 1 if invalid else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+from algebra_converter import AlgebraConverter
+from execution_planner import ExecutionPlanner
+from graph_builder import GraphBuilder
+from query_cache import CachedQuery, QueryCache, fingerprint_query
+from query_optimizer import QueryOptimizer
+from sql_lexer import SQLSyntaxError
+from sql_parser import SQLParser
+
+
+class QueryPipeline:
+    """
+    Encadeia parsing → álgebra → otimização → grafo → plano de execução,
+    reaproveitando resultados de consultas com a mesma forma via QueryCache.
+    """
+
+    def __init__(self, cache_size=1024, estimator=None, parallelism=1):
+        self.parser = SQLParser()
+        self.algebra_converter = AlgebraConverter()
+        self.optimizer = QueryOptimizer(estimator)
+        self.graph_builder = GraphBuilder()
+        self.execution_planner = ExecutionPlanner(parallelism)
+        self.cache = QueryCache(cache_size) if cache_size else None
+
+    def process(self, sql_query):
+        """Devolve (válida, mensagem, CachedQuery ou None)"""
+        key, cached = self.lookup(sql_query)
+        if cached is not None:
+            return True, "Consulta válida", cached
+
+        is_valid, message, result = self.analyze(sql_query)
+        if is_valid:
+            self.store(sql_query, result, key)
+        return is_valid, message, result
+
+    def lookup(self, sql_query):
+        """
+        (chave do cache, CachedQuery ou None). Entradas reaproveitadas com
+        outros literais voltam com o grafo e o plano já reconstruídos.
+        """
+        if self.cache is None:
+            return None, None
+        try:
+            key = fingerprint_query(sql_query)
+        except SQLSyntaxError:
+            return None, None  # O parser devolve a mensagem de erro adequada
+
+        cached = self.cache.get(sql_query, key)
+        if cached is not None and cached.plan is None:
+            cached.graph = self.graph_builder.build_graph(cached.optimized)
+            self.optimizer.choose_access_paths(cached.graph)
+            cached.plan = self.execution_planner.create_plan(cached.graph)
+        return key, cached
+
+    def analyze(self, sql_query):
+        """Todas as etapas, sem consultar o cache: (válida, mensagem, CachedQuery ou None)"""
+        is_valid, message, statement = self.parser.parse(sql_query)
+        if not is_valid:
+            return False, message, None
+
+        algebra = self.algebra_converter.convert(statement)
+        *steps, optimized = self.optimizer.optimize_steps(algebra)
+        graph = self.graph_builder.build_graph(optimized)
+        self.optimizer.choose_access_paths(graph)
+        plan = self.execution_planner.create_plan(graph)
+        return True, message, CachedQuery(
+            statement, algebra, optimized, graph, plan, steps=tuple(steps)
+        )
+
+    def store(self, sql_query, result, key=None):
+        """Guarda no cache um resultado de ``analyze`` (feito aqui ou em outro processo)"""
+        if self.cache is not None and key is not None:
+            self.cache.put(sql_query, result, key)
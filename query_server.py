@@ -0,0 +1,404 @@
+"""
+Serviço local de consultas: um servidor asyncio que recebe uma requisição
+JSON por linha (TCP ou socket Unix) e responde também com uma linha JSON.
+
+    python -m query_server --port 8765 --data dados/
+    python -m query_server --socket /tmp/consultas.sock --schema esquema.yaml
+
+Requisição: ``{"id": 1, "sql": "SELECT ...", "action": "plan"}``, com
+``action`` entre parse, algebra, plan (padrão), execute e stats; opcionais
+``timeout`` (segundos) e ``max_rows``. A resposta repete o ``id`` e traz
+``ok`` e ``message``, mais as seções da ação (como no ``query_cli --format
+json``) ou ``columns``/``rows`` na execução. Várias requisições podem ser
+enviadas na mesma conexão sem esperar; as respostas saem na ordem em que
+ficam prontas.
+
+Parsing, otimização e execução rodam num pool de processos. O cache de
+planos fica no processo do servidor e é compartilhado por todos os clientes;
+consultas iguais em andamento ao mesmo tempo são calculadas uma vez só.
+Quando ``max_pending`` requisições estão em andamento, o servidor para de ler
+as conexões até alguma terminar (o TCP segura os clientes).
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+
+from execution_engine import ExecutionEngine
+from metadata import get_catalog, set_catalog
+from query_cli import describe_query
+from query_pipeline import QueryPipeline
+
+ACTIONS = ("parse", "algebra", "plan", "execute", "stats")
+_SECTIONS = {
+    "parse": (),
+    "algebra": ("algebra", "optimized"),
+    "plan": ("optimized", "plan"),
+    "execute": (),
+}
+
+DEFAULT_PORT = 8765
+DEFAULT_MAX_PENDING = 64  # Requisições em andamento antes de parar de ler
+DEFAULT_TIMEOUT = 30.0  # Segundos por requisição
+DEFAULT_MAX_ROWS = 1000  # Linhas devolvidas por execução
+MAX_REQUEST_BYTES = 1 << 20
+
+
+# Estado dos processos do pool: catálogo, pipeline sem cache e motor de execução
+_worker_pipeline = None
+_worker_engine = None
+
+
+def _init_worker(catalog, source, estimator):
+    global _worker_pipeline, _worker_engine
+    set_catalog(catalog)
+    _worker_pipeline = QueryPipeline(cache_size=0, estimator=estimator)
+    _worker_engine = ExecutionEngine(source) if source is not None else None
+
+
+def _analyze(sql_query):
+    return _worker_pipeline.analyze(sql_query)
+
+
+def _execute(optimized, max_rows):
+    """(nomes das colunas, até ``max_rows`` linhas, truncado?)"""
+    graph = _worker_pipeline.graph_builder.build_graph(optimized)
+    _worker_pipeline.optimizer.choose_access_paths(graph)
+    columns, rows = _worker_engine.execute(graph)
+    rows = list(islice(rows, max_rows + 1))
+    return [str(c) for c in columns], rows[:max_rows], len(rows) > max_rows
+
+
+class RequestError(Exception):
+    """Requisição inválida (responde com ok=false sem chegar ao pool)"""
+
+
+class QueryServer:
+    def __init__(
+        self,
+        source=None,
+        estimator=None,
+        workers=None,
+        max_pending=DEFAULT_MAX_PENDING,
+        timeout=DEFAULT_TIMEOUT,
+        cache_size=1024,
+        max_rows=DEFAULT_MAX_ROWS,
+    ):
+        self.source = source
+        self.estimator = estimator
+        self.workers = max(workers or os.cpu_count() or 1, 1)
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.max_rows = max_rows
+        self.pipeline = QueryPipeline(cache_size, estimator)  # Cache compartilhado
+        self.requests = 0
+        self.in_flight = 0
+        self.timeouts = 0
+        self.errors = 0
+        self._pool = None
+        self._slots = None
+        self._inflight = {}  # chave do cache -> Future do cálculo em andamento
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            # Com fork os processos herdariam o socket do servidor (e o
+            # manteriam aberto se o servidor morresse); forkserver parte de
+            # um processo limpo
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else None)
+            self._pool = ProcessPoolExecutor(
+                self.workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(get_catalog(), self.source, self.estimator),
+            )
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    async def _run(self, function, *args):
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.pool, function, *args)
+        except BrokenProcessPool:
+            self._pool = None  # Um processo morreu; o próximo pedido cria outro pool
+            raise
+
+    async def handle(self, request):
+        """Resposta (dicionário) de uma requisição já decodificada"""
+        self.requests += 1
+        response = {"id": request.get("id") if isinstance(request, dict) else None}
+        try:
+            if not isinstance(request, dict):
+                raise RequestError("a requisição deve ser um objeto JSON")
+            action = request.get("action", "plan")
+            if action not in ACTIONS:
+                raise RequestError(f"ação desconhecida: {action} (use {', '.join(ACTIONS)})")
+            if action == "stats":
+                response.update(ok=True, message="ok", stats=self.stats())
+                return response
+            sql = request.get("sql")
+            if not isinstance(sql, str) or not sql.strip():
+                raise RequestError("campo 'sql' ausente")
+            timeout = float(request.get("timeout", self.timeout))
+            max_rows = int(request.get("max_rows", self.max_rows))
+            response.update(
+                await asyncio.wait_for(self._process(sql, action, max_rows), timeout)
+            )
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            response.update(ok=False, message=f"tempo esgotado ({timeout:g}s)")
+        except (RequestError, TypeError, ValueError) as e:
+            self.errors += 1
+            response.update(ok=False, message=str(e))
+        except Exception as e:
+            self.errors += 1
+            response.update(ok=False, message=f"erro interno: {e}")
+        return response
+
+    async def _process(self, sql, action, max_rows):
+        key, result = self.pipeline.lookup(sql)
+        cached = result is not None
+        if cached:
+            valid, message = True, "Consulta válida"
+        else:
+            valid, message, result = await self._analyze(sql, key)
+
+        output = describe_query(None, sql, valid, message, result, _SECTIONS[action])
+        del output["query"], output["sql"]
+        output["ok"] = output.pop("valid")
+        output["cached"] = cached
+
+        if valid and action == "execute":
+            if self.source is None:
+                raise RequestError("servidor sem fonte de dados (inicie com --data)")
+            columns, rows, truncated = await self._run(_execute, result.optimized, max_rows)
+            output.update(columns=columns, rows=rows, truncated=truncated)
+        return output
+
+    async def _analyze(self, sql, key):
+        """Calcula no pool; clientes com a mesma consulta esperam o mesmo cálculo"""
+        inflight = None
+        if key is not None:
+            # render() diferencia o número 1 da string '1' (o text dos dois é "1")
+            inflight = (key[0], tuple(literal.render() for literal in key[1]))
+            future = self._inflight.get(inflight)
+            if future is not None:
+                return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(self._compute(sql, key))
+        if inflight is not None:
+            self._inflight[inflight] = future
+            future.add_done_callback(lambda _: self._inflight.pop(inflight, None))
+        # O tempo esgotado de um cliente não cancela o cálculo dos outros
+        return await asyncio.shield(future)
+
+    async def _compute(self, sql, key):
+        valid, message, result = await self._run(_analyze, sql)
+        if valid:
+            self.pipeline.store(sql, result, key)  # Mesmo se quem pediu já desistiu
+        return valid, message, result
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "max_pending": self.max_pending,
+            "workers": self.workers,
+            "cache": self.pipeline.cache.stats() if self.pipeline.cache is not None else None,
+        }
+
+    async def _serve_connection(self, reader, writer):
+        lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                # Sem vaga, a conexão deixa de ser lida (contrapressão)
+                await self._slots.acquire()
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    self._slots.release()
+                    error = {"id": None, "ok": False, "message": "requisição grande demais"}
+                    await self._write(writer, lock, error)
+                    break
+                except ConnectionError:
+                    self._slots.release()
+                    break
+                if not line:
+                    self._slots.release()
+                    break
+                if not line.strip():
+                    self._slots.release()
+                    continue
+                self.in_flight += 1
+                task = asyncio.ensure_future(self._respond(line, writer, lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()  # Servidor encerrando com a conexão aberta
+        finally:
+            writer.close()
+
+    async def _respond(self, line, writer, lock):
+        try:
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                self.errors += 1
+                response = {"id": None, "ok": False, "message": f"JSON inválido: {e}"}
+            else:
+                response = await self.handle(request)
+            await self._write(writer, lock, response)
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    async def _write(self, writer, lock, response):
+        data = json.dumps(response, ensure_ascii=False, default=str) + "\n"
+        async with lock:
+            try:
+                writer.write(data.encode("utf-8"))
+                await writer.drain()
+            except ConnectionError:
+                pass  # O cliente foi embora; a resposta é descartada
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT, path=None):
+        """Abre o servidor (socket Unix se ``path``) e devolve o asyncio.Server"""
+        self._slots = asyncio.Semaphore(self.max_pending)
+        if path is not None:
+            return await asyncio.start_unix_server(
+                self._serve_connection, path, limit=MAX_REQUEST_BYTES
+            )
+        return await asyncio.start_server(
+            self._serve_connection, host, port, limit=MAX_REQUEST_BYTES
+        )
+
+
+class QueryClient:
+    """Cliente bloqueante simples: uma requisição por vez na mesma conexão"""
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, path=None, timeout=None):
+        if path is not None:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.connect(path)
+        else:
+            self._socket = socket.create_connection((host, port))
+        self._socket.settimeout(timeout)
+        self._stream = self._socket.makefile("rwb")
+        self._next_id = 0
+
+    def request(self, sql=None, action="plan", **options):
+        self._next_id += 1
+        request = dict(options, id=self._next_id, action=action)
+        if sql is not None:
+            request["sql"] = sql
+        self._stream.write(json.dumps(request, ensure_ascii=False).encode("utf-8") + b"\n")
+        self._stream.flush()
+        line = self._stream.readline()
+        if not line:
+            raise ConnectionError("o servidor fechou a conexão")
+        return json.loads(line)
+
+    def close(self):
+        self._stream.close()
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m query_server",
+        description="Serviço de consultas SQL (uma requisição JSON por linha)",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--socket", help="Ouve num socket Unix em vez de TCP")
+    parser.add_argument("--schema", help="Esquema JSON/YAML, diretório ou banco SQLite")
+    parser.add_argument("--stats", help="Estatísticas salvas por table_statistics")
+    parser.add_argument("--data", help="Diretório com um CSV por tabela (ação execute)")
+    parser.add_argument("--workers", type=int, help="Processos do pool (padrão: CPUs)")
+    parser.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING)
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT)
+    parser.add_argument("--cache-size", type=int, default=1024)
+    parser.add_argument("--max-rows", type=int, default=DEFAULT_MAX_ROWS)
+    return parser
+
+
+async def _serve(server, args):
+    listener = await server.start(args.host, args.port, args.socket)
+    address = args.socket or f"{args.host}:{args.port}"
+    print(f"Servidor de consultas ouvindo em {address}", file=sys.stderr)
+    serving = asyncio.ensure_future(listener.serve_forever())
+    if hasattr(signal, "SIGTERM"):
+        try:
+            # SIGTERM encerra como Ctrl+C, fechando o pool de processos
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, serving.cancel)
+        except NotImplementedError:
+            pass
+    try:
+        await serving
+    except asyncio.CancelledError:
+        pass
+    finally:
+        listener.close()
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    estimator = None
+    if args.schema:
+        from schema_loader import load_catalog
+
+        set_catalog(load_catalog(args.schema))
+    if args.stats:
+        from table_statistics import StatisticsEstimator, StatisticsStore
+
+        estimator = StatisticsEstimator(StatisticsStore(args.stats))
+    source = None
+    if args.data:
+        from data_sources import CSVTableSource
+
+        source = CSVTableSource(args.data)
+
+    server = QueryServer(
+        source,
+        estimator,
+        args.workers,
+        args.max_pending,
+        args.timeout,
+        args.cache_size,
+        args.max_rows,
+    )
+    try:
+        asyncio.run(_serve(server, args))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,532 @@
+"""
+Motor de reescrita da álgebra por regras.
+
+Cada regra casa um padrão (tipo do nó e, opcionalmente, do seu filho) e
+devolve uma expressão equivalente ou None. O motor percorre a árvore das
+folhas para a raiz aplicando as regras até que nenhuma dispare (ponto fixo),
+com um limite de iterações para o caso de regras que se desfazem. Como os
+nós são imutáveis, "nada mudou" é simplesmente ``novo is antigo``.
+
+Regras novas entram no registro com ``@register_rule``; ``DEFAULT_RULES``
+define quais rodam por padrão e em que ordem.
+"""
+
+import time
+
+from algebra_expressions import *
+from metadata import get_table_columns, normalize_table_name
+from predicate_compiler import column_key, fold_constants
+from predicates import CONSTANT, FILTER, classify, split_disjunction
+from sql_ast import ColumnRef, Comparison, Literal, column_refs, conjuncts, make_bool
+
+DEFAULT_MAX_ITERATIONS = 50
+MAX_REWRITES_PER_ITERATION = 10_000
+
+TUPLE_REDUCTION = "tuplas"  # Regras que diminuem o número de linhas
+FIELD_REDUCTION = "campos"  # Regras que diminuem o número de colunas
+
+# Condição canônica de uma seleção que nunca é verdadeira
+FALSE_CONDITION = Comparison("=", Literal(1, "number"), Literal(0, "number"))
+
+_FLIPPED = {"=": "=", "<>": "<>", "!=": "!=", "<": ">", ">": "<", "<=": ">=", ">=": "<="}
+
+RULE_REGISTRY = {}
+
+
+def register_rule(cls):
+    RULE_REGISTRY[cls.name] = cls
+    return cls
+
+
+def _tables(expr):
+    return {table.lower() for table in expr.get_tables()}
+
+
+def _and(terms):
+    return make_bool("AND", terms) if terms else None
+
+
+def output_columns(expr):
+    """Colunas (ColumnRef/Aggregate) produzidas pela expressão, em ordem"""
+    if isinstance(expr, Table):
+        table = normalize_table_name(expr.name)
+        return [ColumnRef(expr.name, column) for column in get_table_columns(table) or ()]
+    if isinstance(expr, Projection):
+        return list(expr.attributes)
+    if isinstance(expr, Aggregation):
+        return list(expr.columns)
+    if isinstance(expr, (Selection, Sort)):
+        return output_columns(expr.child)
+    if isinstance(expr, Join):
+        return output_columns(expr.left) + output_columns(expr.right)
+    return list(getattr(expr, "columns", ()))
+
+
+def _column_literal(term):
+    """(coluna, op, literal) de um termo coluna-op-literal (None para os demais)"""
+    if not isinstance(term, Comparison):
+        return None
+    left, right, op = term.left, term.right, term.op
+    if isinstance(left, Literal) and isinstance(right, ColumnRef):
+        left, right, op = right, left, _FLIPPED.get(op)
+    if isinstance(left, ColumnRef) and isinstance(right, Literal) and op is not None:
+        return left, op, right
+    return None
+
+
+def _filter_terms(expr, terms):
+    """Termos coluna-op-literal de todas as seleções da subárvore"""
+    if isinstance(expr, Selection):
+        for term in conjuncts(expr.condition):
+            parts = _column_literal(term)
+            if parts is not None:
+                terms.append(parts)
+    if isinstance(expr, (Projection, Selection)):
+        _filter_terms(expr.child, terms)
+    elif isinstance(expr, Join):
+        _filter_terms(expr.left, terms)
+        _filter_terms(expr.right, terms)
+    return terms
+
+
+class RewriteRule:
+    """
+    ``pattern`` é (tipo do nó,) ou (tipo do nó, tipo do filho); ``apply``
+    devolve a expressão reescrita ou None se a regra não se aplica.
+    """
+
+    name = None
+    group = TUPLE_REDUCTION
+    pattern = (AlgebraExpression,)
+
+    def matches(self, expr):
+        if not isinstance(expr, self.pattern[0]):
+            return False
+        return len(self.pattern) == 1 or isinstance(getattr(expr, "child", None), self.pattern[1])
+
+    def apply(self, expr):
+        raise NotImplementedError
+
+
+@register_rule
+class ConstantFolding(RewriteRule):
+    """Comparações entre literais viram constantes; σ sempre verdadeira some"""
+
+    name = "dobrar_constantes"
+    pattern = ((Selection, Join),)
+
+    def apply(self, expr):
+        condition = expr.condition
+        if condition is None or condition == FALSE_CONDITION:
+            return None
+        folded = fold_constants(condition)
+        if folded is True:
+            return expr.child if isinstance(expr, Selection) else expr.replace(condition=None)
+        if folded is False:
+            folded = FALSE_CONDITION
+        if folded == condition:
+            return None
+        return expr.replace(condition=folded)
+
+
+@register_rule
+class ConjunctiveNormalForm(RewriteRule):
+    """
+    Termos OR com ramos AND viram CNF quando alguma cláusula usa menos
+    tabelas (e pode descer) ou a fatoração diminui as comparações
+    """
+
+    name = "forma_normal_conjuntiva"
+    pattern = ((Selection, Join),)
+
+    def apply(self, expr):
+        terms, changed = [], False
+        for term in conjuncts(expr.condition):
+            clauses = split_disjunction(term)
+            if clauses is None:
+                terms.append(term)
+            else:
+                terms.extend(clauses)
+                changed = True
+        return expr.replace(condition=_and(terms)) if changed else None
+
+
+@register_rule
+class MergeSelections(RewriteRule):
+    """σ_a(σ_b(X)) → σ_{b ∧ a}(X)"""
+
+    name = "juntar_selecoes"
+    pattern = (Selection, Selection)
+
+    def apply(self, expr):
+        inner = expr.child
+        terms = conjuncts(inner.condition) + conjuncts(expr.condition)
+        return Selection(make_bool("AND", terms), inner.child)
+
+
+@register_rule
+class PushSelectionThroughProjection(RewriteRule):
+    """σ_c(π_A(X)) → π_A(σ_c(X))"""
+
+    name = "selecao_abaixo_de_projecao"
+    pattern = (Selection, Projection)
+
+    def apply(self, expr):
+        projection = expr.child
+        available = {column_key(ref) for ref in projection.attributes}
+        if not all(column_key(ref) in available for ref in column_refs(expr.condition)):
+            return None
+        return projection.replace(child=expr.replace(child=projection.child))
+
+
+@register_rule
+class PushSelectionIntoJoin(RewriteRule):
+    """Termos de σ sobre ⋈ que usam um único lado descem para esse lado"""
+
+    name = "selecao_abaixo_de_juncao"
+    pattern = (Selection, Join)
+
+    def apply(self, expr):
+        join = expr.child
+        left_tables, right_tables = _tables(join.left), _tables(join.right)
+        left, right, keep = [], [], []
+        for predicate in classify(expr.condition):
+            if predicate.kind != CONSTANT and predicate.tables <= left_tables:
+                left.append(predicate.term)
+            elif predicate.kind != CONSTANT and predicate.tables <= right_tables:
+                right.append(predicate.term)
+            else:
+                keep.append(predicate.term)
+        if not left and not right:
+            return None
+        join = join.replace(
+            left=Selection(_and(left), join.left) if left else join.left,
+            right=Selection(_and(right), join.right) if right else join.right,
+        )
+        return Selection(_and(keep), join) if keep else join
+
+
+@register_rule
+class SelectionToJoinCondition(RewriteRule):
+    """
+    Termos de σ que ligam os dois lados da ⋈ logo abaixo viram condição da
+    junção (produto cartesiano + predicado vira junção)
+    """
+
+    name = "selecao_em_condicao_de_juncao"
+    pattern = (Selection, Join)
+
+    def apply(self, expr):
+        join = expr.child
+        tables = _tables(join)
+        moved, keep = [], []
+        for predicate in classify(expr.condition):
+            # Predicados de junção e residuais cobertos por esta junção
+            if predicate.kind not in (CONSTANT, FILTER) and predicate.tables <= tables:
+                moved.append(predicate.term)
+            else:
+                keep.append(predicate.term)
+        if not moved:
+            return None
+        join = join.replace(condition=_and(conjuncts(join.condition) + moved))
+        return Selection(_and(keep), join) if keep else join
+
+
+@register_rule
+class PushJoinConditionDown(RewriteRule):
+    """Termos da condição de ⋈ que usam um único lado viram σ desse lado"""
+
+    name = "condicao_de_juncao_abaixo"
+    pattern = (Join,)
+
+    def apply(self, expr):
+        left_tables, right_tables = _tables(expr.left), _tables(expr.right)
+        left, right, keep = [], [], []
+        for predicate in classify(expr.condition):
+            if predicate.kind != CONSTANT and predicate.tables <= left_tables:
+                left.append(predicate.term)
+            elif predicate.kind != CONSTANT and predicate.tables <= right_tables:
+                right.append(predicate.term)
+            else:
+                keep.append(predicate.term)
+        if not left and not right:
+            return None
+        return expr.replace(
+            condition=_and(keep),
+            left=Selection(_and(left), expr.left) if left else expr.left,
+            right=Selection(_and(right), expr.right) if right else expr.right,
+        )
+
+
+@register_rule
+class TransitivePredicates(RewriteRule):
+    """
+    Com A.x = B.y na junção, um filtro A.x op v de um lado implica B.y op v
+    do outro. O literal inferido é o mesmo objeto do original, para que o
+    QueryCache troque os dois juntos ao reaproveitar o plano.
+    """
+
+    name = "predicados_transitivos"
+    pattern = (Join,)
+
+    def apply(self, expr):
+        equalities = [
+            (term.left, term.right)
+            for term in conjuncts(expr.condition)
+            if isinstance(term, Comparison)
+            and term.op == "="
+            and isinstance(term.left, ColumnRef)
+            and isinstance(term.right, ColumnRef)
+        ]
+        if not equalities:
+            return None
+
+        sides = (expr.left, expr.right)
+        side_tables = [_tables(side) for side in sides]
+        filters = [_filter_terms(side, []) for side in sides]
+        known = [
+            {(column_key(column), op, literal) for column, op, literal in terms}
+            for terms in filters
+        ]
+        inferred = ([], [])
+
+        for a, b in equalities:
+            for source, target in ((a, b), (b, a)):
+                source_side = self._side(source, side_tables)
+                target_side = self._side(target, side_tables)
+                if source_side is None or target_side is None or source_side == target_side:
+                    continue
+                for column, op, literal in filters[source_side]:
+                    if column_key(column) != column_key(source):
+                        continue
+                    key = (column_key(target), op, literal)
+                    if key not in known[target_side]:
+                        known[target_side].add(key)
+                        inferred[target_side].append(Comparison(op, target, literal))
+
+        if not inferred[0] and not inferred[1]:
+            return None
+        left, right = (
+            Selection(make_bool("AND", terms), side) if terms else side
+            for side, terms in zip(sides, inferred)
+        )
+        return expr.replace(left=left, right=right)
+
+    def _side(self, column, side_tables):
+        table = (column.table or "").lower()
+        for i, tables in enumerate(side_tables):
+            if table in tables:
+                return i
+        return None
+
+
+def _project_join(join, needed):
+    """Junção com cada lado reduzido às colunas em ``needed`` (chave → ColumnRef)"""
+    needed = dict(needed)
+    for ref in column_refs(join.condition):
+        needed.setdefault(column_key(ref), ref)
+    return join.replace(
+        left=_project_side(join.left, needed), right=_project_side(join.right, needed)
+    )
+
+
+def _project_side(side, needed):
+    tables = _tables(side)
+    wanted = {key: ref for key, ref in needed.items() if key[0] in tables}
+    if not wanted:
+        return side
+    if isinstance(side, Join):
+        return _project_join(side, wanted)
+    if isinstance(side, Selection) and isinstance(side.child, Join):
+        # Seleção acima de junções: continuar reduzindo campos abaixo dela
+        below = dict(wanted)
+        for ref in column_refs(side.condition):
+            below.setdefault(column_key(ref), ref)
+        return side.replace(child=_project_join(side.child, below))
+    if isinstance(side, Projection):
+        if {column_key(ref) for ref in side.attributes} == wanted.keys():
+            return side
+        return Projection(sorted(wanted.values()), side.child)
+    if {column_key(ref) for ref in output_columns(side)} == wanted.keys():
+        return side
+    # A projeção fica APÓS a seleção (σ usa colunas que π descartaria)
+    return Projection(sorted(wanted.values()), side)
+
+
+@register_rule
+class MergeProjections(RewriteRule):
+    """π_A(π_B(X)) → π_A(X)"""
+
+    name = "juntar_projecoes"
+    group = FIELD_REDUCTION
+    pattern = (Projection, Projection)
+
+    def apply(self, expr):
+        return expr.replace(child=expr.child.child)
+
+
+@register_rule
+class PushProjectionIntoJoin(RewriteRule):
+    """π_A(L ⋈ R): cada lado só produz as colunas de A e da condição"""
+
+    name = "projecao_abaixo_de_juncao"
+    group = FIELD_REDUCTION
+    pattern = (Projection, Join)
+
+    def apply(self, expr):
+        needed = {column_key(ref): ref for ref in expr.attributes}
+        join = _project_join(expr.child, needed)
+        return None if join is expr.child else expr.replace(child=join)
+
+
+@register_rule
+class PushProjectionThroughSelection(RewriteRule):
+    """π_A(σ_c(L ⋈ R)): os lados da junção produzem só A e as colunas de c"""
+
+    name = "projecao_abaixo_de_selecao"
+    group = FIELD_REDUCTION
+    pattern = (Projection, Selection)
+
+    def apply(self, expr):
+        selection = expr.child
+        if not isinstance(selection.child, Join):
+            return None
+        needed = {column_key(ref): ref for ref in expr.attributes}
+        for ref in column_refs(selection.condition):
+            needed.setdefault(column_key(ref), ref)
+        join = _project_join(selection.child, needed)
+        if join is selection.child:
+            return None
+        return expr.replace(child=selection.replace(child=join))
+
+
+def _reduce_input(child, needed):
+    """Entrada de γ/τ com as junções abaixo produzindo só ``needed``"""
+    if isinstance(child, Join):
+        return _project_join(child, needed)
+    if isinstance(child, Selection) and isinstance(child.child, Join):
+        below = dict(needed)
+        for ref in column_refs(child.condition):
+            below.setdefault(column_key(ref), ref)
+        return child.replace(child=_project_join(child.child, below))
+    return child
+
+
+@register_rule
+class PushProjectionIntoAggregation(RewriteRule):
+    """γ_G;F(L ⋈ R): os lados da junção produzem só G e os argumentos de F"""
+
+    name = "projecao_abaixo_de_agregacao"
+    group = FIELD_REDUCTION
+    pattern = (Aggregation,)
+
+    def apply(self, expr):
+        needed = {column_key(ref): ref for ref in expr.groups}
+        for aggregate in expr.aggregates:
+            if aggregate.argument is not None:
+                needed.setdefault(column_key(aggregate.argument), aggregate.argument)
+        child = _reduce_input(expr.child, needed)
+        return None if child is expr.child else expr.replace(child=child)
+
+
+@register_rule
+class PushProjectionThroughSort(RewriteRule):
+    """π_A(τ_k(L ⋈ R)): os lados da junção produzem só A e as chaves de k"""
+
+    name = "projecao_abaixo_de_ordenacao"
+    group = FIELD_REDUCTION
+    pattern = (Projection, Sort)
+
+    def apply(self, expr):
+        sort = expr.child
+        needed = {column_key(ref): ref for ref in expr.attributes}
+        for item in sort.keys:
+            needed.setdefault(column_key(item.expression), item.expression)
+        child = _reduce_input(sort.child, needed)
+        if child is sort.child:
+            return None
+        return expr.replace(child=sort.replace(child=child))
+
+
+DEFAULT_RULES = (
+    "dobrar_constantes",
+    "forma_normal_conjuntiva",
+    "juntar_selecoes",
+    "selecao_abaixo_de_projecao",
+    "selecao_abaixo_de_juncao",
+    "selecao_em_condicao_de_juncao",
+    "condicao_de_juncao_abaixo",
+    "predicados_transitivos",
+    "juntar_projecoes",
+    "projecao_abaixo_de_juncao",
+    "projecao_abaixo_de_selecao",
+    "projecao_abaixo_de_agregacao",
+    "projecao_abaixo_de_ordenacao",
+)
+
+
+class RuleStats:
+    def __init__(self):
+        self.attempts = 0  # Vezes que o padrão casou e a regra foi chamada
+        self.fired = 0  # Vezes que a regra reescreveu a expressão
+        self.seconds = 0.0
+
+    def to_dict(self):
+        return {"attempts": self.attempts, "fired": self.fired, "seconds": self.seconds}
+
+
+class RewriteEngine:
+    """Aplica as regras até o ponto fixo, acumulando contadores por regra"""
+
+    def __init__(self, rules=DEFAULT_RULES, max_iterations=DEFAULT_MAX_ITERATIONS):
+        self.rules = [RULE_REGISTRY[name]() if isinstance(name, str) else name for name in rules]
+        self.max_iterations = max_iterations
+        self.stats = {rule.name: RuleStats() for rule in self.rules}
+        self.iterations = 0  # Passadas completas sobre a árvore (todas as chamadas)
+        self.exhausted = 0  # Reescritas interrompidas pelo limite de iterações
+
+    def rewrite(self, expr, groups=None):
+        """Reescreve até nenhuma regra disparar; ``groups`` restringe as regras usadas"""
+        rules = [rule for rule in self.rules if groups is None or rule.group in groups]
+        for _ in range(self.max_iterations):
+            self.iterations += 1
+            self._budget = MAX_REWRITES_PER_ITERATION
+            rewritten = self._rewrite(expr, rules)
+            if rewritten is expr:
+                return expr
+            expr = rewritten
+        self.exhausted += 1
+        return expr
+
+    def _rewrite(self, expr, rules):
+        if isinstance(expr, Join):
+            expr = expr.replace(
+                left=self._rewrite(expr.left, rules), right=self._rewrite(expr.right, rules)
+            )
+        elif isinstance(expr, (Projection, Selection, Aggregation, Sort)):
+            expr = expr.replace(child=self._rewrite(expr.child, rules))
+
+        for rule in rules:
+            if not rule.matches(expr):
+                continue
+            stats = self.stats[rule.name]
+            stats.attempts += 1
+            start = time.perf_counter()
+            result = rule.apply(expr)
+            stats.seconds += time.perf_counter() - start
+            if result is not None and result is not expr:
+                stats.fired += 1
+                self._budget -= 1
+                if self._budget <= 0:
+                    return result  # O ponto fixo fica para a próxima iteração
+                # O nó novo pode habilitar regras nele e nos filhos
+                return self._rewrite(result, rules)
+        return expr
+
+    def report(self):
+        lines = [f"Iterações: {self.iterations} (limite atingido {self.exhausted} vez(es))"]
+        for name, stats in self.stats.items():
+            lines.append(
+                f"{name}: {stats.fired}/{stats.attempts} disparos, {stats.seconds * 1000:.3f} ms"
+            )
+        return "\n".join(lines)
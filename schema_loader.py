@@ -0,0 +1,169 @@
+import json
+import os
+import sqlite3
+import sys
+
+from metadata import Catalog
+
+SCHEMA_FILE_EXTENSIONS = (".json", ".yaml", ".yml")
+
+
+def compact_definition(definition):
+    """Normaliza a definição de uma tabela para a forma compacta do catálogo"""
+    foreign_keys = {
+        sys.intern(fk_col): (sys.intern(ref[0]), sys.intern(ref[1]))
+        for fk_col, ref in (definition.get("foreign_keys") or {}).items()
+    }
+    compact = {"columns": tuple(sys.intern(col) for col in definition["columns"])}
+    if definition.get("primary_key"):
+        compact["primary_key"] = sys.intern(definition["primary_key"])
+    if foreign_keys:
+        compact["foreign_keys"] = foreign_keys
+    if definition.get("sort_order"):
+        compact["sort_order"] = tuple(sys.intern(col) for col in definition["sort_order"])
+    if definition.get("indexes"):
+        compact["indexes"] = {
+            sys.intern(name): dict(spec) for name, spec in definition["indexes"].items()
+        }
+    return compact
+
+
+def _read_document(path):
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".json"):
+            return json.load(f)
+
+        try:
+            import yaml
+        except ImportError as e:
+            raise ImportError(
+                "PyYAML é necessário para ler esquemas YAML (pip install pyyaml)"
+            ) from e
+        return yaml.safe_load(f)
+
+
+class FileSchemaLoader:
+    """
+    Esquema em JSON/YAML no mesmo formato de metadata.SCHEMA:
+        {"Tabela": {"columns": [...], "primary_key": "...",
+                    "foreign_keys": {"coluna": ["TabelaRef", "colunaRef"]}}}
+
+    ``path`` pode ser um único arquivo (lido por inteiro ao criar o catálogo,
+    mas cada tabela só é convertida quando usada) ou um diretório com um
+    arquivo por tabela (Tabela.json / Tabela.yaml), em que cada arquivo só é
+    lido quando a tabela é usada.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._document = None
+
+    def table_names(self):
+        if os.path.isdir(self.path):
+            return [
+                os.path.splitext(entry)[0]
+                for entry in sorted(os.listdir(self.path))
+                if entry.endswith(SCHEMA_FILE_EXTENSIONS)
+            ]
+        return list(self._load_document())
+
+    def load_table(self, name):
+        if os.path.isdir(self.path):
+            for extension in SCHEMA_FILE_EXTENSIONS:
+                path = os.path.join(self.path, name + extension)
+                if os.path.exists(path):
+                    return compact_definition(_read_document(path))
+            raise KeyError(name)
+
+        return compact_definition(self._load_document()[name])
+
+    def _load_document(self):
+        if self._document is None:
+            document = _read_document(self.path)
+            # Aceita tanto {"Tabela": {...}} quanto {"tables": {"Tabela": {...}}}
+            self._document = document.get("tables", document)
+        return self._document
+
+
+class SQLiteSchemaLoader:
+    """Lê o esquema de um banco SQLite via sqlite_master e PRAGMA"""
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            uri = f"file:{self.path}?mode=ro"
+            self._connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        return self._connection
+
+    def __getstate__(self):
+        # A conexão não é serializável (ex: catálogo enviado aos processos do
+        # QueryServer); a cópia reabre o arquivo no primeiro acesso
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.path = state["path"]
+        self._connection = None
+
+    def table_names(self):
+        rows = self._connect().execute(
+            "SELECT name FROM sqlite_master "
+            "WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+        )
+        return [row[0] for row in rows]
+
+    def load_table(self, name):
+        columns, primary_key = self._table_info(name)
+
+        foreign_keys = {}
+        # foreign_key_list: (id, seq, table, from, to, on_update, on_delete, match)
+        for row in self._connect().execute(f"PRAGMA foreign_key_list({_quote(name)})"):
+            ref_table, fk_col, ref_col = row[2], row[3], row[4]
+            if ref_col is None:
+                # REFERENCES sem coluna aponta para a chave primária
+                ref_col = self._table_info(ref_table)[1]
+            foreign_keys[fk_col] = (ref_table, ref_col)
+
+        definition = {"columns": columns, "foreign_keys": foreign_keys}
+        if primary_key:
+            definition["primary_key"] = primary_key
+        return compact_definition(definition)
+
+    def _table_info(self, name):
+        columns = []
+        primary_key = []
+        # table_info: (cid, name, type, notnull, dflt_value, pk)
+        for _, column, _, _, _, pk in self._connect().execute(
+            f"PRAGMA table_info({_quote(name)})"
+        ):
+            columns.append(column)
+            if pk:
+                primary_key.append((pk, column))
+
+        # Chave composta não é suportada pelo catálogo: usa a primeira coluna
+        return columns, min(primary_key)[1] if primary_key else None
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def _quote(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def get_schema_loader(source):
+    """Escolhe o loader pela extensão (ou diretório) de ``source``"""
+    if os.path.isdir(source) or source.endswith(SCHEMA_FILE_EXTENSIONS):
+        return FileSchemaLoader(source)
+    if source.endswith((".db", ".sqlite", ".sqlite3")):
+        return SQLiteSchemaLoader(source)
+    raise ValueError(f"Formato de esquema não suportado: '{source}'")
+
+
+def load_catalog(source):
+    """Cria um catálogo preguiçoso a partir de um arquivo, diretório ou SQLite"""
+    return Catalog(loader=get_schema_loader(source))
@@ -0,0 +1,107 @@
+import pickle
+import sys
+import tempfile
+
+SPILL_BATCH_ROWS = 1024  # Linhas serializadas juntas em cada registro do arquivo
+
+
+def row_size(row):
+    """Estimativa dos bytes ocupados por uma tupla e seus valores"""
+    return sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+
+
+def parse_size(value):
+    """Aceita bytes (int) ou textos como '64MB', '512k', '2G'"""
+    if value is None or isinstance(value, int):
+        return value
+    text = str(value).strip().upper().rstrip("B")
+    multipliers = {"K": 1024, "M": 1024**2, "G": 1024**3}
+    if text and text[-1] in multipliers:
+        return int(float(text[:-1]) * multipliers[text[-1]])
+    return int(text)
+
+
+class MemoryBudget:
+    """
+    Orçamento de memória de uma consulta, compartilhado pelos operadores que
+    materializam linhas (hash join, ordenação). Quem não consegue reservar
+    espaço deve despejar seus dados em disco.
+    """
+
+    def __init__(self, limit):
+        self.limit = parse_size(limit)
+        self.used = 0
+        self.peak = 0
+
+    def reserve(self, nbytes):
+        if self.used + nbytes > self.limit:
+            return False
+        self.used += nbytes
+        self.peak = max(self.peak, self.used)
+        return True
+
+    def release(self, nbytes):
+        self.used = max(self.used - nbytes, 0)
+
+
+class SpillMetrics:
+    """Quanto um operador precisou usar o disco"""
+
+    def __init__(self):
+        self.bytes_spilled = 0
+        self.files = 0
+        self.partitions = 0  # Partições gravadas (hash join)
+        self.runs = 0  # Sequências ordenadas gravadas (ordenação)
+        self.passes = 0  # Níveis de particionamento ou passadas de intercalação
+
+    @property
+    def spilled(self):
+        return self.bytes_spilled > 0
+
+    def __str__(self):
+        parts = [f"{self.bytes_spilled:,} bytes em {self.files} arquivo(s)"]
+        if self.partitions:
+            parts.append(f"{self.partitions} partição(ões)")
+        if self.runs:
+            parts.append(f"{self.runs} sequência(s)")
+        parts.append(f"{self.passes} passada(s)")
+        return ", ".join(parts)
+
+
+class SpillFile:
+    """Arquivo temporário com linhas serializadas em blocos (apagado ao fechar)"""
+
+    def __init__(self, metrics, directory=None):
+        self.metrics = metrics
+        self.file = tempfile.TemporaryFile(dir=directory, prefix="spill-")
+        self.buffer = []
+        self.rows = 0
+        self.memory = 0  # Bytes estimados das linhas quando carregadas de volta
+        metrics.files += 1
+
+    def write(self, row):
+        self.buffer.append(row)
+        self.rows += 1
+        self.memory += row_size(row)
+        if len(self.buffer) >= SPILL_BATCH_ROWS:
+            self._flush()
+
+    def _flush(self):
+        if self.buffer:
+            start = self.file.tell()
+            pickle.dump(self.buffer, self.file, pickle.HIGHEST_PROTOCOL)
+            self.metrics.bytes_spilled += self.file.tell() - start
+            self.buffer = []
+
+    def __iter__(self):
+        self._flush()
+        self.file.seek(0)
+        while True:
+            try:
+                rows = pickle.load(self.file)
+            except EOFError:
+                return
+            yield from rows
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,273 @@
+AGGREGATE_FUNCTIONS = ("COUNT", "SUM", "AVG", "MIN", "MAX")
+
+
+class Expression:
+    """Nó de expressão da cláusula WHERE / ON"""
+
+    __slots__ = ()
+
+    def render(self, and_op="AND", or_op="OR"):
+        raise NotImplementedError
+
+    def __str__(self):
+        return self.render()
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.render()!r})"
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash((type(self).__name__, self._key()))
+
+    def _key(self):
+        raise NotImplementedError
+
+
+class ColumnRef(Expression):
+    """Referência a coluna (tabela.coluna ou coluna)"""
+
+    __slots__ = ("table", "column")
+
+    def __init__(self, table, column):
+        self.table = table
+        self.column = column
+
+    def render(self, and_op="AND", or_op="OR"):
+        if self.table:
+            return f"{self.table}.{self.column}"
+        return self.column
+
+    def _key(self):
+        return (self.table, self.column)
+
+    def __lt__(self, other):
+        return self.render() < other.render()
+
+
+class Literal(Expression):
+    """Valor constante (número, string ou identificador solto)"""
+
+    __slots__ = ("value", "kind", "text")
+
+    def __init__(self, value, kind, text=None):
+        self.value = value
+        self.kind = kind  # "number", "string" ou "identifier"
+        self.text = text if text is not None else str(value)
+
+    def render(self, and_op="AND", or_op="OR"):
+        if self.kind == "string":
+            escaped = self.value.replace("'", "''")
+            return f"'{escaped}'"
+        return self.text
+
+    def _key(self):
+        return (self.kind, self.value)
+
+
+class Comparison(Expression):
+    """Comparação binária (=, <>, <, >, <=, >=)"""
+
+    __slots__ = ("op", "left", "right")
+
+    def __init__(self, op, left, right):
+        self.op = op
+        self.left = left
+        self.right = right
+
+    def render(self, and_op="AND", or_op="OR"):
+        return f"{self.left.render()} {self.op} {self.right.render()}"
+
+    def _key(self):
+        return (self.op, self.left, self.right)
+
+
+class BoolExpr(Expression):
+    """Conjunção / disjunção n-ária (AND, OR)"""
+
+    __slots__ = ("op", "operands")
+
+    def __init__(self, op, operands):
+        self.op = op  # "AND" ou "OR"
+        self.operands = tuple(operands)
+
+    def render(self, and_op="AND", or_op="OR"):
+        symbol = and_op if self.op == "AND" else or_op
+        parts = []
+        for operand in self.operands:
+            text = operand.render(and_op, or_op)
+            # AND tem precedência maior que OR: só o OR interno precisa de ()
+            if isinstance(operand, BoolExpr) and operand.op == "OR":
+                text = f"({text})"
+            parts.append(text)
+        return f" {symbol} ".join(parts)
+
+    def _key(self):
+        return (self.op, self.operands)
+
+
+class Aggregate(Expression):
+    """
+    Função de agregação do SELECT/ORDER BY (argumento None = COUNT(*)). Na
+    saída de γ o resultado é uma coluna sem tabela com o texto da função como
+    nome, então ``table``/``column`` a localizam como a um ColumnRef.
+    """
+
+    __slots__ = ("function", "argument")
+
+    table = None
+
+    def __init__(self, function, argument):
+        self.function = function  # COUNT, SUM, AVG, MIN ou MAX
+        self.argument = argument  # ColumnRef ou None
+
+    @property
+    def column(self):
+        return self.render()
+
+    def render(self, and_op="AND", or_op="OR"):
+        argument = self.argument.render() if self.argument is not None else "*"
+        return f"{self.function}({argument})"
+
+    def _key(self):
+        return (self.function, self.argument)
+
+
+class JoinClause:
+    """JOIN <tabela> ON <condição>"""
+
+    __slots__ = ("table", "condition")
+
+    def __init__(self, table, condition):
+        self.table = table
+        self.condition = condition
+
+    def __repr__(self):
+        return f"JoinClause({self.table!r}, {str(self.condition)!r})"
+
+
+class OrderItem:
+    """Item do ORDER BY: coluna ou agregação e o sentido"""
+
+    __slots__ = ("expression", "descending")
+
+    def __init__(self, expression, descending=False):
+        self.expression = expression  # ColumnRef ou Aggregate
+        self.descending = descending
+
+    def render(self):
+        return f"{self.expression.render()}{' DESC' if self.descending else ''}"
+
+    def __str__(self):
+        return self.render()
+
+    def __repr__(self):
+        return f"OrderItem({self.render()!r})"
+
+    def __eq__(self, other):
+        return (
+            type(self) is type(other)
+            and self.expression == other.expression
+            and self.descending == other.descending
+        )
+
+    def __hash__(self):
+        return hash((self.expression, self.descending))
+
+
+class SelectStatement:
+    """Raiz da AST de uma consulta SELECT"""
+
+    __slots__ = (
+        "columns",
+        "from_table",
+        "joins",
+        "where",
+        "original",
+        "group_by",
+        "order_by",
+        "limit",
+    )
+
+    def __init__(
+        self, columns, from_table, joins, where, original, group_by=(), order_by=(), limit=None
+    ):
+        self.columns = columns  # Lista de ColumnRef/Aggregate
+        self.from_table = from_table  # Nome da tabela do FROM
+        self.joins = joins  # Lista de JoinClause
+        self.where = where  # Expression ou None
+        self.original = original  # Texto original da consulta
+        self.group_by = list(group_by)  # Lista de ColumnRef
+        self.order_by = list(order_by)  # Lista de OrderItem
+        self.limit = limit  # int ou None
+
+    @property
+    def tables(self):
+        return [self.from_table] + [join.table for join in self.joins]
+
+    @property
+    def aggregates(self):
+        """Agregações do SELECT e do ORDER BY, sem repetição e em ordem de aparição"""
+        found = []
+        for expr in list(self.columns) + [item.expression for item in self.order_by]:
+            if isinstance(expr, Aggregate) and expr not in found:
+                found.append(expr)
+        return found
+
+    @property
+    def is_aggregate(self):
+        """Consulta com GROUP BY ou agregações (uma linha por grupo)"""
+        return bool(self.group_by) or bool(self.aggregates)
+
+    def __repr__(self):
+        return (
+            f"SelectStatement(columns={[str(c) for c in self.columns]}, "
+            f"from={self.from_table!r}, joins={self.joins}, "
+            f"where={str(self.where) if self.where else None!r}, "
+            f"group_by={[str(c) for c in self.group_by]}, "
+            f"order_by={[str(i) for i in self.order_by]}, limit={self.limit!r})"
+        )
+
+
+def make_bool(op, operands):
+    """Cria AND/OR achatando operandos do mesmo tipo"""
+    flat = []
+    for operand in operands:
+        if isinstance(operand, BoolExpr) and operand.op == op:
+            flat.extend(operand.operands)
+        else:
+            flat.append(operand)
+    if len(flat) == 1:
+        return flat[0]
+    return BoolExpr(op, flat)
+
+
+def conjuncts(expr):
+    """Lista de termos de um AND (a própria expressão se não for AND)"""
+    if expr is None:
+        return []
+    if isinstance(expr, BoolExpr) and expr.op == "AND":
+        return list(expr.operands)
+    return [expr]
+
+
+def column_refs(expr):
+    """Todas as referências a coluna da expressão, em ordem de aparição"""
+    refs = []
+    stack = [expr]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ColumnRef):
+            refs.append(node)
+        elif isinstance(node, Comparison):
+            stack.append(node.right)
+            stack.append(node.left)
+        elif isinstance(node, BoolExpr):
+            stack.extend(reversed(node.operands))
+    return refs
+
+
+def referenced_tables(expr):
+    """Conjunto de tabelas referenciadas pela expressão"""
+    return {ref.table for ref in column_refs(expr) if ref.table}
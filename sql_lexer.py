@@ -0,0 +1,81 @@
+import re
+
+
+class SQLSyntaxError(ValueError):
+    """Erro de sintaxe encontrado pelo lexer ou pelo parser"""
+
+    def __init__(self, message, position=None):
+        super().__init__(message)
+        self.position = position
+
+
+class Token:
+    __slots__ = ("kind", "value", "position")
+
+    def __init__(self, kind, value, position):
+        self.kind = kind  # Tipo do token (KEYWORD, IDENT, NUMBER, ...)
+        self.value = value  # Texto do token (palavras-chave em maiúsculas)
+        self.position = position  # Posição do token na consulta original
+
+    def __repr__(self):
+        return f"Token({self.kind}, {self.value!r}, {self.position})"
+
+
+KEYWORDS = frozenset(
+    ["SELECT", "FROM", "JOIN", "INNER", "ON", "WHERE", "AND", "OR"]
+    + ["GROUP", "BY", "ORDER", "ASC", "DESC", "LIMIT"]
+)
+
+# Operadores com mais de um caractere vêm primeiro para que '<=' não seja
+# lido como '<' seguido de '='. Os inválidos ('==', '=>', ...) são
+# reconhecidos aqui e rejeitados pelo parser com uma mensagem clara.
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<WS>\s+)
+  | (?P<NUMBER>\d+(?:\.\d+)?)
+  | (?P<STRING>'(?:''|[^'])*')
+  | (?P<IDENT>[A-Za-z_]\w*)
+  | (?P<OPERATOR><=|>=|<>|!=|==|=>|=<|><|=|<|>)
+  | (?P<COMMA>,)
+  | (?P<DOT>\.)
+  | (?P<LPAREN>\()
+  | (?P<RPAREN>\))
+  | (?P<STAR>\*)
+  | (?P<SEMICOLON>;)
+    """,
+    re.VERBOSE,
+)
+
+
+def tokenize(query):
+    """Converte a consulta em uma lista de tokens em uma única passada"""
+    tokens = []
+    position = 0
+    length = len(query)
+    match = _TOKEN_RE.match
+
+    while position < length:
+        m = match(query, position)
+        if m is None:
+            raise SQLSyntaxError(
+                f"Caractere inesperado '{query[position]}' na posição {position}",
+                position,
+            )
+
+        kind = m.lastgroup
+        value = m.group()
+        if kind == "IDENT":
+            upper = value.upper()
+            if upper in KEYWORDS:
+                tokens.append(Token("KEYWORD", upper, position))
+            else:
+                tokens.append(Token("IDENT", value, position))
+        elif kind == "STRING":
+            tokens.append(Token("STRING", value[1:-1].replace("''", "'"), position))
+        elif kind != "WS":
+            tokens.append(Token(kind, value, position))
+
+        position = m.end()
+
+    tokens.append(Token("EOF", "", length))
+    return tokens
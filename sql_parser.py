@@ -1,230 +1,608 @@
-import re
+from collections import OrderedDict, deque
+from itertools import islice
 
 from metadata import (
     column_exists_in_table,
+    get_catalog,
+    normalize_column_name,
+    normalize_table_name,
+    set_catalog,
     table_exists,
 )
+from sql_ast import (
+    AGGREGATE_FUNCTIONS,
+    Aggregate,
+    BoolExpr,
+    ColumnRef,
+    Comparison,
+    JoinClause,
+    Literal,
+    OrderItem,
+    SelectStatement,
+    make_bool,
+)
+from sql_lexer import SQLSyntaxError, tokenize
 
+COMPARISON_OPERATORS = frozenset(["=", ">", "<", "<=", ">=", "<>"])
 
-class SQLParser:
-    def __init__(self):
-        self.valid_operators = ["=", ">", "<", "<=", ">=", "<>", "AND", "OR"]
-
-    def parse(self, sql_query):
-        try:
-            sql_query = self._normalize_query(sql_query)
-
-            if not self._validate_basic_syntax(sql_query):
-                return False, "Sintaxe SQL inválida", None
-
-            parsed = self._extract_query_components(sql_query)
-            if not parsed:
-                return False, "Não foi possível fazer o parsing da consulta", None
-
-            table_validation = self._validate_tables(parsed)
-            if not table_validation[0]:
-                return False, table_validation[1], None
+DEFAULT_BATCH_SIZE = 1000  # Consultas por tarefa quando parse_many usa processos
+DEFAULT_QUERY_MEMO = 100_000  # Consultas idênticas lembradas durante um lote
 
-            column_validation = self._validate_columns(parsed)
-            if not column_validation[0]:
-                return False, column_validation[1], None
 
-            operator_validation = self._validate_operators(parsed)
-            if not operator_validation[0]:
-                return False, operator_validation[1], None
+class ValidationError(Exception):
+    """Consulta sintaticamente correta que não bate com o esquema"""
 
-            return True, "Consulta válida", parsed
 
-        except Exception as e:
-            return False, f"Erro no parsing: {str(e)}", None
+class _SchemaLookup:
+    """Consultas ao catálogo feitas pela validação"""
 
-    def _normalize_query(self, query):
-        query = re.sub(r"\s+", " ", query)
-        query = query.strip()
-        return query
+    def table(self, name):
+        """Nome canônico da tabela (None se ela não existir)"""
+        return normalize_table_name(name) if table_exists(name) else None
 
-    def _validate_basic_syntax(self, query):
-        query_upper = query.upper()
+    def column(self, table, column):
+        """Coluna qualificada com os nomes canônicos (None se não existir)"""
+        if not column_exists_in_table(table, column):
+            return None
+        table = normalize_table_name(table)
+        return ColumnRef(table, normalize_column_name(table, column))
 
-        if "SELECT" not in query_upper or "FROM" not in query_upper:
-            return False
 
-        # SELECT deve vir antes de FROM
-        select_pos = query_upper.index("SELECT")
-        from_pos = query_upper.index("FROM")
+class _MemoizedSchemaLookup(_SchemaLookup):
+    """
+    Mesmas consultas lembradas durante um lote de ``parse_many``: a mesma
+    referência (ex: Cliente.Nome) é resolvida uma vez e o ColumnRef é
+    compartilhado entre as ASTs. Uma mudança no catálogo esvazia o memo.
+    """
 
-        if select_pos >= from_pos:
+    def __init__(self):
+        self._tables = {}
+        self._columns = {}
+        self._catalog = None
+        self._version = None
+
+    def check_catalog(self):
+        """Esvazia o memo se o catálogo mudou; devolve True nesse caso"""
+        catalog = get_catalog()
+        if catalog is self._catalog and catalog.version == self._version:
             return False
-
+        self._tables.clear()
+        self._columns.clear()
+        self._catalog, self._version = catalog, catalog.version
         return True
 
-    def _extract_query_components(self, query):
-        """Extrai os componentes da consulta SQL"""
+    def table(self, name):
         try:
-            parsed = {
-                "select": [],
-                "from": [],
-                "joins": [],
-                "where": None,
-                "original": query,
-            }
-
-            query_upper = query.upper()
-
-            # Extrair SELECT
-            select_start = query_upper.index("SELECT") + 6
-            from_start = query_upper.index("FROM")
-            select_clause = query[select_start:from_start].strip()
-
-            # Processar colunas do SELECT
-            parsed["select"] = [col.strip() for col in select_clause.split(",")]
+            return self._tables[name]
+        except KeyError:
+            result = self._tables[name] = super().table(name)
+            return result
 
-            # Extrair FROM e JOINs
-            from_clause = query[from_start:]
+    def column(self, table, column):
+        key = (table, column)
+        try:
+            return self._columns[key]
+        except KeyError:
+            result = self._columns[key] = super().column(table, column)
+            return result
 
-            # Encontrar WHERE se existir
-            where_match = re.search(r"\bWHERE\b", from_clause, re.IGNORECASE)
-            if where_match:
-                where_start = where_match.start()
-                where_clause = from_clause[where_start + 5 :].strip()
-                parsed["where"] = where_clause
-                from_clause = from_clause[:where_start]
 
-            # Processar FROM e JOINs
-            self._parse_from_joins(from_clause, parsed)
+class SQLParser:
+    def __init__(self):
+        self.valid_operators = ["=", ">", "<", "<=", ">=", "<>", "AND", "OR"]
+        self._schema = _SchemaLookup()
 
-            return parsed
+    def parse(self, sql_query):
+        try:
+            statement = _RecursiveDescentParser(tokenize(sql_query)).parse()
+            statement.original = " ".join(sql_query.split())
+            return True, "Consulta válida", self._validate(statement)
 
+        except (SQLSyntaxError, ValidationError) as e:
+            return False, str(e), None
         except Exception as e:
-            print(f"Erro ao extrair componentes: {e}")
-            return None
+            return False, f"Erro no parsing: {str(e)}", None
 
-    def _parse_from_joins(self, from_clause, parsed):
-        from_clause = re.sub(r"\bFROM\b", "", from_clause, flags=re.IGNORECASE).strip()
-
-        # Separar por JOIN
-        parts = re.split(r"\bJOIN\b", from_clause, flags=re.IGNORECASE)
-
-        # Primeira parte é a tabela FROM
-        first_table = parts[0].strip()
-        parsed["from"].append(first_table)
-
-        # Processar JOINs
-        for i in range(1, len(parts)):
-            join_part = parts[i].strip()
-
-            # Extrair tabela e condição ON
-            on_match = re.search(r"\bON\b", join_part, re.IGNORECASE)
-            if on_match:
-                table = join_part[: on_match.start()].strip()
-                condition = join_part[on_match.start() + 2 :].strip()
-                parsed["joins"].append({"table": table, "condition": condition})
-
-    def _validate_tables(self, parsed):
-        for table in parsed["from"]:
-            if not table_exists(table):
-                return False, f"Tabela '{table}' não existe no esquema"
-
-        for join in parsed["joins"]:
-            table = join["table"]
-            if not table_exists(table):
-                return False, f"Tabela '{table}' não existe no esquema"
-
-        return True, "Tabelas válidas"
-
-    def _validate_columns(self, parsed):
-        all_tables = parsed["from"] + [join["table"] for join in parsed["joins"]]
-
-        # Validar colunas do SELECT
-        for col_expr in parsed["select"]:
-            if "." in col_expr:
-                table, column = map(str.strip, col_expr.split("."))
-                if not table_exists(table):
-                    return (
-                        False,
-                        f"Tabela '{table}' não encontrada para coluna '{column}'",
-                    )
-                if not column_exists_in_table(table, column):
-                    return False, f"Coluna '{column}' não existe na tabela '{table}'"
-            else:
-                column = col_expr.strip()
-                found = any(column_exists_in_table(t, column) for t in all_tables)
-                if not found:
-                    return False, f"Coluna '{column}' não encontrada em nenhuma tabela"
-
-        # Validar colunas em JOINs
-        for join in parsed["joins"]:
-            condition = re.sub(r"'(?:''|[^'])*'", "", join["condition"])
-            columns_in_condition = re.findall(r"(\w+\.\w+)", condition)
-            for col_expr in columns_in_condition:
-                table, column = col_expr.split(".")
-                if not table_exists(table):
-                    return False, f"Tabela '{table}' não encontrada na condição JOIN"
-                if not column_exists_in_table(table, column):
-                    return (
-                        False,
-                        f"Coluna '{column}' não existe na tabela '{table}' (JOIN)",
+    def parse_many(
+        self, queries, processes=None, batch_size=DEFAULT_BATCH_SIZE, with_ast=True
+    ):
+        """
+        Valida um iterável de consultas, devolvendo sob demanda, na ordem, o
+        mesmo (válida, mensagem, AST) de ``parse``. Consultas com texto
+        idêntico são analisadas uma vez (recebem a mesma AST) e as
+        referências a tabelas e colunas são resolvidas uma vez por lote.
+
+        Com ``processes`` > 1 as consultas são divididas em blocos de
+        ``batch_size`` e validadas num pool de processos, com no máximo dois
+        blocos por processo em andamento. ``with_ast=False`` devolve apenas a
+        validação (AST None), o que evita enviar as ASTs entre processos.
+        """
+        if processes is not None and processes > 1:
+            return _parse_parallel(queries, processes, batch_size, with_ast)
+        return _BatchParser().parse_all(queries, with_ast)
+
+    def _validate(self, statement):
+        """Valida tabelas e colunas e devolve a AST com nomes resolvidos"""
+        tables = []
+        for table in statement.tables:
+            canonical = self._schema.table(table)
+            if canonical is None:
+                raise ValidationError(f"Tabela '{table}' não existe no esquema")
+            tables.append(canonical)
+
+        columns = [self._bind_select_item(item, tables) for item in statement.columns]
+
+        joins = []
+        for join, table in zip(statement.joins, tables[1:]):
+            condition = self._bind_expression(join.condition, tables, "JOIN")
+            joins.append(JoinClause(table, condition))
+
+        where = None
+        if statement.where is not None:
+            where = self._bind_expression(statement.where, tables, "WHERE")
+
+        group_by = [self._bind_select_column(col, tables) for col in statement.group_by]
+        order_by = [
+            OrderItem(self._bind_select_item(item.expression, tables), item.descending)
+            for item in statement.order_by
+        ]
+
+        bound = SelectStatement(
+            columns,
+            tables[0],
+            joins,
+            where,
+            statement.original,
+            group_by,
+            order_by,
+            statement.limit,
+        )
+        if bound.is_aggregate:
+            self._check_grouped(bound)
+        return bound
+
+    def _check_grouped(self, statement):
+        # Com agregação cada linha é um grupo: colunas soltas só as do GROUP BY
+        for clause, items in (
+            ("SELECT", statement.columns),
+            ("ORDER BY", [item.expression for item in statement.order_by]),
+        ):
+            for item in items:
+                if isinstance(item, ColumnRef) and item not in statement.group_by:
+                    raise ValidationError(
+                        f"Coluna '{item}' do {clause} deve aparecer no GROUP BY "
+                        f"ou em uma função de agregação"
                     )
 
-        # Validar colunas no WHERE
-        if parsed["where"]:
-            where_cleaned = re.sub(r"'(?:''|[^'])*'", "", parsed["where"])
-            columns_in_where = re.findall(
-                r"\b([A-Za-z_]\w*\.[A-Za-z_]\w*)\b", where_cleaned
-            )
-
-            for col_expr in columns_in_where:
-                table, column = col_expr.split(".")
-                if not table_exists(table):
-                    return False, f"Tabela '{table}' não encontrada na cláusula WHERE"
-                if not column_exists_in_table(table, column):
-                    return (
-                        False,
-                        f"Coluna '{column}' não existe na tabela '{table}' (WHERE)",
-                    )
+    def _bind_select_item(self, item, tables):
+        if isinstance(item, Aggregate):
+            if item.argument is None:
+                return item
+            return Aggregate(item.function, self._bind_select_column(item.argument, tables))
+        return self._bind_select_column(item, tables)
+
+    def _bind_select_column(self, ref, tables):
+        if ref.table is not None:
+            if self._schema.table(ref.table) is None:
+                raise ValidationError(
+                    f"Tabela '{ref.table}' não encontrada para coluna '{ref.column}'"
+                )
+            resolved = self._schema.column(ref.table, ref.column)
+            if resolved is None:
+                raise ValidationError(
+                    f"Coluna '{ref.column}' não existe na tabela '{ref.table}'"
+                )
+            self._check_in_query(ref.table, resolved.table, tables)
+            return resolved
 
-        return True, "Colunas válidas"
+        resolved = self._resolve_unqualified(ref.column, tables)
+        if resolved is None:
+            raise ValidationError(
+                f"Coluna '{ref.column}' não encontrada em nenhuma tabela"
+            )
+        return resolved
 
-    def _validate_operators(self, parsed):
-        if not parsed["where"]:
-            return True, "Sem cláusula WHERE"
+    def _bind_expression(self, expr, tables, clause):
+        if isinstance(expr, BoolExpr):
+            return BoolExpr(
+                expr.op,
+                [self._bind_expression(e, tables, clause) for e in expr.operands],
+            )
 
-        where_clause = parsed["where"].strip()
+        if isinstance(expr, Comparison):
+            return Comparison(
+                expr.op,
+                self._bind_expression(expr.left, tables, clause),
+                self._bind_expression(expr.right, tables, clause),
+            )
 
-        if re.search(r"[^<>!]=[^=]", where_clause):  # evita '=='
-            pass
-        if re.search(r"==|=>|=<|><", where_clause):
-            return False, "Operador inválido encontrado na cláusula WHERE"
+        if isinstance(expr, ColumnRef):
+            if expr.table is None:
+                # Identificador solto que não é coluna vira literal (ex: UF = CE)
+                resolved = self._resolve_unqualified(expr.column, tables)
+                if resolved is None:
+                    return Literal(expr.column, "identifier")
+                return resolved
+
+            if self._schema.table(expr.table) is None:
+                location = "na cláusula WHERE" if clause == "WHERE" else "na condição JOIN"
+                raise ValidationError(
+                    f"Tabela '{expr.table}' não encontrada {location}"
+                )
+            resolved = self._schema.column(expr.table, expr.column)
+            if resolved is None:
+                raise ValidationError(
+                    f"Coluna '{expr.column}' não existe na tabela '{expr.table}' ({clause})"
+                )
+            self._check_in_query(expr.table, resolved.table, tables)
+            return resolved
+
+        return expr
+
+    def _resolve_unqualified(self, column, tables):
+        matches = []
+        for table in tables:
+            resolved = self._schema.column(table, column)
+            if resolved is not None:
+                matches.append(resolved)
+        if not matches:
+            return None
+        if len(matches) > 1:
+            raise ValidationError(
+                f"Coluna '{column}' é ambígua "
+                f"(presente em {', '.join(ref.table for ref in matches)})"
+            )
+        return matches[0]
 
-        if re.search(r"(=\s*[\w.]+)\s+(?=[\w.]+\s*=)", where_clause):
-            return False, "Falta operador lógico (AND/OR) entre condições no WHERE"
+    def _check_in_query(self, table, canonical, tables):
+        # A coluna precisa vir de uma tabela lida pela consulta
+        if canonical not in tables:
+            raise ValidationError(
+                f"Tabela '{table}' não está presente no FROM/JOIN da consulta"
+            )
 
-        if re.search(r"\b(AND|OR)\s*$", where_clause, re.IGNORECASE):
-            return False, "Cláusula WHERE termina incorretamente com operador lógico"
 
-        conditions = re.split(r"\bAND\b|\bOR\b", where_clause, flags=re.IGNORECASE)
-        conditions = [c.strip() for c in conditions if c.strip()]
+class _BatchParser(SQLParser):
+    """Parser de um lote: memo das consultas idênticas e das referências ao esquema"""
+
+    def __init__(self, memo_size=DEFAULT_QUERY_MEMO):
+        super().__init__()
+        self._schema = _MemoizedSchemaLookup()
+        self._results = OrderedDict()  # texto da consulta -> resultado (LRU)
+        self.memo_size = memo_size
+
+    def parse_all(self, queries, with_ast=True):
+        for sql_query in queries:
+            yield self.parse_cached(sql_query, with_ast)
+
+    def parse_cached(self, sql_query, with_ast=True):
+        if self._schema.check_catalog():
+            self._results.clear()
+        result = self._results.get(sql_query)
+        if result is None:
+            result = self.parse(sql_query)
+            if not with_ast:
+                result = result[:2] + (None,)
+            self._results[sql_query] = result
+            if len(self._results) > self.memo_size:
+                self._results.popitem(last=False)
+        else:
+            self._results.move_to_end(sql_query)
+        return result
+
+
+# Parser dos processos de parse_many (um memo por processo durante o lote)
+_worker_parser = None
+
+
+def _init_parse_worker(catalog):
+    global _worker_parser
+    set_catalog(catalog)
+    _worker_parser = _BatchParser()
+
+
+def _parse_chunk(queries, with_ast):
+    return [_worker_parser.parse_cached(q, with_ast) for q in queries]
+
+
+def _parse_parallel(queries, processes, batch_size, with_ast):
+    # Importado aqui: concurrent.futures.process pesa na partida do query_cli
+    from concurrent.futures import ProcessPoolExecutor
+
+    queries = iter(queries)
+    pool = ProcessPoolExecutor(
+        processes, initializer=_init_parse_worker, initargs=(get_catalog(),)
+    )
+    pending = deque()
+    try:
+        while True:
+            chunk = list(islice(queries, batch_size))
+            if chunk:
+                pending.append(pool.submit(_parse_chunk, chunk, with_ast))
+            # Janela limitada: não lê o iterável inteiro de uma vez
+            if pending and (not chunk or len(pending) >= 2 * processes):
+                yield from pending.popleft().result()
+            if not chunk and not pending:
+                return
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+class _RecursiveDescentParser:
+    """
+    Gramática aceita:
+        consulta   := SELECT item (',' item)* FROM tabela junção* [WHERE expr]
+                      [GROUP BY coluna (',' coluna)*]
+                      [ORDER BY ordem (',' ordem)*] [LIMIT NUMBER] [;]
+        item       := coluna | agregação
+        agregação  := (COUNT | SUM | AVG | MIN | MAX) '(' coluna ')' | COUNT '(' '*' ')'
+        ordem      := item [ASC | DESC]
+        junção     := [INNER] JOIN tabela ON expr
+        expr       := termo_e (OR termo_e)*
+        termo_e    := fator (AND fator)*
+        fator      := '(' expr ')' | operando op_comparação operando
+        operando   := NUMBER | STRING | IDENT ['.' IDENT]
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+        self.clause = "SELECT"
+
+    def parse(self):
+        if not self._accept("KEYWORD", "SELECT"):
+            raise SQLSyntaxError("Sintaxe SQL inválida: a consulta deve começar com SELECT")
+
+        columns = [self._parse_item()]
+        while self._accept("COMMA"):
+            columns.append(self._parse_item())
+
+        if not self._accept("KEYWORD", "FROM"):
+            raise SQLSyntaxError(
+                f"Sintaxe SQL inválida: esperado FROM, encontrado {self._describe()}"
+            )
+        self.clause = "FROM"
+        from_table = self._expect_identifier("nome de tabela após FROM")
+
+        joins = []
+        while self._peek().value in ("JOIN", "INNER"):
+            joins.append(self._parse_join())
+
+        where = None
+        if self._accept("KEYWORD", "WHERE"):
+            self.clause = "WHERE"
+            where = self._parse_condition()
+
+        group_by = []
+        if self._accept("KEYWORD", "GROUP"):
+            self._expect_by("GROUP")
+            group_by.append(self._parse_column())
+            while self._accept("COMMA"):
+                group_by.append(self._parse_column())
+
+        order_by = []
+        if self._accept("KEYWORD", "ORDER"):
+            self._expect_by("ORDER")
+            order_by.append(self._parse_order_item())
+            while self._accept("COMMA"):
+                order_by.append(self._parse_order_item())
+
+        limit = None
+        if self._accept("KEYWORD", "LIMIT"):
+            self.clause = "LIMIT"
+            token = self._peek()
+            if token.kind != "NUMBER" or "." in token.value:
+                raise SQLSyntaxError(
+                    f"Sintaxe SQL inválida: LIMIT requer um número inteiro, "
+                    f"encontrado {self._describe()}",
+                    token.position,
+                )
+            limit = int(self._advance().value)
+
+        self._accept("SEMICOLON")
+        if self._peek().kind != "EOF":
+            raise SQLSyntaxError(
+                f"Sintaxe SQL inválida: {self._describe()} inesperado "
+                f"na cláusula {self.clause}",
+                self._peek().position,
+            )
 
-        for cond in conditions:
-            # Ignorar parênteses ou expressões compostas
-            cond_clean = cond.strip("() ")
+        return SelectStatement(
+            columns, from_table, joins, where, None, group_by, order_by, limit
+        )
 
-            # Verifica se contém pelo menos um operador válido
-            op_match = re.search(r"(=|<>|<=|>=|<|>)", cond_clean)
-            if not op_match:
-                return (
-                    False,
-                    f"Falta operador de comparação em parte da cláusula WHERE: '{
-                        cond_clean
-                    }'",
+    def _expect_by(self, keyword):
+        if not self._accept("KEYWORD", "BY"):
+            raise SQLSyntaxError(
+                f"Sintaxe SQL inválida: esperado BY após {keyword}, "
+                f"encontrado {self._describe()}",
+                self._peek().position,
+            )
+        self.clause = f"{keyword} BY"
+
+    def _parse_column(self):
+        token = self._peek()
+        if token.kind != "IDENT":
+            raise SQLSyntaxError(
+                f"Sintaxe SQL inválida: coluna esperada no {self.clause}, "
+                f"encontrado {self._describe()}",
+                token.position,
+            )
+        if self.tokens[self.pos + 1].kind == "LPAREN":
+            raise SQLSyntaxError(
+                f"Sintaxe SQL inválida: função '{token.value}' não permitida no {self.clause}",
+                token.position,
+            )
+        return self._parse_reference()
+
+    def _parse_item(self):
+        """Coluna ou agregação (SELECT e ORDER BY)"""
+        token = self._peek()
+        if token.kind != "IDENT" or self.tokens[self.pos + 1].kind != "LPAREN":
+            return self._parse_column()
+
+        function = token.value.upper()
+        if function not in AGGREGATE_FUNCTIONS:
+            raise SQLSyntaxError(
+                f"Função '{token.value}' não suportada (use {', '.join(AGGREGATE_FUNCTIONS)})",
+                token.position,
+            )
+        self._advance()
+        self._advance()
+        if self._accept("STAR"):
+            if function != "COUNT":
+                raise SQLSyntaxError(
+                    f"Sintaxe SQL inválida: '*' só é aceito em COUNT, não em {function}",
+                    token.position,
                 )
+            argument = None
+        else:
+            argument = self._parse_column()
+        if not self._accept("RPAREN"):
+            raise SQLSyntaxError(
+                f"Parêntese não fechado em {function} na cláusula {self.clause}",
+                token.position,
+            )
+        return Aggregate(function, argument)
+
+    def _parse_order_item(self):
+        expression = self._parse_item()
+        if self._accept("KEYWORD", "DESC"):
+            return OrderItem(expression, True)
+        self._accept("KEYWORD", "ASC")
+        return OrderItem(expression)
+
+    def _parse_join(self):
+        if self._accept("KEYWORD", "INNER") and self._peek().value != "JOIN":
+            raise SQLSyntaxError("Sintaxe SQL inválida: esperado JOIN após INNER")
+        self._advance()
+        table = self._expect_identifier("nome de tabela após JOIN")
+
+        if not self._accept("KEYWORD", "ON"):
+            raise SQLSyntaxError(f"JOIN com a tabela '{table}' sem condição ON")
+
+        self.clause = "JOIN"
+        condition = self._parse_condition()
+        return JoinClause(table, condition)
+
+    def _parse_condition(self):
+        if self._peek().kind == "EOF":
+            raise SQLSyntaxError(f"Cláusula {self.clause} vazia")
+        return self._parse_or()
+
+    def _parse_or(self):
+        operands = [self._parse_and()]
+        while self._accept("KEYWORD", "OR"):
+            operands.append(self._parse_and())
+        return make_bool("OR", operands)
+
+    def _parse_and(self):
+        operands = [self._parse_factor()]
+        while self._accept("KEYWORD", "AND"):
+            operands.append(self._parse_factor())
+        return make_bool("AND", operands)
+
+    def _parse_factor(self):
+        token = self._peek()
+
+        if token.kind == "EOF" or token.value in ("AND", "OR"):
+            raise SQLSyntaxError(
+                f"Cláusula {self.clause} termina incorretamente com operador lógico",
+                token.position,
+            )
 
-            # Operador presente, mas expressão incompleta (ex: coluna = )
-            parts = re.split(r"(=|<>|<=|>=|<|>)", cond_clean)
-            if len(parts) < 3 or not parts[0].strip() or not parts[2].strip():
-                return (
-                    False,
-                    f"Expressão incompleta na cláusula WHERE: '{cond_clean}'",
+        if self._accept("LPAREN"):
+            expr = self._parse_or()
+            if not self._accept("RPAREN"):
+                raise SQLSyntaxError(
+                    f"Parêntese não fechado na cláusula {self.clause}", token.position
                 )
+            return expr
+
+        left = self._parse_operand()
+
+        op_token = self._peek()
+        if op_token.kind != "OPERATOR":
+            raise SQLSyntaxError(
+                f"Falta operador de comparação em parte da cláusula {self.clause}: "
+                f"'{left}' seguido de {self._describe()}",
+                op_token.position,
+            )
+        if op_token.value not in COMPARISON_OPERATORS:
+            raise SQLSyntaxError(
+                f"Operador inválido '{op_token.value}' encontrado na cláusula {self.clause}",
+                op_token.position,
+            )
+        self._advance()
+
+        if self._peek().kind not in ("IDENT", "NUMBER", "STRING"):
+            raise SQLSyntaxError(
+                f"Expressão incompleta na cláusula {self.clause}: '{left} {op_token.value}'",
+                op_token.position,
+            )
+        right = self._parse_operand()
+
+        if self._peek().kind in ("IDENT", "NUMBER", "STRING"):
+            raise SQLSyntaxError(
+                f"Falta operador lógico (AND/OR) entre condições no {self.clause}",
+                self._peek().position,
+            )
+
+        return Comparison(op_token.value, left, right)
+
+    def _parse_operand(self):
+        token = self._peek()
+        if token.kind == "NUMBER":
+            self._advance()
+            value = float(token.value) if "." in token.value else int(token.value)
+            return Literal(value, "number", token.value)
+        if token.kind == "STRING":
+            self._advance()
+            return Literal(token.value, "string")
+        if token.kind == "IDENT":
+            return self._parse_reference()
+        raise SQLSyntaxError(
+            f"Expressão incompleta na cláusula {self.clause}: operando esperado, "
+            f"encontrado {self._describe()}",
+            token.position,
+        )
+
+    def _parse_reference(self):
+        name = self._advance().value
+        if self._accept("DOT"):
+            column = self._expect_identifier(f"nome de coluna após '{name}.'")
+            return ColumnRef(name, column)
+        return ColumnRef(None, name)
+
+    # Utilitários de navegação nos tokens
+
+    def _peek(self):
+        return self.tokens[self.pos]
+
+    def _advance(self):
+        token = self.tokens[self.pos]
+        if token.kind != "EOF":
+            self.pos += 1
+        return token
+
+    def _accept(self, kind, value=None):
+        token = self.tokens[self.pos]
+        if token.kind == kind and (value is None or token.value == value):
+            self.pos += 1
+            return True
+        return False
+
+    def _expect_identifier(self, description):
+        token = self._peek()
+        if token.kind != "IDENT":
+            raise SQLSyntaxError(
+                f"Sintaxe SQL inválida: esperado {description}, encontrado {self._describe()}",
+                token.position,
+            )
+        return self._advance().value
 
-        return True, "Operadores e estrutura WHERE válidos"
+    def _describe(self):
+        token = self._peek()
+        if token.kind == "EOF":
+            return "fim da consulta"
+        return f"'{token.value}'"
@@ -0,0 +1,325 @@
+import bisect
+import json
+import os
+import random
+from collections import Counter
+
+from cost_model import DEFAULT_SELECTIVITY, CardinalityEstimator
+from metadata import normalize_column_name, normalize_table_name
+from sql_ast import ColumnRef, Comparison, Literal
+
+DEFAULT_SAMPLE_SIZE = 30000
+DEFAULT_HISTOGRAM_BUCKETS = 100
+DEFAULT_MCV_COUNT = 20
+
+_REVERSED_OPERATOR = {"<": ">", ">": "<", "<=": ">=", ">=": "<=", "=": "=", "<>": "<>"}
+
+
+class ColumnStats:
+    """Estatísticas de uma coluna (no estilo do pg_stats do PostgreSQL)"""
+
+    def __init__(
+        self,
+        null_frac=0.0,
+        n_distinct=0,
+        min_value=None,
+        max_value=None,
+        histogram=None,
+        mcv=None,
+    ):
+        self.null_frac = null_frac  # Fração de valores nulos
+        self.n_distinct = n_distinct  # Número estimado de valores distintos
+        self.min_value = min_value
+        self.max_value = max_value
+        # Limites dos buckets equi-depth (cada bucket tem a mesma fração de linhas)
+        self.histogram = histogram or []
+        # Valores mais comuns: lista de (valor, frequência)
+        self.mcv = mcv or []
+
+    def to_dict(self):
+        return {
+            "null_frac": self.null_frac,
+            "n_distinct": self.n_distinct,
+            "min": self.min_value,
+            "max": self.max_value,
+            "histogram": self.histogram,
+            "mcv": [list(item) for item in self.mcv],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data["null_frac"],
+            data["n_distinct"],
+            data["min"],
+            data["max"],
+            data["histogram"],
+            [tuple(item) for item in data["mcv"]],
+        )
+
+    def equality_selectivity(self, value):
+        for mcv_value, frequency in self.mcv:
+            if mcv_value == value:
+                return frequency
+
+        if not _comparable(value, self.min_value):
+            return DEFAULT_SELECTIVITY["="]
+        if self.min_value is not None and not (self.min_value <= value <= self.max_value):
+            return 0.0
+
+        # Valores fora da lista de MCV dividem igualmente o que sobra
+        remaining = 1.0 - self.null_frac - sum(freq for _, freq in self.mcv)
+        others = self.n_distinct - len(self.mcv)
+        if others <= 0:
+            return 0.0
+        return max(remaining, 0.0) / others
+
+    def less_than_fraction(self, value):
+        """Fração das linhas não nulas com valor < value, pelo histograma"""
+        bounds = self.histogram
+        if len(bounds) < 2 or not _comparable(value, bounds[0]):
+            return None
+        if value <= bounds[0]:
+            return 0.0
+        if value > bounds[-1]:
+            return 1.0
+
+        i = bisect.bisect_left(bounds, value) - 1
+        low, high = bounds[i], bounds[i + 1]
+        if isinstance(value, (int, float)) and high != low:
+            within = (value - low) / (high - low)
+        else:
+            within = 0.5
+        return (i + within) / (len(bounds) - 1)
+
+    def range_selectivity(self, op, value):
+        fraction = self.less_than_fraction(value)
+        if fraction is None:
+            return DEFAULT_SELECTIVITY[op]
+
+        equal = self.equality_selectivity(value)
+        non_null = 1.0 - self.null_frac
+        less = fraction * non_null
+        if op == "<":
+            selectivity = less
+        elif op == "<=":
+            selectivity = less + equal
+        elif op == ">":
+            selectivity = non_null - less - equal
+        else:
+            selectivity = non_null - less
+        return min(max(selectivity, 0.0), 1.0)
+
+
+class TableStats:
+    def __init__(self, row_count, columns=None):
+        self.row_count = row_count
+        self.columns = columns or {}  # nome da coluna -> ColumnStats
+
+    def to_dict(self):
+        return {
+            "row_count": self.row_count,
+            "columns": {name: stats.to_dict() for name, stats in self.columns.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data["row_count"],
+            {name: ColumnStats.from_dict(c) for name, c in data["columns"].items()},
+        )
+
+
+def _comparable(a, b):
+    if a is None or b is None:
+        return False
+    numeric = (int, float)
+    if isinstance(a, numeric) and not isinstance(a, bool):
+        return isinstance(b, numeric) and not isinstance(b, bool)
+    return type(a) is type(b)
+
+
+def _estimate_distinct(sample_size, total_rows, counts):
+    """Estimador de Haas-Stokes (Duj1) para valores distintos a partir da amostra"""
+    distinct = len(counts)
+    if sample_size >= total_rows or sample_size == 0:
+        return distinct
+    singletons = sum(1 for c in counts.values() if c == 1)
+    if singletons == sample_size:
+        # Todos os valores da amostra são únicos: provavelmente uma chave
+        return total_rows
+    denominator = sample_size - singletons + singletons * sample_size / total_rows
+    return int(min(max(sample_size * distinct / denominator, distinct), total_rows))
+
+
+def collect_column_stats(values, total_rows, buckets, mcv_count):
+    """Calcula as estatísticas de uma coluna a partir dos valores amostrados"""
+    sample_size = len(values)
+    non_null = [v for v in values if v is not None]
+    null_frac = (sample_size - len(non_null)) / sample_size if sample_size else 0.0
+    if not non_null:
+        return ColumnStats(null_frac=null_frac)
+
+    counts = Counter(non_null)
+    n_distinct = _estimate_distinct(sample_size, total_rows, counts)
+
+    # Só é MCV o valor que aparece mais que a média
+    average = len(non_null) / len(counts)
+    mcv = [
+        (value, count / sample_size)
+        for value, count in counts.most_common(mcv_count)
+        if count > 1 and count > average
+    ]
+
+    first = non_null[0]
+    if all(_comparable(first, v) for v in non_null):
+        ordered = sorted(non_null)
+        min_value, max_value = ordered[0], ordered[-1]
+        step = (len(ordered) - 1) / buckets
+        histogram = [ordered[round(i * step)] for i in range(buckets + 1)]
+        # Valores repetidos nos limites não acrescentam informação
+        histogram = [b for i, b in enumerate(histogram) if i == 0 or b != histogram[i - 1]]
+    else:
+        min_value = max_value = None
+        histogram = []
+
+    return ColumnStats(null_frac, n_distinct, min_value, max_value, histogram, mcv)
+
+
+def analyze_table(
+    source,
+    table,
+    sample_size=DEFAULT_SAMPLE_SIZE,
+    buckets=DEFAULT_HISTOGRAM_BUCKETS,
+    mcv_count=DEFAULT_MCV_COUNT,
+    seed=0,
+):
+    """ANALYZE: lê a tabela uma vez, com amostragem por reservatório"""
+    rng = random.Random(seed)
+    reservoir = []
+    total_rows = 0
+    for row in source.scan(table):
+        total_rows += 1
+        if len(reservoir) < sample_size:
+            reservoir.append(row)
+        else:
+            j = rng.randrange(total_rows)
+            if j < sample_size:
+                reservoir[j] = row
+
+    columns = {}
+    for i, column in enumerate(source.columns(table)):
+        values = [row[i] for row in reservoir]
+        columns[column] = collect_column_stats(values, total_rows, buckets, mcv_count)
+    return TableStats(total_rows, columns)
+
+
+class StatisticsStore:
+    """Estatísticas de todas as tabelas, persistidas em um arquivo JSON"""
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, path=None):
+        self.path = path
+        self.tables = {}  # tabela -> TableStats
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def get(self, table):
+        return self.tables.get(normalize_table_name(table))
+
+    def column(self, table, column):
+        stats = self.get(table)
+        if stats is None:
+            return None
+        return stats.columns.get(normalize_column_name(table, column))
+
+    def analyze(self, source, tables=None, **options):
+        """Coleta estatísticas das tabelas (todas as da fonte por padrão)"""
+        for table in tables or source.table_names():
+            table = normalize_table_name(table)
+            self.tables[table] = analyze_table(source, table, **options)
+        if self.path:
+            self.save(self.path)
+
+    def save(self, path=None):
+        path = path or self.path
+        data = {
+            "version": self.FORMAT_VERSION,
+            "tables": {name: stats.to_dict() for name, stats in self.tables.items()},
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def load(self, path=None):
+        with open(path or self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != self.FORMAT_VERSION:
+            raise ValueError("Versão do arquivo de estatísticas não suportada")
+        self.tables = {
+            name: TableStats.from_dict(stats) for name, stats in data["tables"].items()
+        }
+
+
+class StatisticsEstimator(CardinalityEstimator):
+    """
+    Estimador que usa as estatísticas coletadas (contagem de linhas, MCV,
+    histogramas e valores distintos), recorrendo às estimativas padrão para
+    tabelas/colunas sem estatísticas.
+    """
+
+    def __init__(self, store, **options):
+        super().__init__(**options)
+        self.store = store
+
+    def table_rows(self, table):
+        stats = self.store.get(table)
+        if stats is None:
+            return super().table_rows(table)
+        return stats.row_count
+
+    def selectivity(self, expr):
+        if isinstance(expr, Comparison):
+            estimate = self._comparison_selectivity(expr)
+            if estimate is not None:
+                return estimate
+        return super().selectivity(expr)
+
+    def join_selectivity(self, predicate):
+        left = self._column_stats(predicate.left)
+        right = self._column_stats(predicate.right)
+        if predicate.op == "=" and left and right:
+            distinct = max(left.n_distinct, right.n_distinct, 1)
+            return (1 - left.null_frac) * (1 - right.null_frac) / distinct
+        return super().join_selectivity(predicate)
+
+    def distinct_values(self, column):
+        stats = self._column_stats(column)
+        if stats is None or not stats.n_distinct:
+            return super().distinct_values(column)
+        return stats.n_distinct
+
+    def _comparison_selectivity(self, expr):
+        op, left, right = expr.op, expr.left, expr.right
+        if isinstance(left, Literal) and isinstance(right, ColumnRef):
+            op, left, right = _REVERSED_OPERATOR[op], right, left
+        if not (isinstance(left, ColumnRef) and isinstance(right, Literal)):
+            return None
+
+        stats = self._column_stats(left)
+        if stats is None:
+            return None
+
+        value = right.value
+        if op == "=":
+            return stats.equality_selectivity(value)
+        if op == "<>":
+            return max(1.0 - stats.null_frac - stats.equality_selectivity(value), 0.0)
+        return stats.range_selectivity(op, value)
+
+    def _column_stats(self, expr):
+        if not isinstance(expr, ColumnRef) or expr.table is None:
+            return None
+        return self.store.column(expr.table, expr.column)
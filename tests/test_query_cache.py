@@ -0,0 +1,46 @@
+from query_cache import fingerprint_query
+from query_pipeline import QueryPipeline
+
+NUMBER = "SELECT Cliente.Nome FROM Cliente WHERE Cliente.idCliente = 3"
+STRING = "SELECT Cliente.Nome FROM Cliente WHERE Cliente.idCliente = '3'"
+
+
+def test_number_and_string_share_fingerprint_and_text():
+    (number_fp, (number,)), (string_fp, (string,)) = map(fingerprint_query, (NUMBER, STRING))
+    assert number_fp == string_fp
+    assert number.text == string.text
+    assert number.render() != string.render()
+
+
+def test_string_literal_is_not_served_the_number_entry():
+    pipeline = QueryPipeline()
+    pipeline.process(NUMBER)
+    valid, _, result = pipeline.process(STRING)
+
+    assert valid
+    assert result.statement.where.render() == "Cliente.idCliente = '3'"
+    fresh = QueryPipeline().process(STRING)[2]
+    assert result.optimized == fresh.optimized
+
+
+def test_same_literals_are_an_exact_hit():
+    pipeline = QueryPipeline()
+    first = pipeline.process(NUMBER)[2]
+    assert pipeline.cache.get(NUMBER) is first
+
+
+def test_hit_reuses_optimization_steps(monkeypatch):
+    pipeline = QueryPipeline()
+    pipeline.process(NUMBER)
+
+    def fail(expr):
+        raise AssertionError("a otimização deveria vir do cache")
+
+    monkeypatch.setattr(pipeline.optimizer, "optimize_steps", fail)
+    other = NUMBER.replace("= 3", "= 7")
+    result = pipeline.process(other)[2]
+
+    fresh = QueryPipeline().process(other)[2]
+    assert len(result.steps) == 3
+    assert result.steps == fresh.steps
+    assert "7" in result.steps[1].to_string()
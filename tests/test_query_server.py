@@ -0,0 +1,52 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from metadata import get_catalog, get_table_columns, set_catalog
+from query_server import QueryServer
+from schema_loader import load_catalog
+
+
+@pytest.fixture
+def sqlite_schema(tmp_path):
+    path = tmp_path / "esquema.db"
+    connection = sqlite3.connect(path)
+    connection.executescript(
+        """
+        CREATE TABLE Autor (idAutor INTEGER PRIMARY KEY, Nome TEXT);
+        CREATE TABLE Livro (
+            idLivro INTEGER PRIMARY KEY,
+            Titulo TEXT,
+            Autor_idAutor INTEGER REFERENCES Autor(idAutor)
+        );
+        """
+    )
+    connection.close()
+
+    previous = get_catalog()
+    set_catalog(load_catalog(str(path)))
+    yield path
+    set_catalog(previous)
+
+
+def test_plan_with_sqlite_schema(sqlite_schema):
+    # O catálogo (com a conexão SQLite aberta) é enviado aos processos do pool
+    assert get_table_columns("Livro") == ("idLivro", "Titulo", "Autor_idAutor")
+    server = QueryServer(workers=1)
+    try:
+        response = asyncio.run(
+            server.handle(
+                {
+                    "id": 1,
+                    "sql": "SELECT Livro.Titulo, Autor.Nome FROM Livro "
+                    "JOIN Autor ON Livro.Autor_idAutor = Autor.idAutor",
+                    "action": "plan",
+                }
+            )
+        )
+    finally:
+        server.close()
+
+    assert response["ok"], response["message"]
+    assert response["cached"] is False